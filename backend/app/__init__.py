@@ -31,6 +31,9 @@ def create_app(config_name=None):
     # 初始化数据库
     with app.app_context():
         init_db(app)
+
+    # 注册流水线计数器
+    init_counters(app)
     
     # 启动定时任务调度器
     if not app.testing:
@@ -73,6 +76,7 @@ def register_blueprints(app):
     from app.api.auth_api import auth_bp
     from app.api.admin_api import admin_bp
     from app.api.stats_api import stats_bp
+    from app.api.metrics_api import metrics_bp
 
     app.register_blueprint(sync_bp, url_prefix='/api/sync')
     app.register_blueprint(question_bp, url_prefix='/api/questions')
@@ -95,6 +99,8 @@ def register_blueprints(app):
     # 注册用户管理API
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
     app.register_blueprint(stats_bp, url_prefix='/api/stats')
+    # Prometheus 指标导出（/metrics）
+    app.register_blueprint(metrics_bp)
 
 
 def configure_logging(app):
@@ -103,6 +109,12 @@ def configure_logging(app):
     setup_beijing_logging(app)
 
 
+def init_counters(app):
+    """注册流水线计数器的ORM写入监听"""
+    from app.services.counter_service import counter_service
+    counter_service.register_listeners()
+
+
 def init_scheduler(app):
     """初始化定时任务调度器"""
     try:
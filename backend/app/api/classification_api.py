@@ -166,6 +166,37 @@ def validate_classification():
         }), 500
 
 
+@classification_bp.route('/cache/stats', methods=['GET'])
+def get_classification_cache_stats():
+    """获取分类结果缓存的命中统计"""
+    try:
+        from app.services.classification_cache import classification_cache
+        return jsonify({
+            'success': True,
+            'data': classification_cache.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取分类缓存统计失败: {str(e)}'
+        }), 500
+
+
+@classification_bp.route('/cache/invalidate', methods=['POST'])
+def invalidate_classification_cache():
+    """清理分类结果缓存（默认只删除旧版本和过期条目，all_versions=true 时全部删除）"""
+    try:
+        from app.services.classification_cache import classification_cache
+        data = request.get_json(silent=True) or {}
+        result = classification_cache.invalidate(all_versions=bool(data.get('all_versions', False)))
+        return jsonify(result), 200 if result['success'] else 500
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'清理分类缓存失败: {str(e)}'
+        }), 500
+
+
 @classification_bp.route('/health', methods=['GET'])
 def health_check():
     """分类服务健康检查"""
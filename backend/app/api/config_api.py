@@ -6,6 +6,7 @@ from flask import Blueprint, request, jsonify, current_app
 from app.services.system_config_service import SystemConfigService
 from app.utils.time_utils import TimeRangeUtils
 from app.utils.response import api_response, error_response
+from app.config import Config
 from datetime import datetime
 
 # 创建蓝图
@@ -452,9 +453,11 @@ def get_workflow_configs():
 
         # 获取工作流相关配置
         answer_generation_mode = config_service.get_config('workflow.answer_generation_mode', 'manual')
+        execution_mode = config_service.get_config('workflow.execution_mode', Config.WORKFLOW_EXECUTION_MODE)
 
         configs = {
-            'answer_generation_mode': answer_generation_mode
+            'answer_generation_mode': answer_generation_mode,
+            'execution_mode': execution_mode
         }
 
         return api_response(
@@ -494,6 +497,22 @@ def update_workflow_configs():
             if not success:
                 return error_response("更新答案生成模式配置失败")
 
+        # 更新工作流执行模式配置
+        if 'execution_mode' in data:
+            execution_mode = data['execution_mode']
+            if execution_mode not in ['batch', 'streaming']:
+                return error_response("工作流执行模式只能是 'batch' 或 'streaming'")
+
+            success = config_service.update_config(
+                key='workflow.execution_mode',
+                value=execution_mode,
+                config_type='string',
+                description='工作流执行模式配置（batch 整批依次执行 / streaming 逐题流式流转）'
+            )
+
+            if not success:
+                return error_response("更新工作流执行模式配置失败")
+
         return api_response(
             data=None,
             message="工作流配置更新成功"
@@ -0,0 +1,26 @@
+"""
+运行指标API
+以 Prometheus 文本格式导出外部API请求延迟直方图、状态码/重试计数、流水线阶段耗时等指标
+指标注册表是进程内的，这里只包含Web进程自身；worker.py 的各进程在 WORKER_METRICS_PORT 起的端口上单独导出
+"""
+from flask import Blueprint, Response, jsonify
+
+from app.services.metrics import metrics_registry
+
+# 创建蓝图
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus 抓取端点"""
+    try:
+        return Response(
+            metrics_registry.render_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'导出运行指标失败: {str(e)}'
+        }), 500
@@ -538,6 +538,77 @@ def disable_scheduler():
         }), 500
 
 
+# ============================================================================
+# 工作队列API
+# ============================================================================
+
+@scheduler_bp.route('/work-queue', methods=['GET'])
+def get_work_queue_status():
+    """获取工作队列各阶段的条目数和本进程的领取统计"""
+    try:
+        from app.services.work_queue_service import work_queue_service
+
+        return jsonify({
+            'success': True,
+            'data': work_queue_service.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取工作队列状态失败: {str(e)}'
+        }), 500
+
+
+@scheduler_bp.route('/work-queue/requeue', methods=['POST'])
+def requeue_dead_work_items():
+    """把超过最大尝试次数的 dead 条目重新放回队列，可按阶段过滤"""
+    try:
+        from app.services.work_queue_service import work_queue_service
+
+        data = request.get_json(silent=True) or {}
+        result = work_queue_service.requeue_dead(data.get('stage'))
+        return jsonify(result), 200 if result['success'] else 500
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'重新排队失败: {str(e)}'
+        }), 500
+
+
+@scheduler_bp.route('/result-journal', methods=['GET'])
+def get_result_journal_status():
+    """获取API结果日志中尚未写回的条目数和本进程的写入/重放统计"""
+    try:
+        from app.services.result_journal import result_journal
+
+        return jsonify({
+            'success': True,
+            'data': result_journal.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取API结果日志状态失败: {str(e)}'
+        }), 500
+
+
+@scheduler_bp.route('/result-journal/cleanup', methods=['POST'])
+def cleanup_result_journal():
+    """删除超过保留天数仍未重放的API结果日志条目，可指定 retention_days"""
+    try:
+        from app.services.result_journal import result_journal
+
+        data = request.get_json(silent=True) or {}
+        retention_days = data.get('retention_days')
+        result = result_journal.cleanup(int(retention_days) if retention_days is not None else None)
+        return jsonify(result), 200 if result['success'] else 500
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'清理API结果日志失败: {str(e)}'
+        }), 500
+
+
 # ============================================================================
 # 前端集成辅助API
 # ============================================================================
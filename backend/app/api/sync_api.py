@@ -1,6 +1,7 @@
 """
 数据同步API（支持questions和answers表分离同步）
 """
+from datetime import datetime
 from flask import jsonify, request
 from app.api import sync_bp
 from app.services.sync_service import sync_service
@@ -54,6 +55,134 @@ def trigger_sync():
             'message': f'触发同步失败: {str(e)}'
         }), 500
 
+@sync_bp.route('/checkpoint', methods=['GET'])
+def get_sync_checkpoint():
+    """查看增量同步检查点（游标）"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': sync_service.get_checkpoint_info()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取同步检查点失败: {str(e)}'
+        }), 500
+
+@sync_bp.route('/checkpoint/rewind', methods=['POST'])
+def rewind_sync_checkpoint():
+    """
+    回退同步检查点
+
+    请求体:
+        sendmessagetime: 新游标时间（ISO格式），为空时清空游标
+        source_id: 新游标源表主键（可选，默认0）
+    """
+    try:
+        data = request.get_json() or {}
+        sendmessagetime = data.get('sendmessagetime')
+        source_id = data.get('source_id')
+
+        cursor_time = None
+        if sendmessagetime:
+            try:
+                cursor_time = datetime.fromisoformat(sendmessagetime)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': f'sendmessagetime格式无效: {sendmessagetime}'
+                }), 400
+
+        if source_id is not None:
+            try:
+                source_id = int(source_id)
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'message': f'source_id必须为整数: {source_id}'
+                }), 400
+
+        result = sync_service.rewind_checkpoint(cursor_time, source_id)
+        return jsonify(result), (200 if result['success'] else 500)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'回退同步检查点失败: {str(e)}'
+        }), 500
+
+@sync_bp.route('/catchup', methods=['POST'])
+def trigger_catchup_sync():
+    """
+    触发追赶同步：按 sendmessagetime 切分时间分片并行同步积压数据
+
+    请求体:
+        slices: 时间分片数（可选，默认 SYNC_CATCHUP_SLICES）
+        max_workers: 并行线程数（可选，默认 SYNC_CATCHUP_MAX_WORKERS）
+    """
+    try:
+        data = request.get_json() or {}
+        try:
+            slices = int(data['slices']) if data.get('slices') is not None else None
+            max_workers = int(data['max_workers']) if data.get('max_workers') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'slices和max_workers必须为整数'
+            }), 400
+
+        if (slices is not None and slices < 1) or (max_workers is not None and max_workers < 1):
+            return jsonify({
+                'success': False,
+                'message': 'slices和max_workers必须大于0'
+            }), 400
+
+        result = sync_service.perform_catchup_sync(slices=slices, max_workers=max_workers)
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'触发追赶同步失败: {str(e)}'
+        }), 500
+
+@sync_bp.route('/catchup/<run_id>/retry', methods=['POST'])
+def retry_catchup_sync(run_id):
+    """仅重跑追赶同步中失败的分片"""
+    try:
+        data = request.get_json() or {}
+        max_workers = data.get('max_workers')
+        try:
+            max_workers = int(max_workers) if max_workers is not None else None
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': f'max_workers必须为整数: {max_workers}'
+            }), 400
+
+        result = sync_service.retry_catchup_sync(run_id, max_workers=max_workers)
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'重试追赶同步失败: {str(e)}'
+        }), 500
+
+@sync_bp.route('/catchup/status', methods=['GET'])
+def get_catchup_status():
+    """查看追赶同步分片进度（run_id 可选，默认最近一次）"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': sync_service.get_catchup_status(request.args.get('run_id'))
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取追赶同步状态失败: {str(e)}'
+        }), 500
+
 @sync_bp.route('/data', methods=['GET'])
 def get_synced_data():
     """查看已同步的数据"""
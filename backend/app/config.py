@@ -3,6 +3,7 @@
 包含数据库连接、API配置、定时任务配置等
 """
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -23,6 +24,7 @@ class Config:
 
     # 源表配置
     SOURCE_TABLE_NAME = os.environ.get('SOURCE_TABLE_NAME') or 'mid_pc_yoyo_qa_641000052'
+    SOURCE_ID_COLUMN = os.environ.get('SOURCE_ID_COLUMN') or 'id'  # 源表主键列，与sendmessagetime组成增量同步游标
     
     # API配置
     API_TITLE = 'AI问答回流数据处理平台 API'
@@ -64,6 +66,61 @@ class Config:
         'User-Agent': 'AI-QA-Platform/1.0'
     }
 
+    # HTTP连接池配置（所有API客户端共享同一个长连接传输层）
+    HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 10))  # 缓存的主机连接池数量
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 20))  # 每个主机连接池保持的最大连接数
+    HTTP_POOL_BLOCK = os.environ.get('HTTP_POOL_BLOCK', 'false').lower() == 'true'  # 连接池耗尽时是否阻塞等待
+    HTTP_POOL_PER_HOST_LIMIT = int(os.environ.get('HTTP_POOL_PER_HOST_LIMIT', 20))  # 每个主机的最大并发请求数
+
+    # 异步API客户端配置（每个客户端的最大并发请求数）
+    ASYNC_API_MAX_CONCURRENCY = {
+        'classification': int(os.environ.get('ASYNC_CLASSIFY_MAX_CONCURRENCY', 20)),
+        'doubao': int(os.environ.get('ASYNC_DOUBAO_MAX_CONCURRENCY', 10)),
+        'xiaotian': int(os.environ.get('ASYNC_XIAOTIAN_MAX_CONCURRENCY', 10)),
+        'score': int(os.environ.get('ASYNC_SCORE_MAX_CONCURRENCY', 10))
+    }
+
+    # API自适应限流默认值（可通过系统配置 api.rate_limit.<client>.<key> 覆盖）
+    # requests_per_second 为0表示不限速；并发上限在 [min_concurrency, max_concurrency] 间按AIMD调整
+    API_RATE_LIMITS = {
+        'classification': {'requests_per_second': 20, 'burst': 40, 'min_concurrency': 1, 'max_concurrency': 20, 'latency_target_ms': 5000},
+        'doubao': {'requests_per_second': 10, 'burst': 20, 'min_concurrency': 1, 'max_concurrency': 10, 'latency_target_ms': 15000},
+        'xiaotian': {'requests_per_second': 10, 'burst': 20, 'min_concurrency': 1, 'max_concurrency': 10, 'latency_target_ms': 15000},
+        'score': {'requests_per_second': 10, 'burst': 20, 'min_concurrency': 1, 'max_concurrency': 10, 'latency_target_ms': 20000}
+    }
+    API_RATE_LIMIT_REFRESH_SECONDS = 60  # 限流配置从系统配置刷新的间隔（秒）
+    API_RATE_LIMIT_ACQUIRE_TIMEOUT = 300  # 本地限流排队的最长等待时间（秒）
+
+    # 外部API熔断配置（按客户端独立熔断，打开期间快速失败并定期放行探测请求）
+    CIRCUIT_BREAKER_ENABLED = os.environ.get('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+    CIRCUIT_BREAKER_WINDOW_SIZE = int(os.environ.get('CIRCUIT_BREAKER_WINDOW_SIZE', 20))  # 错误率统计的最近请求数
+    CIRCUIT_BREAKER_MIN_REQUESTS = int(os.environ.get('CIRCUIT_BREAKER_MIN_REQUESTS', 10))  # 计算错误率所需的最少请求数
+    CIRCUIT_BREAKER_ERROR_RATE = float(os.environ.get('CIRCUIT_BREAKER_ERROR_RATE', 0.5))  # 触发熔断的错误率
+    CIRCUIT_BREAKER_CONSECUTIVE_TIMEOUTS = int(os.environ.get('CIRCUIT_BREAKER_CONSECUTIVE_TIMEOUTS', 5))  # 触发熔断的连续超时次数
+    CIRCUIT_BREAKER_OPEN_SECONDS = int(os.environ.get('CIRCUIT_BREAKER_OPEN_SECONDS', 30))  # 打开后多久进入半开探测
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES = int(os.environ.get('CIRCUIT_BREAKER_HALF_OPEN_PROBES', 1))  # 半开状态允许的并发探测数
+
+    # 请求合并：载荷相同的并发外部API请求共享一次调用
+    API_COALESCING_ENABLED = os.environ.get('API_COALESCING_ENABLED', 'true').lower() == 'true'
+
+    # 对冲请求（仅豆包/小天答案生成，默认关闭）：超过最近延迟分位数仍未返回时再发一次，先返回者胜出
+    API_HEDGING_ENABLED = os.environ.get('API_HEDGING_ENABLED', 'false').lower() == 'true'
+    API_HEDGING_PERCENTILE = float(os.environ.get('API_HEDGING_PERCENTILE', 95))  # 触发对冲的延迟分位数
+    API_HEDGING_WINDOW_SIZE = int(os.environ.get('API_HEDGING_WINDOW_SIZE', 200))  # 延迟与对冲比例的统计窗口（最近调用数）
+    API_HEDGING_MIN_SAMPLES = int(os.environ.get('API_HEDGING_MIN_SAMPLES', 20))  # 样本不足时不对冲
+    API_HEDGING_MAX_RATE = float(os.environ.get('API_HEDGING_MAX_RATE', 0.1))  # 对冲调用占比上限
+    API_HEDGING_MIN_DELAY = float(os.environ.get('API_HEDGING_MIN_DELAY', 1.0))  # 对冲等待时间下限（秒）
+    API_HEDGING_MAX_WORKERS = int(os.environ.get('API_HEDGING_MAX_WORKERS', 32))  # 对冲执行线程池大小
+
+    # 运行指标：每个直方图序列保留用于计算 p50/p95/p99 的最近样本数
+    METRICS_RESERVOIR_SIZE = int(os.environ.get('METRICS_RESERVOIR_SIZE', 1024))
+
+    # HTTP录制/回放（离线基准测试）：off 正常请求；record 追加录制响应；replay 只从磁带回放，不访问网络
+    HTTP_CASSETTE_MODE = os.environ.get('HTTP_CASSETTE_MODE', 'off').lower()
+    HTTP_CASSETTE_PATH = os.environ.get('HTTP_CASSETTE_PATH', 'cassettes/pipeline.jsonl.gz')
+    HTTP_CASSETTE_LATENCY = os.environ.get('HTTP_CASSETTE_LATENCY', 'recorded')  # recorded / none / 固定延迟秒数
+    HTTP_CASSETTE_LATENCY_SCALE = float(os.environ.get('HTTP_CASSETTE_LATENCY_SCALE', 1.0))  # recorded 模式下录制延迟的缩放系数
+
     # API模式配置
     API_MODE = os.environ.get('API_MODE', 'mock')  # 'mock' 或 'external'
     USE_MOCK_CLASSIFICATION = os.environ.get('USE_MOCK_CLASSIFICATION', 'true').lower() == 'true'
@@ -71,15 +128,48 @@ class Config:
     # 分类服务配置
     CLASSIFICATION_ENABLED = True
     CLASSIFICATION_BATCH_SIZE = int(os.environ.get('CLASSIFICATION_BATCH_SIZE', 50))
+    CLASSIFICATION_WORKERS = int(os.environ.get('CLASSIFICATION_WORKERS', 10))  # 批量分类时分类API的并发调用数
+    CLASSIFICATION_STALE_MINUTES = int(os.environ.get('CLASSIFICATION_STALE_MINUTES', 30))  # 停留在分类中超过该分钟数视为中断，重置为待处理
     CLASSIFICATION_CONFIDENCE_THRESHOLD = float(os.environ.get('CLASSIFICATION_CONFIDENCE_THRESHOLD', 0.8))
+
+    # 分类结果缓存配置（进程内LRU + 数据库表两级缓存，命中时不再调用分类API）
+    CLASSIFICATION_CACHE_ENABLED = os.environ.get('CLASSIFICATION_CACHE_ENABLED', 'true').lower() == 'true'
+    CLASSIFICATION_CACHE_VERSION = os.environ.get('CLASSIFICATION_CACHE_VERSION', 'v1')  # 分类器变更时修改，旧条目自动失效
+    CLASSIFICATION_CACHE_TTL_DAYS = int(os.environ.get('CLASSIFICATION_CACHE_TTL_DAYS', 30))  # 0 表示不过期
+    CLASSIFICATION_CACHE_MEMORY_SIZE = int(os.environ.get('CLASSIFICATION_CACHE_MEMORY_SIZE', 10000))  # 进程内LRU条目数
     
     # 自动化工作流配置（统一调度）
     AUTO_PROCESS_ON_STARTUP = False  # 启动时立即处理已有数据 - 已禁用以避免自动处理
-    SCHEDULER_ENABLED = True  # 启用调度器 - 允许定时任务管理
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'  # 启用调度器 - 多进程部署时Web进程应设为false，由worker.py选出的主节点运行
     WORKFLOW_INTERVAL_MINUTES = int(os.environ.get('WORKFLOW_INTERVAL_MINUTES', 120))  # 工作流执行间隔（分钟）- 改为2小时避免重复执行
     DATA_CHECK_ENABLED = True  # 是否启用数据检测
     AUTO_SUSPEND_WHEN_NO_DATA = True  # 无数据时自动挂起
+    SYNC_EVENT_DRIVEN_ENABLED = os.environ.get('SYNC_EVENT_DRIVEN_ENABLED', 'false').lower() == 'true'  # 事件驱动同步：新数据到达即触发工作流
+    SYNC_EVENT_CHANNEL = os.environ.get('SYNC_EVENT_CHANNEL', 'source_table_insert')  # PostgreSQL LISTEN/NOTIFY 通道名
+    SYNC_EVENT_DEBOUNCE_SECONDS = float(os.environ.get('SYNC_EVENT_DEBOUNCE_SECONDS', 5))  # 静默窗口：最后一次事件后等待的秒数
+    SYNC_EVENT_MAX_WAIT_SECONDS = float(os.environ.get('SYNC_EVENT_MAX_WAIT_SECONDS', 30))  # 持续写入时最长等待秒数，避免一直被推迟
+    SYNC_EVENT_POLL_SECONDS = float(os.environ.get('SYNC_EVENT_POLL_SECONDS', 5))  # 非PostgreSQL时高水位探测间隔（秒）
     MIN_BATCH_SIZE = 1  # 最小批处理大小，小于此数量时挂起
+
+    # 独立工作进程（worker.py）配置
+    WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES', 2))  # 运行流水线阶段的子进程数
+    WORKER_STAGES = os.environ.get('WORKER_STAGES', 'classification,answer_generation,scoring')  # 子进程处理的阶段
+    WORKER_IDLE_SECONDS = float(os.environ.get('WORKER_IDLE_SECONDS', 10))  # 没有待处理问题时的等待秒数
+    # 工作进程各自的指标端点（Web进程的 /metrics 不包含工作进程）：主进程监听该端口，子进程 i 监听 端口+1+i；0 表示不启动
+    WORKER_METRICS_PORT = int(os.environ.get('WORKER_METRICS_PORT', 9200))
+    WORKER_METRICS_HOST = os.environ.get('WORKER_METRICS_HOST', '0.0.0.0')
+    LEADER_ELECTION_INTERVAL = float(os.environ.get('LEADER_ELECTION_INTERVAL', 15))  # 主节点选举/存活检查间隔（秒）
+    LEADER_LOCK_KEY = int(os.environ.get('LEADER_LOCK_KEY', 640052001))  # 调度器主节点的 PostgreSQL advisory lock 键
+    LEADER_LOCK_FILE = os.environ.get('LEADER_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'ai-qa-scheduler.lock'))  # 非PostgreSQL时的锁文件
+
+    # 工作流执行模式：batch 各阶段整批依次执行；streaming 问题经阶段间有界队列逐个流转（系统配置 workflow.execution_mode 优先）
+    WORKFLOW_EXECUTION_MODE = os.environ.get('WORKFLOW_EXECUTION_MODE', 'batch').lower()
+    STREAMING_QUEUE_SIZE = int(os.environ.get('STREAMING_QUEUE_SIZE', 100))  # 每个阶段输入队列的容量，队列满时上游等待
+    STREAMING_STAGE_WORKERS = {
+        'classification': int(os.environ.get('STREAMING_CLASSIFICATION_WORKERS', 5)),
+        'answer_generation': int(os.environ.get('STREAMING_GENERATION_WORKERS', 5)),
+        'scoring': int(os.environ.get('STREAMING_SCORING_WORKERS', 5))
+    }
     
     # Mock服务自动启动配置
     AUTO_START_MOCK_SERVICES = True  # 是否自动启动Mock服务
@@ -87,6 +177,39 @@ class Config:
     
     # 批处理配置
     BATCH_SIZE = 100  # 批处理大小
+    # 批量答案生成（process_answer_generation_bulk）各AI类型的并发调用数，为1时逐条调用
+    ANSWER_GENERATION_WORKERS = {
+        'doubao': int(os.environ.get('DOUBAO_GENERATION_WORKERS', 10)),
+        'xiaotian': int(os.environ.get('XIAOTIAN_GENERATION_WORKERS', 10))
+    }
+    # 批量评分：评分API并发调用数，主线程每累计 N 个问题或每隔 N 秒批量提交一次
+    SCORING_WORKERS = int(os.environ.get('SCORING_WORKERS', 10))
+    SCORING_COMMIT_BATCH_SIZE = int(os.environ.get('SCORING_COMMIT_BATCH_SIZE', 50))
+    SCORING_COMMIT_INTERVAL = float(os.environ.get('SCORING_COMMIT_INTERVAL', 5))
+    SCORING_PAGE_SIZE = int(os.environ.get('SCORING_PAGE_SIZE', 500))  # 待评分问题按页（键集分页）选取的每页问题数
+
+    # 工作队列：多个工作进程以租约方式领取各阶段待处理问题，互不重复
+    WORK_QUEUE_ENABLED = os.environ.get('WORK_QUEUE_ENABLED', 'false').lower() == 'true'
+    WORK_QUEUE_LEASE_SECONDS = int(os.environ.get('WORK_QUEUE_LEASE_SECONDS', 600))  # 租约时长，到期未完成的条目可被其他进程重新领取
+    WORK_QUEUE_MAX_ATTEMPTS = int(os.environ.get('WORK_QUEUE_MAX_ATTEMPTS', 5))  # 最大尝试次数，超过后转入 dead 不再领取
+    WORK_QUEUE_RETRY_DELAY = int(os.environ.get('WORK_QUEUE_RETRY_DELAY', 60))  # 失败重试的基础退避秒数（按尝试次数翻倍）
+    WORK_QUEUE_RETRY_MAX_DELAY = int(os.environ.get('WORK_QUEUE_RETRY_MAX_DELAY', 3600))  # 失败重试的最大退避秒数
+    WORK_QUEUE_CLAIM_SIZE = int(os.environ.get('WORK_QUEUE_CLAIM_SIZE', 1000))  # 未指定处理数量时每次领取的条目数
+    WORK_QUEUE_ENQUEUE_LIMIT = int(os.environ.get('WORK_QUEUE_ENQUEUE_LIMIT', 5000))  # 每次选取时最多入队的候选问题数
+
+    # API结果日志：答案生成/评分结果到达即落库，进程中途退出后重新处理时直接重放，不重复调用付费API
+    RESULT_JOURNAL_ENABLED = os.environ.get('RESULT_JOURNAL_ENABLED', 'true').lower() == 'true'
+    RESULT_JOURNAL_RETENTION_DAYS = int(os.environ.get('RESULT_JOURNAL_RETENTION_DAYS', 7))  # 超过天数仍未重放的条目由清理接口删除
+
+    # 数据同步配置
+    SYNC_UPSERT_CHUNK_SIZE = int(os.environ.get('SYNC_UPSERT_CHUNK_SIZE', 500))  # 批量UPSERT每条语句的行数
+    SYNC_STREAMING_ENABLED = os.environ.get('SYNC_STREAMING_ENABLED', 'true').lower() == 'true'  # 流式同步：服务端游标逐块读取并提交
+    SYNC_YIELD_PER = int(os.environ.get('SYNC_YIELD_PER', 2000))  # 流式同步每块读取的行数
+    SYNC_SOURCE_INDEX_ENABLED = os.environ.get('SYNC_SOURCE_INDEX_ENABLED', 'false').lower() == 'true'  # 启用源表business_id影子表，替代MD5反连接
+    SYNC_CATCHUP_SLICES = int(os.environ.get('SYNC_CATCHUP_SLICES', 4))  # 追赶同步的时间分片数
+    SYNC_CATCHUP_MAX_WORKERS = int(os.environ.get('SYNC_CATCHUP_MAX_WORKERS', 4))  # 追赶同步并行线程数
+    COUNTER_RECONCILE_MINUTES = int(os.environ.get('COUNTER_RECONCILE_MINUTES', 30))  # 计数器与精确计数对账间隔（分钟）
+    COUNTER_SOURCE_ESTIMATE_ENABLED = os.environ.get('COUNTER_SOURCE_ESTIMATE_ENABLED', 'false').lower() == 'true'  # 源表计数使用PostgreSQL规划器估算值
     
     # 日志配置
     LOG_LEVEL = 'INFO'
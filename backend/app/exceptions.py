@@ -79,4 +79,12 @@ class APIResponseException(APIException):
     
     def __init__(self, message: str = "API响应格式错误", response_text: Optional[str] = None):
         super().__init__(message)
-        self.response_text = response_text 
\ No newline at end of file
+        self.response_text = response_text 
+
+
+class APICircuitOpenException(APIException):
+    """API熔断打开异常（外部服务不可用，请求未发出即快速失败）"""
+
+    def __init__(self, message: str = "API熔断已打开", retry_after: Optional[float] = None):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
@@ -0,0 +1,44 @@
+"""
+分类结果缓存模型
+以规范化后的问题文本 + yoyo答案的哈希为键，持久化分类API的返回结果
+"""
+from datetime import datetime
+from app.utils.database import db
+from app.config import Config
+from app.utils.datetime_helper import utc_to_beijing_str
+
+
+class ClassificationCacheEntry(db.Model):
+    """分类结果缓存表模型"""
+    __tablename__ = 'classification_cache'
+    __table_args__ = {'schema': Config.DATABASE_SCHEMA}
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # sha256(规范化问题 + 规范化答案)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    classification = db.Column(db.String(255), nullable=False)
+
+    # 写入时的分类器版本，与当前 CLASSIFICATION_CACHE_VERSION 不一致的条目视为失效
+    classifier_version = db.Column(db.String(50), nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, index=True)
+
+    hit_count = db.Column(db.Integer, default=0)
+    last_hit_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ClassificationCacheEntry {self.cache_key[:12]}: {self.classification}>'
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'cache_key': self.cache_key,
+            'classification': self.classification,
+            'classifier_version': self.classifier_version,
+            'expires_at': utc_to_beijing_str(self.expires_at) if self.expires_at else None,
+            'hit_count': self.hit_count or 0,
+            'last_hit_at': utc_to_beijing_str(self.last_hit_at) if self.last_hit_at else None,
+            'created_at': utc_to_beijing_str(self.created_at) if self.created_at else None
+        }
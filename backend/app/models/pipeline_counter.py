@@ -0,0 +1,34 @@
+"""
+流水线计数器模型
+保存 questions / answers / 源表等的累计行数，由写入方原子递增并在后台与精确计数对账
+"""
+from datetime import datetime
+from app.utils.database import db
+from app.config import Config
+from app.utils.datetime_helper import utc_to_beijing_str
+
+
+class PipelineCounter(db.Model):
+    """流水线计数器表模型"""
+    __tablename__ = 'pipeline_counters'
+    __table_args__ = {'schema': Config.DATABASE_SCHEMA}
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(100), unique=True, nullable=False, index=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    # 最近一次与精确计数对账的时间，为空表示尚未对账
+    reconciled_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PipelineCounter {self.name}: {self.value}>'
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'name': self.name,
+            'value': self.value or 0,
+            'reconciled_at': utc_to_beijing_str(self.reconciled_at) if self.reconciled_at else None,
+            'updated_at': utc_to_beijing_str(self.updated_at) if self.updated_at else None
+        }
@@ -0,0 +1,48 @@
+"""
+API结果日志模型
+答案生成、评分API的返回结果在到达时立即单独提交到本表，批次写回数据库时在同一事务中删除；
+进程在写回之前退出时，重新处理同一问题会直接重放这里的结果，不再重复调用付费API
+"""
+import json
+from datetime import datetime
+from app.utils.database import db
+from app.config import Config
+from app.utils.datetime_helper import utc_to_beijing_str
+
+
+class ApiResultJournalEntry(db.Model):
+    """API结果日志表模型"""
+    __tablename__ = 'api_result_journal'
+    __table_args__ = (
+        # 同一问题同一类结果只保留最新一条
+        db.UniqueConstraint('kind', 'question_business_id', 'assistant_type', name='uq_api_result_journal_key'),
+        {'schema': Config.DATABASE_SCHEMA}
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(32), nullable=False)  # answer / score
+    question_business_id = db.Column(db.String(64), nullable=False, index=True)
+    assistant_type = db.Column(db.String(32), nullable=False, default='')  # 答案生成为AI类型，评分为空字符串
+
+    # sha256(API输入)：问题、上下文或被评分的答案变化后，旧结果不再重放
+    input_hash = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # API返回结果（JSON）
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<ApiResultJournalEntry {self.kind}:{self.question_business_id}:{self.assistant_type}>'
+
+    def get_payload(self):
+        """解析API返回结果"""
+        return json.loads(self.payload)
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'question_business_id': self.question_business_id,
+            'assistant_type': self.assistant_type,
+            'input_hash': self.input_hash,
+            'created_at': utc_to_beijing_str(self.created_at) if self.created_at else None
+        }
@@ -0,0 +1,40 @@
+"""
+源表业务主键影子表模型
+为源表每一行预先计算并物化 business_id，新数据检测改为索引查找，替代逐行 MD5 反连接
+"""
+from datetime import datetime
+from app.utils.database import db
+from app.config import Config
+
+
+class SourceBusinessId(db.Model):
+    """源表业务主键影子表模型"""
+    __tablename__ = 'source_business_ids'
+    __table_args__ = (
+        db.UniqueConstraint('source_table', 'source_id', name='uq_source_business_ids_source_row'),
+        db.Index('idx_source_business_ids_cursor', 'source_table', 'sendmessagetime', 'source_id'),
+        {'schema': Config.DATABASE_SCHEMA}
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    source_table = db.Column(db.String(255), nullable=False)
+    source_id = db.Column(db.BigInteger, nullable=False)
+    sendmessagetime = db.Column(db.DateTime)
+
+    # 与 questions.business_id 相同算法预先计算的业务主键
+    business_id = db.Column(db.String(64), nullable=False, index=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SourceBusinessId {self.source_table}#{self.source_id}: {self.business_id}>'
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'source_table': self.source_table,
+            'source_id': self.source_id,
+            'sendmessagetime': self.sendmessagetime.isoformat() if self.sendmessagetime else None,
+            'business_id': self.business_id
+        }
@@ -0,0 +1,118 @@
+"""
+数据同步检查点模型
+记录每个源表最后一次同步到的 (sendmessagetime, id) 游标，用于增量同步；
+以及追赶同步按时间分片的逐片进度
+"""
+from datetime import datetime
+from app.utils.database import db
+from app.config import Config
+from app.utils.datetime_helper import utc_to_beijing_str
+
+
+class SyncCheckpoint(db.Model):
+    """同步检查点表模型"""
+    __tablename__ = 'sync_checkpoints'
+    __table_args__ = {'schema': Config.DATABASE_SCHEMA}
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    source_table = db.Column(db.String(255), unique=True, nullable=False, index=True)
+
+    # 游标：最后一条已同步记录的发送时间和源表主键
+    last_sendmessagetime = db.Column(db.DateTime)
+    last_source_id = db.Column(db.BigInteger)
+
+    # 统计信息
+    total_synced = db.Column(db.BigInteger, default=0)
+    last_batch_count = db.Column(db.Integer, default=0)
+    last_sync_at = db.Column(db.DateTime)
+
+    # 时间戳
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SyncCheckpoint {self.source_table}: ({self.last_sendmessagetime}, {self.last_source_id})>'
+
+    def get_cursor(self):
+        """返回 (sendmessagetime, id) 游标，未同步过时返回 None"""
+        if self.last_sendmessagetime is None:
+            return None
+        return self.last_sendmessagetime, self.last_source_id or 0
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'source_table': self.source_table,
+            'last_sendmessagetime': self.last_sendmessagetime.isoformat() if self.last_sendmessagetime else None,
+            'last_source_id': self.last_source_id,
+            'total_synced': self.total_synced or 0,
+            'last_batch_count': self.last_batch_count or 0,
+            'last_sync_at': utc_to_beijing_str(self.last_sync_at) if self.last_sync_at else None,
+            'created_at': utc_to_beijing_str(self.created_at) if self.created_at else None,
+            'updated_at': utc_to_beijing_str(self.updated_at) if self.updated_at else None
+        }
+
+
+class SyncCatchupSlice(db.Model):
+    """追赶同步时间分片表模型"""
+    __tablename__ = 'sync_catchup_slices'
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'slice_index', name='uq_sync_catchup_slices_run_slice'),
+        {'schema': Config.DATABASE_SCHEMA}
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    run_id = db.Column(db.String(64), nullable=False, index=True)
+    source_table = db.Column(db.String(255), nullable=False)
+    slice_index = db.Column(db.Integer, nullable=False)
+
+    # 分片时间范围：下界由起始游标表示（严格大于），上界 range_end（最后一片包含上界）
+    range_start = db.Column(db.DateTime, nullable=False)
+    range_end = db.Column(db.DateTime, nullable=False)
+    start_source_id = db.Column(db.BigInteger, default=-1)
+    end_inclusive = db.Column(db.Boolean, default=False)
+
+    # 分片内进度游标
+    last_sendmessagetime = db.Column(db.DateTime)
+    last_source_id = db.Column(db.BigInteger)
+
+    # 状态：pending, running, completed, failed
+    status = db.Column(db.String(20), default='pending', index=True)
+    attempts = db.Column(db.Integer, default=0)
+    synced_count = db.Column(db.Integer, default=0)
+    error_message = db.Column(db.Text)
+
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SyncCatchupSlice {self.run_id}#{self.slice_index}: {self.status}>'
+
+    def get_cursor(self):
+        """返回分片当前的 (sendmessagetime, id) 读取游标，失败重试时从这里续传"""
+        if self.last_sendmessagetime is not None:
+            return self.last_sendmessagetime, self.last_source_id or 0
+        return self.range_start, self.start_source_id if self.start_source_id is not None else -1
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'run_id': self.run_id,
+            'source_table': self.source_table,
+            'slice_index': self.slice_index,
+            'range_start': self.range_start.isoformat() if self.range_start else None,
+            'range_end': self.range_end.isoformat() if self.range_end else None,
+            'end_inclusive': bool(self.end_inclusive),
+            'last_sendmessagetime': self.last_sendmessagetime.isoformat() if self.last_sendmessagetime else None,
+            'last_source_id': self.last_source_id,
+            'status': self.status,
+            'attempts': self.attempts or 0,
+            'synced_count': self.synced_count or 0,
+            'error_message': self.error_message,
+            'started_at': utc_to_beijing_str(self.started_at) if self.started_at else None,
+            'finished_at': utc_to_beijing_str(self.finished_at) if self.finished_at else None
+        }
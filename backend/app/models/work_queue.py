@@ -0,0 +1,58 @@
+"""
+流水线工作队列模型
+每个阶段（分类/答案生成/评分）待处理的问题各占一行，工作进程以租约方式领取：
+领取时写入租约令牌和到期时间，处理完成后删除；租约过期未完成的条目可被其他进程重新领取
+"""
+from datetime import datetime
+from app.utils.database import db
+from app.config import Config
+from app.utils.datetime_helper import utc_to_beijing_str
+
+
+class WorkQueueItem(db.Model):
+    """工作队列表模型"""
+    __tablename__ = 'work_queue'
+    __table_args__ = (
+        # 同一阶段同一问题只排队一次
+        db.UniqueConstraint('stage', 'question_business_id', name='uq_work_queue_stage_question'),
+        db.Index('ix_work_queue_claim', 'stage', 'status', 'available_at'),
+        {'schema': Config.DATABASE_SCHEMA}
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    stage = db.Column(db.String(32), nullable=False)  # classification / answer_generation / scoring
+    question_business_id = db.Column(db.String(64), nullable=False, index=True)
+
+    # pending: 等待领取；leased: 已被领取（租约到期前其他进程不可见）；dead: 超过最大尝试次数
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # 重试退避：此时间之前不可领取
+
+    # 租约
+    lease_owner = db.Column(db.String(128))  # 领取进程（主机名:进程号）
+    lease_token = db.Column(db.String(36), index=True)  # 每次领取生成的令牌
+    lease_expires_at = db.Column(db.DateTime)
+
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<WorkQueueItem {self.stage}:{self.question_business_id} {self.status}>'
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'stage': self.stage,
+            'question_business_id': self.question_business_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'available_at': utc_to_beijing_str(self.available_at) if self.available_at else None,
+            'lease_owner': self.lease_owner,
+            'lease_expires_at': utc_to_beijing_str(self.lease_expires_at) if self.lease_expires_at else None,
+            'last_error': self.last_error,
+            'created_at': utc_to_beijing_str(self.created_at) if self.created_at else None
+        }
@@ -2,13 +2,17 @@
 AI处理服务
 负责批量处理问题分类、答案生成和评分任务
 """
+import functools
+import itertools
 import logging
+import threading
 import time
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
-from sqlalchemy import text, func, and_
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple
+from sqlalchemy import text, func, and_, or_
 from sqlalchemy.exc import SQLAlchemyError
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from threading import Lock
 
 from app.utils.database import db
@@ -16,23 +20,57 @@ from app.models.question import Question
 from app.models.answer import Answer
 from app.models.score import Score
 from app.services.api_client import APIClientFactory
+from app.services.classification_cache import classification_cache
+from app.services.result_journal import make_input_hash, result_journal
+from app.services.work_queue_service import work_queue_service
 from app.utils.helpers import batch_process
 from app.config import Config
 
 
+# 评分要求的三个AI模型答案类型
+SCORING_ASSISTANT_TYPES = ('yoyo', 'doubao', 'xiaotian')
+
+
+def _settles_work_leases(method):
+    """阶段方法结束后结算本线程领取的工作队列租约（阶段整体失败时全部退回重试）"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception as e:
+            self._settle_work_leases(str(e))
+            raise
+        self._settle_work_leases(None if result.get('success') else result.get('message'))
+        return result
+    return wrapper
+
+
 class AIProcessingService:
     """AI处理服务"""
 
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.batch_size = Config.BATCH_SIZE or 50
+        self._local = threading.local()
         
+    @_settles_work_leases
     def process_classification_batch(
         self, 
         limit: Optional[int] = None,
-        days_back: int = 1
+        days_back: int = 1,
+        max_workers: Optional[int] = None
     ) -> Dict[str, Any]:
-        """批量处理问题分类"""
+        """
+        批量处理问题分类
+        
+        每个批次的参考答案与分类缓存各一次批量查询，未命中缓存的问题由线程池并发调用分类API
+        （CLASSIFICATION_WORKERS），工作线程只发HTTP请求；主线程按完成顺序写入分类结果，批次末一次提交。
+        
+        Args:
+            limit: 最多处理的问题数
+            days_back: 处理最近几天的数据
+            max_workers: 分类API并发调用数，未指定时取 CLASSIFICATION_WORKERS；为1时逐条调用
+        """
         try:
             self.logger.info("开始批量分类处理")
             
@@ -53,62 +91,78 @@ class AIProcessingService:
             # 获取分类API客户端
             classification_client = APIClientFactory.get_classification_client()
             
+            workers = max(1, int(max_workers or Config.CLASSIFICATION_WORKERS))
             success_count = 0
             error_count = 0
             
-            # 批量处理
-            for i in range(0, len(questions), self.batch_size):
-                batch = questions[i:i + self.batch_size]
-                self.logger.info(f"处理批次 {i//self.batch_size + 1}, 包含 {len(batch)} 个问题")
-                
-                for question in batch:
-                    try:
-                        # 获取相关答案信息（如果存在）
-                        existing_answer = None
-                        answer_records = db.session.query(Answer).filter_by(
-                            question_business_id=question.business_id
-                        ).all()
-                        
-                        # 如果有多个答案，选择最新的一个作为参考
-                        if answer_records:
-                            existing_answer = max(answer_records, key=lambda x: x.created_at).answer_text
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='classify') as executor:
+                for i in range(0, len(questions), self.batch_size):
+                    batch = questions[i:i + self.batch_size]
+                    self.logger.info(f"处理批次 {i//self.batch_size + 1}, 包含 {len(batch)} 个问题")
+                    
+                    # 一次查询取本批次各问题最新的答案作为分类参考
+                    latest_answers = self._load_latest_answer_texts([question.business_id for question in batch])
+                    inputs = [(question.query, latest_answers.get(question.business_id)) for question in batch]
+                    
+                    # 相同问题+答案优先使用缓存结果，未命中的并发调用分类API - 使用用户的格式
+                    cached = classification_cache.get_many(inputs)
+                    futures = {}
+                    for index, (query, existing_answer) in enumerate(inputs):
+                        if cached[index] is not None:
+                            future = Future()
+                            future.set_result(cached[index])
+                        else:
+                            future = executor.submit(
+                                classification_client.classify_question,
+                                question=query,
+                                answer=existing_answer,  # 传入答案信息
+                                user_id="00031559"       # 使用用户指定的用户ID
+                            )
+                        futures[future] = index
+                    
+                    batch_success = 0
+                    cache_items = []
+                    for future in as_completed(futures):
+                        index = futures[future]
+                        question = batch[index]
+                        self._extend_work_leases()
+                        try:
+                            classification_result = future.result()
+                        except Exception as e:
+                            self.logger.error(f"分类问题失败 {question.id}: {str(e)}")
+                            question.processing_status = 'classification_failed'
+                            error_count += 1
+                            continue
                         
-                        # 调用分类API - 使用用户的格式
-                        classification_result = classification_client.classify_question(
-                            question=question.query,
-                            answer=existing_answer,  # 传入答案信息
-                            user_id="00031559"       # 使用用户指定的用户ID
-                        )
+                        if cached[index] is None:
+                            cache_items.append((inputs[index][0], inputs[index][1], classification_result))
                         
                         # 更新问题分类结果 - 现在直接是字符串
                         question.classification = classification_result
                         question.processing_status = 'classified'
                         question.updated_at = datetime.utcnow()
                         
-                        success_count += 1
+                        batch_success += 1
                         self.logger.info(f"问题 {question.id} 分类成功: {classification_result}")
-                        
+                    
+                    # 提交批次
+                    try:
+                        classification_cache.put_many(cache_items)
+                        db.session.commit()
+                        success_count += batch_success
+                        self.logger.info(f"批次 {i//self.batch_size + 1} 提交成功")
                     except Exception as e:
-                        self.logger.error(f"分类问题失败 {question.id}: {str(e)}")
-                        question.processing_status = 'classification_failed'
-                        error_count += 1
-                        continue
-                
-                # 提交批次
-                try:
-                    db.session.commit()
-                    self.logger.info(f"批次 {i//self.batch_size + 1} 提交成功")
-                except Exception as e:
-                    db.session.rollback()
-                    self.logger.error(f"批次 {i//self.batch_size + 1} 提交失败: {str(e)}")
-                    error_count += len(batch) - success_count
+                        db.session.rollback()
+                        self.logger.error(f"批次 {i//self.batch_size + 1} 提交失败: {str(e)}")
+                        error_count += batch_success
             
             result = {
                 'success': True,
                 'message': f'分类处理完成，成功: {success_count}, 失败: {error_count}',
                 'processed_count': len(questions),
                 'success_count': success_count,
-                'error_count': error_count
+                'error_count': error_count,
+                'max_workers': workers
             }
             
             self.logger.info(f"批量分类处理完成: {result}")
@@ -126,6 +180,7 @@ class AIProcessingService:
                 'error_count': 0
             }
     
+    @_settles_work_leases
     def process_answer_generation_batch(
         self, 
         limit: Optional[int] = None,
@@ -163,48 +218,35 @@ class AIProcessingService:
                 batch = questions[i:i + self.batch_size]
                 self.logger.info(f"处理答案生成批次 {i//self.batch_size + 1}, 包含 {len(batch)} 个问题")
                 
+                # 一次查询载入本批次已有答案的索引，循环内不再逐条查询
+                batch_business_ids = [question.business_id for question in batch]
+                answer_index = self._load_answer_index(batch_business_ids)
+                journaled = result_journal.load('answer', batch_business_ids)
+                new_answers = []
+                
                 for question in batch:
+                    self._extend_work_leases()
                     try:
-                        # 在事务中重新检查是否已经存在答案，避免并发重复生成
-                        # 使用 count() 而不是 first() 来检查数量
-                        existing_doubao_count = db.session.query(Answer).filter_by(
-                            question_business_id=question.business_id,
-                            assistant_type='doubao'
-                        ).count()
-
-                        existing_xiaotian_count = db.session.query(Answer).filter_by(
-                            question_business_id=question.business_id,
-                            assistant_type='xiaotian'
-                        ).count()
+                        existing_doubao_count = answer_index[(question.business_id, 'doubao')]
+                        existing_xiaotian_count = answer_index[(question.business_id, 'xiaotian')]
 
                         # 生成豆包AI答案
                         if existing_doubao_count == 0:
                             try:
-                                doubao_result = doubao_client.generate_answer(
-                                    question=question.query,
-                                    context=f"分类: {question.classification}" if question.classification else None
+                                doubao_result = self._generate_answer(
+                                    doubao_client, 'doubao', question,
+                                    f"分类: {question.classification}" if question.classification else None,
+                                    journaled
                                 )
 
-                                # 再次检查是否在生成过程中被其他进程创建了答案
-                                # 再次检查是否在生成过程中被其他进程创建了答案
-                                final_doubao_count = db.session.query(Answer).filter_by(
+                                # 暂存豆包答案，提交前统一确认未被其他进程创建
+                                new_answers.append(Answer(
                                     question_business_id=question.business_id,
-                                    assistant_type='doubao'
-                                ).count()
-
-                                if final_doubao_count == 0:
-                                    # 保存豆包答案
-                                    doubao_answer = Answer(
-                                        question_business_id=question.business_id,
-                                        answer_text=doubao_result.get('answer', ''),
-                                        assistant_type='doubao',
-                                        answer_time=datetime.utcnow()
-                                    )
-                                    db.session.merge(doubao_answer)
-                                    doubao_count += 1
-                                    self.logger.info(f"豆包答案生成成功: 问题 {question.id}")
-                                else:
-                                    self.logger.warning(f"问题 {question.id} 在生成过程中已被其他进程创建豆包答案，跳过保存")
+                                    answer_text=doubao_result.get('answer', ''),
+                                    assistant_type='doubao',
+                                    answer_time=datetime.utcnow()
+                                ))
+                                self.logger.info(f"豆包答案生成成功: 问题 {question.id}")
 
                             except Exception as e:
                                 self.logger.error(f"豆包答案生成失败 {question.id}: {str(e)}")
@@ -216,32 +258,20 @@ class AIProcessingService:
                         # 生成小天AI答案
                         if existing_xiaotian_count == 0:
                             try:
-                                xiaotian_result = xiaotian_client.generate_answer(
-                                    question=question.query,
-                                    context=f"分类: {question.classification}" if question.classification else None
+                                xiaotian_result = self._generate_answer(
+                                    xiaotian_client, 'xiaotian', question,
+                                    f"分类: {question.classification}" if question.classification else None,
+                                    journaled
                                 )
 
-                                # 再次检查是否在生成过程中被其他进程创建了答案
-                                # 再次检查是否在生成过程中被其他进程创建了答案
-                                final_xiaotian_count = db.session.query(Answer).filter_by(
+                                # 暂存小天答案，提交前统一确认未被其他进程创建
+                                new_answers.append(Answer(
                                     question_business_id=question.business_id,
-                                    assistant_type='xiaotian'
-                                ).count()
-
-                                if final_xiaotian_count == 0:
-                                    # 保存小天答案
-                                    # 使用merge确保幂等，避免并发下重复插入
-                                    xiaotian_answer = Answer(
-                                        question_business_id=question.business_id,
-                                        answer_text=xiaotian_result.get('answer', ''),
-                                        assistant_type='xiaotian',
-                                        answer_time=datetime.utcnow()
-                                    )
-                                    db.session.merge(xiaotian_answer)
-                                    xiaotian_count += 1
-                                    self.logger.info(f"小天答案生成成功: 问题 {question.id}")
-                                else:
-                                    self.logger.warning(f"问题 {question.id} 在生成过程中已被其他进程创建小天答案，跳过保存")
+                                    answer_text=xiaotian_result.get('answer', ''),
+                                    assistant_type='xiaotian',
+                                    answer_time=datetime.utcnow()
+                                ))
+                                self.logger.info(f"小天答案生成成功: 问题 {question.id}")
 
                             except Exception as e:
                                 self.logger.error(f"小天答案生成失败 {question.id}: {str(e)}")
@@ -260,6 +290,12 @@ class AIProcessingService:
                         error_count += 1
                         continue
                 
+                # 再次检查是否在生成过程中被其他进程创建了答案（整批一次查询）
+                inserted = self._add_new_answers(new_answers, batch_business_ids)
+                doubao_count += inserted['doubao']
+                xiaotian_count += inserted['xiaotian']
+                result_journal.discard('answer', batch_business_ids)
+                
                 # 提交批次
                 try:
                     db.session.commit()
@@ -293,24 +329,28 @@ class AIProcessingService:
                 'error_count': 0
             }
     
+    @_settles_work_leases
     def process_answer_generation_bulk(
         self, 
         batch_size: int = 1000,
-        days_back: int = 1
+        days_back: int = 1,
+        max_workers: Optional[Dict[str, int]] = None
     ) -> Dict[str, Any]:
         """
         按用户需求实现的批量答案生成
         
         流程：
         1. 一次性从数据库获取大批量数据（如1000条）
-        2. 存储在列表中
-        3. 用for循环逐条调用API
-        4. 将结果收集到列表中
+        2. 存储在列表中，并在主线程中检查已存在的答案
+        3. 按AI类型各用一个有界线程池并发调用API（豆包与小天同时进行）
+        4. 将结果按问题索引收集到列表中（每个结果到达即写入API结果日志，中途退出后重新处理时直接重放）
         5. 最终整体写回数据库，确保答案对应到正确位置
         
         Args:
             batch_size: 一次处理的数据量（默认1000）
             days_back: 处理最近几天的数据
+            max_workers: 各AI类型的并发调用数，如 {'doubao': 10, 'xiaotian': 10}，
+                未指定时取 ANSWER_GENERATION_WORKERS；为1时逐条调用
             
         Returns:
             处理结果统计
@@ -334,117 +374,85 @@ class AIProcessingService:
             self.logger.info(f"一次性获取 {len(questions)} 个问题，开始处理")
             
             # 2. 获取AI客户端
-            doubao_client = APIClientFactory.get_doubao_client()
-            xiaotian_client = APIClientFactory.get_xiaotian_client()
+            clients = {
+                'doubao': APIClientFactory.get_doubao_client(),
+                'xiaotian': APIClientFactory.get_xiaotian_client()
+            }
+            workers = dict(Config.ANSWER_GENERATION_WORKERS)
+            workers.update(max_workers or {})
+            
+            # 3. 一次查询载入已有答案的索引（避免重复生成），工作线程不访问数据库会话
+            business_ids = [question.business_id for question in questions]
+            answer_index = self._load_answer_index(business_ids)
+            # 上次中途退出前已返回、尚未写回的结果直接重放，不再调用API
+            journaled = result_journal.load('answer', business_ids)
+            existing = {'doubao': [], 'xiaotian': []}
+            tasks = {'doubao': [], 'xiaotian': []}
+            replayed = {'doubao': {}, 'xiaotian': {}}
+            input_hashes = []
+            for i, question in enumerate(questions):
+                context = f"分类: {question.classification}" if question.classification else None
+                input_hashes.append(make_input_hash(question.query, context))
+                for assistant_type in ('doubao', 'xiaotian'):
+                    found = answer_index[(question.business_id, assistant_type)] > 0
+                    existing[assistant_type].append(found)
+                    if found:
+                        continue
+                    result = result_journal.replay(
+                        journaled, 'answer', question.business_id, assistant_type, input_hashes[i]
+                    )
+                    if result is not None:
+                        replayed[assistant_type][i] = result
+                    else:
+                        tasks[assistant_type].append((i, question.id, question.query, context))
+            
+            def journal_result(assistant_type: str, index: int, result: Dict[str, Any]) -> None:
+                result_journal.record(
+                    'answer', questions[index].business_id, assistant_type, input_hashes[index], result
+                )
+            
+            # 4. 并发调用API，结果按问题索引放回原位置；每个结果到达即写入API结果日志
+            results, processing_errors = self._generate_answers_concurrently(
+                clients, tasks, workers, len(questions), on_result=journal_result
+            )
+            for assistant_type, items in replayed.items():
+                for i, result in items.items():
+                    results[assistant_type][i] = result
             
-            # 3. 初始化结果收集列表（保持与问题列表相同的索引顺序）
             doubao_answers = []  # 豆包答案列表
             xiaotian_answers = [] # 小天答案列表
-            processing_errors = []  # 错误记录列表
-            
-            # 4. 用for循环逐条调用API
             for i, question in enumerate(questions):
-                self.logger.info(f"处理问题 {i+1}/{len(questions)}: {question.query[:50]}...")
-                
-                # 检查是否已存在答案（避免重复生成）
-                existing_doubao = db.session.query(Answer).filter_by(
-                    question_business_id=question.business_id,
-                    assistant_type='doubao'
-                ).first()
-                
-                existing_xiaotian = db.session.query(Answer).filter_by(
-                    question_business_id=question.business_id,
-                    assistant_type='xiaotian'
-                ).first()
-                
-                # 处理豆包AI答案
-                doubao_result = None
-                if not existing_doubao:
-                    try:
-                        doubao_result = doubao_client.generate_answer(
-                            question=question.query,
-                            context=f"分类: {question.classification}" if question.classification else None
-                        )
-                        self.logger.debug(f"豆包API调用成功 - 问题{i+1}")
-                    except Exception as e:
-                        error_info = {
-                            'question_index': i,
-                            'question_id': question.id,
-                            'api_type': 'doubao',
-                            'error': str(e)
-                        }
-                        processing_errors.append(error_info)
-                        self.logger.error(f"豆包API调用失败 - 问题{i+1}: {str(e)}")
-                
-                # 处理小天AI答案  
-                xiaotian_result = None
-                if not existing_xiaotian:
-                    try:
-                        xiaotian_result = xiaotian_client.generate_answer(
-                            question=question.query,
-                            context=f"分类: {question.classification}" if question.classification else None
-                        )
-                        self.logger.debug(f"小天API调用成功 - 问题{i+1}")
-                    except Exception as e:
-                        error_info = {
-                            'question_index': i,
-                            'question_id': question.id,
-                            'api_type': 'xiaotian', 
-                            'error': str(e)
-                        }
-                        processing_errors.append(error_info)
-                        self.logger.error(f"小天API调用失败 - 问题{i+1}: {str(e)}")
-                
-                # 将结果添加到对应位置的列表中（保持索引对应关系）
                 doubao_answers.append({
                     'question_index': i,
                     'question_business_id': question.business_id,
-                    'result': doubao_result,
-                    'existing': existing_doubao is not None
+                    'result': results['doubao'][i],
+                    'existing': existing['doubao'][i]
                 })
                 
                 xiaotian_answers.append({
                     'question_index': i,
                     'question_business_id': question.business_id,
-                    'result': xiaotian_result,
-                    'existing': existing_xiaotian is not None
+                    'result': results['xiaotian'][i],
+                    'existing': existing['xiaotian'][i]
                 })
             
             self.logger.info("API调用阶段完成，开始批量写入数据库")
             
-            # 5. 最终整体写回数据库
-            doubao_inserted = 0
-            xiaotian_inserted = 0
-            
-            # 处理豆包答案写入
-            for answer_data in doubao_answers:
-                if not answer_data['existing'] and answer_data['result']:
-                    try:
-                        doubao_answer = Answer(
-                            question_business_id=answer_data['question_business_id'],
-                            answer_text=answer_data['result'].get('answer', ''),
-                            assistant_type='doubao',
-                            answer_time=datetime.utcnow()
-                        )
-                        db.session.add(doubao_answer)
-                        doubao_inserted += 1
-                    except Exception as e:
-                        self.logger.error(f"豆包答案写入失败 - 索引{answer_data['question_index']}: {str(e)}")
-            
-            # 处理小天答案写入
-            for answer_data in xiaotian_answers:
-                if not answer_data['existing'] and answer_data['result']:
-                    try:
-                        xiaotian_answer = Answer(
+            # 5. 最终整体写回数据库（写入前用一次查询刷新答案索引，跳过生成期间被其他进程创建的答案）
+            new_answers = []
+            for assistant_type, answer_list in (('doubao', doubao_answers), ('xiaotian', xiaotian_answers)):
+                for answer_data in answer_list:
+                    if not answer_data['existing'] and answer_data['result']:
+                        new_answers.append(Answer(
                             question_business_id=answer_data['question_business_id'],
                             answer_text=answer_data['result'].get('answer', ''),
-                            assistant_type='xiaotian',
+                            assistant_type=assistant_type,
                             answer_time=datetime.utcnow()
-                        )
-                        db.session.add(xiaotian_answer)
-                        xiaotian_inserted += 1
-                    except Exception as e:
-                        self.logger.error(f"小天答案写入失败 - 索引{answer_data['question_index']}: {str(e)}")
+                        ))
+            inserted = self._add_new_answers(new_answers, business_ids)
+            result_journal.discard('answer', business_ids)
+            doubao_inserted = inserted['doubao']
+            xiaotian_inserted = inserted['xiaotian']
             
             # 更新问题状态
             for question in questions:
@@ -470,7 +478,9 @@ class AIProcessingService:
                 'error_count': len(processing_errors),
                 'processing_errors': processing_errors[:10] if processing_errors else [],  # 只返回前10个错误
                 'batch_size_used': batch_size,
-                'position_mapping_maintained': True  # 标识保持了位置对应关系
+                'max_workers': workers,
+                'position_mapping_maintained': True,  # 标识保持了位置对应关系
+                'replayed_count': sum(len(items) for items in replayed.values())  # 从API结果日志重放的答案数
             }
             
             self.logger.info(f"批量答案生成完成（新逻辑）: {result}")
@@ -489,19 +499,275 @@ class AIProcessingService:
                 'error_count': 0
             }
     
+    def _generate_answers_concurrently(
+        self,
+        clients: Dict[str, Any],
+        tasks: Dict[str, List[Tuple[int, int, str, Optional[str]]]],
+        workers: Dict[str, int],
+        question_count: int,
+        on_result: Optional[Callable[[str, int, Dict[str, Any]], None]] = None
+    ) -> Tuple[Dict[str, List[Optional[Dict[str, Any]]]], List[Dict[str, Any]]]:
+        """
+        按AI类型各用一个有界线程池调用答案生成API
+
+        Args:
+            clients: AI类型 -> API客户端
+            tasks: AI类型 -> [(问题索引, 问题ID, 问题文本, 上下文)]
+            workers: AI类型 -> 并发调用数
+            question_count: 问题总数
+            on_result: 每个调用成功时在主线程中回调 (AI类型, 问题索引, 结果)
+
+        Returns:
+            (AI类型 -> 按问题索引排列的结果列表（失败或无需生成为 None）, 错误记录列表)
+        """
+        results = {assistant_type: [None] * question_count for assistant_type in tasks}
+        processing_errors = []
+        names = {'doubao': '豆包', 'xiaotian': '小天'}
+
+        def call(assistant_type: str, index: int, query: str, context: Optional[str]):
+            self.logger.debug(f"处理问题 {index + 1}/{question_count} ({names[assistant_type]}): {query[:50]}...")
+            return clients[assistant_type].generate_answer(question=query, context=context)
+
+        executors = {
+            assistant_type: ThreadPoolExecutor(
+                max_workers=max(1, int(workers.get(assistant_type, 1))),
+                thread_name_prefix=f'answer-{assistant_type}'
+            )
+            for assistant_type, items in tasks.items() if items
+        }
+        try:
+            futures = {}
+            for assistant_type, executor in executors.items():
+                for index, question_id, query, context in tasks[assistant_type]:
+                    future = executor.submit(call, assistant_type, index, query, context)
+                    futures[future] = (assistant_type, index, question_id)
+
+            for future in as_completed(futures):
+                assistant_type, index, question_id = futures[future]
+                self._extend_work_leases()
+                try:
+                    results[assistant_type][index] = future.result()
+                    self.logger.debug(f"{names[assistant_type]}API调用成功 - 问题{index + 1}")
+                    if on_result is not None:
+                        on_result(assistant_type, index, results[assistant_type][index])
+                except Exception as e:
+                    processing_errors.append({
+                        'question_index': index,
+                        'question_id': question_id,
+                        'api_type': assistant_type,
+                        'error': str(e)
+                    })
+                    self.logger.error(f"{names[assistant_type]}API调用失败 - 问题{index + 1}: {str(e)}")
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+        processing_errors.sort(key=lambda item: (item['question_index'], item['api_type']))
+        return results, processing_errors
+
+    def _load_answer_index(self, business_ids: List[str]) -> Counter:
+        """一次 IN 查询统计这些问题已有的答案数：{(question_business_id, assistant_type): 数量}"""
+        answer_index = Counter()
+        if not business_ids:
+            return answer_index
+        
+        rows = db.session.query(
+            Answer.question_business_id, Answer.assistant_type, func.count(Answer.id)
+        ).filter(
+            Answer.question_business_id.in_(business_ids)
+        ).group_by(Answer.question_business_id, Answer.assistant_type)
+        
+        for business_id, assistant_type, count in rows:
+            answer_index[(business_id, assistant_type)] = count
+        return answer_index
+    
+    def _load_latest_answer_texts(self, business_ids: List[str]) -> Dict[str, str]:
+        """一次 IN 查询取这些问题各自最新的答案文本：{question_business_id: answer_text}"""
+        latest = {}
+        if not business_ids:
+            return latest
+        
+        rows = db.session.query(Answer.question_business_id, Answer.answer_text).filter(
+            Answer.question_business_id.in_(business_ids)
+        ).order_by(Answer.created_at, Answer.id)
+        for business_id, answer_text in rows:
+            latest[business_id] = answer_text
+        return latest
+    
+    def _add_new_answers(self, new_answers: List[Answer], business_ids: List[str]) -> Counter:
+        """
+        把新生成的答案加入会话（不提交）
+        
+        先刷新一次答案索引，生成期间已被其他进程创建的 (问题, AI类型) 跳过，
+        同一批内重复的答案也只保留第一个。
+        
+        Returns:
+            按AI类型统计的实际加入数
+        """
+        answer_index = self._load_answer_index(business_ids)
+        inserted = Counter()
+        for answer in new_answers:
+            key = (answer.question_business_id, answer.assistant_type)
+            if answer_index[key] > 0:
+                self.logger.warning(
+                    f"问题 {answer.question_business_id} 在生成过程中已被其他进程创建{answer.assistant_type}答案，跳过保存"
+                )
+                continue
+            db.session.add(answer)
+            answer_index[key] += 1
+            inserted[answer.assistant_type] += 1
+        return inserted
+    
+    def _generate_answer(
+        self,
+        client,
+        assistant_type: str,
+        question: Question,
+        context: Optional[str],
+        journaled: Dict[Tuple[str, str, str], Any]
+    ) -> Dict[str, Any]:
+        """
+        调用答案生成API：API结果日志中有同一输入的结果时直接重放，否则调用API并在返回时写入日志
+        
+        Args:
+            journaled: result_journal.load('answer', ...) 的结果
+        """
+        input_hash = make_input_hash(question.query, context)
+        result = result_journal.replay(journaled, 'answer', question.business_id, assistant_type, input_hash)
+        if result is None:
+            result = client.generate_answer(question=question.query, context=context)
+            result_journal.record('answer', question.business_id, assistant_type, input_hash, result)
+        return result
+    
+    # ------------------------------------------------------------------
+    # 逐题处理（流式流水线中每个问题单独流经各阶段）
+    # ------------------------------------------------------------------
+    
+    def classify_question(self, question: Question, classification_client) -> str:
+        """对单个问题分类并写入会话（不提交），相同问题+答案优先使用缓存结果"""
+        latest_answer = db.session.query(Answer.answer_text).filter(
+            Answer.question_business_id == question.business_id
+        ).order_by(Answer.created_at.desc()).first()
+        existing_answer = latest_answer[0] if latest_answer else None
+        
+        classification_result = classification_cache.get(question.query, existing_answer)
+        if classification_result is None:
+            classification_result = classification_client.classify_question(
+                question=question.query,
+                answer=existing_answer,
+                user_id="00031559"
+            )
+            classification_cache.put(question.query, existing_answer, classification_result)
+        
+        question.classification = classification_result
+        question.processing_status = 'classified'
+        question.updated_at = datetime.utcnow()
+        return classification_result
+    
+    def generate_question_answers(self, question: Question, clients: Dict[str, Any]) -> Counter:
+        """
+        为单个问题生成缺失的AI答案并加入会话（不提交）
+        
+        有AI类型调用失败时问题状态为 answer_generation_failed，下次仍会被选中重试
+        
+        Args:
+            clients: {AI类型: 客户端}，如 {'doubao': ..., 'xiaotian': ...}
+        
+        Returns:
+            按AI类型统计的实际加入数
+        """
+        answer_index = self._load_answer_index([question.business_id])
+        journaled = result_journal.load('answer', [question.business_id])
+        context = f"分类: {question.classification}" if question.classification else None
+        new_answers = []
+        failed_types = []
+        
+        for assistant_type, client in clients.items():
+            if answer_index[(question.business_id, assistant_type)] > 0:
+                continue
+            try:
+                result = self._generate_answer(client, assistant_type, question, context, journaled)
+            except Exception as e:
+                self.logger.error(f"{assistant_type}答案生成失败 {question.business_id}: {str(e)}")
+                failed_types.append(assistant_type)
+                continue
+            new_answers.append(Answer(
+                question_business_id=question.business_id,
+                answer_text=result.get('answer', ''),
+                assistant_type=assistant_type,
+                answer_time=datetime.utcnow()
+            ))
+        
+        inserted = self._add_new_answers(new_answers, [question.business_id])
+        result_journal.discard('answer', [question.business_id])
+        question.processing_status = 'answer_generation_failed' if failed_types else 'answers_generated'
+        question.updated_at = datetime.utcnow()
+        return inserted
+    
+    def score_question(
+        self,
+        question: Question,
+        score_client,
+        badcase_service,
+        badcase_threshold: Optional[float]
+    ) -> int:
+        """
+        对单个问题的三个未评分答案评分并提交
+        
+        Returns:
+            提交的评分数，没有可评分的答案时为0
+        """
+        jobs = self._build_scoring_jobs(self._build_scoring_groups([question]))
+        if not jobs:
+            return 0
+        
+        _, answers, payload = jobs[0]
+        input_hash = make_input_hash(payload)
+        journaled = result_journal.load('score', [question.business_id])
+        score_results = result_journal.replay(journaled, 'score', question.business_id, '', input_hash)
+        replayed = score_results is not None
+        if not replayed:
+            score_results = score_client.score_multiple_answers(**payload)
+        
+        pending = {'questions': 1, 'scores': 0, 'answer_ids': [], 'business_ids': [question.business_id]}
+        pending['scores'] = self._stage_question_scores(
+            question, answers, score_results, pending['answer_ids'], badcase_service, badcase_threshold
+        )
+        if not replayed:
+            result_journal.record('score', question.business_id, '', input_hash, score_results)
+        committed, failed = self._commit_scoring_batch(pending)
+        if failed:
+            raise RuntimeError(f"问题 {question.business_id} 评分提交失败")
+        return committed
+    
+    @_settles_work_leases
     def process_scoring_batch(
         self, 
         limit: Optional[int] = None,
-        days_back: int = 1
+        days_back: int = 1,
+        max_workers: Optional[int] = None
     ) -> Dict[str, Any]:
-        """批量评分处理 - 按问题分组，支持多模型评分"""
+        """
+        批量评分处理 - 按问题分组，支持多模型评分
+        
+        待评分问题按 SCORING_PAGE_SIZE 分页选取、逐页评分；
+        评分API由线程池并发调用（SCORING_WORKERS），主线程作为唯一的写入方按完成顺序接收结果，
+        暂存 Score 记录、答案 is_scored 与问题状态/badcase 变更，每 SCORING_COMMIT_BATCH_SIZE 个问题
+        或 SCORING_COMMIT_INTERVAL 秒批量提交一次。
+        
+        Args:
+            limit: 最多处理的问题数
+            days_back: 处理最近几天的数据
+            max_workers: 评分API并发调用数，未指定时取 SCORING_WORKERS；为1时逐条调用
+        """
         try:
             self.logger.info("开始批量评分处理")
             
-            # 获取需要评分的问题组（包含多个AI模型答案）
-            question_groups = self._get_questions_for_scoring(limit, days_back)
+            # 按页获取需要评分的问题组（包含多个AI模型答案），积压很大时逐页评分，不一次性载入
+            pages = self._iter_questions_for_scoring(limit, days_back)
+            first_page = next(pages, None)
             
-            if not question_groups:
+            if not first_page:
                 return {
                     'success': True,
                     'message': '没有需要评分的问题',
@@ -510,119 +776,86 @@ class AIProcessingService:
                     'error_count': 0
                 }
             
-            self.logger.info(f"找到 {len(question_groups)} 个待评分问题组")
-            
             # 获取评分API客户端
             score_client = APIClientFactory.get_score_client()
             
+            from app.services.badcase_detection_service import BadcaseDetectionService
+            badcase_service = BadcaseDetectionService()
+            try:
+                badcase_threshold = badcase_service.get_badcase_threshold()
+            except Exception as e:
+                self.logger.error(f"获取badcase阈值失败，本批次跳过badcase检测: {str(e)}")
+                badcase_threshold = None
+            
+            workers = max(1, int(max_workers or Config.SCORING_WORKERS))
             success_count = 0
             error_count = 0
             processed_questions = 0
             
-            # 按问题组逐个处理
-            for question_data in question_groups:
-                try:
-                    question = question_data['question']
-                    answers = question_data['answers']  # {assistant_type: answer_obj}
-                    
-                    self.logger.info(f"处理问题评分: {question.query[:50]}... (包含{len(answers)}个AI答案)")
+            # 待提交的批次：问题数、评分数、需标记为已评分的答案ID、需删除API结果日志的问题
+            pending = {'questions': 0, 'scores': 0, 'answer_ids': [], 'business_ids': []}
+            last_commit = time.time()
+            
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scoring') as executor:
+                for question_groups in itertools.chain([first_page], pages):
+                    self.logger.info(f"找到 {len(question_groups)} 个待评分问题组")
                     
-                    # 构建评分API输入（确保三个答案都存在）
-                    our_answer = answers.get('yoyo', {}).get('answer_text', '')
-                    doubao_answer = answers.get('doubao', {}).get('answer_text', '')
-                    xiaotian_answer = answers.get('xiaotian', {}).get('answer_text', '')
-                    classification = question.classification or ''
-
-                    # 验证三个答案都不为空（双重保险）
-                    if not all([our_answer, doubao_answer, xiaotian_answer, classification]):
-                        self.logger.warning(f"问题 {question.business_id} 答案或分类为空，跳过评分")
-                        continue
-                        
-                        # 调用评分API
-                    score_results = score_client.score_multiple_answers(
-                            question=question.query,
-                        our_answer=our_answer,
-                        doubao_answer=doubao_answer,
-                        xiaotian_answer=xiaotian_answer,
-                        classification=classification
-                    )
+                    jobs = self._build_scoring_jobs(question_groups)
+                    # 上次中途退出前已返回、尚未写回的评分结果直接重放，不再调用API
+                    journaled = result_journal.load('score', [question.business_id for question, _, _ in jobs])
                     
-                    # 处理评分结果，按模型匹配
-                    model_name_mapping = {
-                        'yoyo': 'yoyo',
-                        '豆包': 'doubao',
-                        '小天': 'xiaotian',
-                        '原始模型': 'yoyo',
-                        '豆包模型': 'doubao', 
-                        '小天模型': 'xiaotian'
-                    }
+                    futures = {}
+                    for question, answers, payload in jobs:
+                        input_hash = make_input_hash(payload)
+                        score_results = result_journal.replay(journaled, 'score', question.business_id, '', input_hash)
+                        if score_results is not None:
+                            future = Future()
+                            future.set_result(score_results)
+                        else:
+                            future = executor.submit(score_client.score_multiple_answers, **payload)
+                        futures[future] = (question, answers, input_hash, score_results is not None)
                     
-                    saved_scores = 0
-                    for score_result in score_results:
-                        model_name = score_result.get('模型名称', '')
-                        assistant_type = model_name_mapping.get(model_name)
-
-                        if assistant_type and assistant_type in answers:
-                            answer_obj = answers[assistant_type]
-
-                            # 使用新的创建方法，支持动态维度名称
-                            score = Score.create_from_api_response(
-                                answer_obj['id'],
-                                score_result
+                    for future in as_completed(futures):
+                        question, answers, input_hash, replayed = futures[future]
+                        self._extend_work_leases()
+                        try:
+                            score_results = future.result()
+                            saved_scores = self._stage_question_scores(
+                                question, answers, score_results, pending['answer_ids'],
+                                badcase_service, badcase_threshold
                             )
-
-                            db.session.add(score)
-
-                            # 更新答案状态
-                            answer_record = db.session.query(Answer).filter_by(id=answer_obj['id']).first()
-                            if answer_record:
-                                answer_record.is_scored = True
-                                answer_record.updated_at = datetime.utcnow()
-
-                            saved_scores += 1
-
-                    success_count += saved_scores
-                    processed_questions += 1
-
-                    # 检查并更新问题状态为scored
-                    if saved_scores > 0:  # 如果有评分被保存
-                        if self._check_question_scoring_complete(question.business_id):
-                            # 更新问题状态为scored
-                            question.processing_status = 'scored'
-                            question.updated_at = datetime.utcnow()
-                            self.logger.info(f"问题 {question.business_id} 所有答案评分完成，状态更新为scored")
-
-                            # 检测badcase（新增）
-                            try:
-                                from app.services.badcase_detection_service import BadcaseDetectionService
-                                badcase_service = BadcaseDetectionService()
-                                is_badcase = badcase_service.detect_badcase(question.business_id)
-                                if is_badcase:
-                                    self.logger.info(f"问题 {question.business_id} 被标记为badcase")
-                            except Exception as e:
-                                self.logger.error(f"检测badcase时出错 {question.business_id}: {str(e)}")
-
-                    # 提交当前问题的评分
-                    try:
-                        db.session.commit()
-                        self.logger.info(f"问题 {question.business_id} 评分保存成功，共{saved_scores}个模型")
-                    except Exception as e:
-                        db.session.rollback()
-                        self.logger.error(f"问题 {question.business_id} 评分保存失败: {str(e)}")
-                        error_count += saved_scores
+                        except Exception as e:
+                            self.logger.error(f"评分问题失败 {question.business_id}: {str(e)}")
+                            error_count += 1
+                            continue
                         
-                except Exception as e:
-                    self.logger.error(f"评分问题失败 {question.business_id}: {str(e)}")
-                    error_count += 1
-                    db.session.rollback()
-                    continue
+                        # 结果到达即写入API结果日志，批量提交评分时删除
+                        if not replayed:
+                            result_journal.record('score', question.business_id, '', input_hash, score_results)
+                        
+                        processed_questions += 1
+                        pending['questions'] += 1
+                        pending['scores'] += saved_scores
+                        pending['business_ids'].append(question.business_id)
+                        
+                        if (pending['questions'] >= Config.SCORING_COMMIT_BATCH_SIZE or
+                                time.time() - last_commit >= Config.SCORING_COMMIT_INTERVAL):
+                            committed, failed = self._commit_scoring_batch(pending)
+                            success_count += committed
+                            error_count += failed
+                            last_commit = time.time()
+            
+            committed, failed = self._commit_scoring_batch(pending)
+            success_count += committed
+            error_count += failed
             
             result = {
                 'success': True,
                 'message': f'评分处理完成，处理问题: {processed_questions}, 成功评分: {success_count}, 失败: {error_count}',
                 'processed_count': processed_questions,
                 'success_count': success_count,
-                'error_count': error_count
+                'error_count': error_count,
+                'max_workers': workers
             }
             
             self.logger.info(f"批量评分处理完成: {result}")
@@ -640,6 +873,121 @@ class AIProcessingService:
                 'error_count': 0
             }
     
+    def _build_scoring_jobs(
+        self,
+        question_groups: List[Dict[str, Any]]
+    ) -> List[Tuple[Question, Dict[str, Dict[str, Any]], Dict[str, str]]]:
+        """在主线程中准备评分API输入 [(问题, 答案, 评分API参数)]，工作线程不访问数据库会话"""
+        jobs = []
+        for question_data in question_groups:
+            question = question_data['question']
+            answers = question_data['answers']  # {assistant_type: answer_dict}
+            
+            # 构建评分API输入（确保三个答案都存在）
+            payload = {
+                'question': question.query,
+                'our_answer': answers.get('yoyo', {}).get('answer_text', ''),
+                'doubao_answer': answers.get('doubao', {}).get('answer_text', ''),
+                'xiaotian_answer': answers.get('xiaotian', {}).get('answer_text', ''),
+                'classification': question.classification or ''
+            }
+            
+            # 验证三个答案都不为空（双重保险）
+            if not all(payload.values()):
+                self.logger.warning(f"问题 {question.business_id} 答案或分类为空，跳过评分")
+                continue
+            jobs.append((question, answers, payload))
+        return jobs
+    
+    def _stage_question_scores(
+        self,
+        question: Question,
+        answers: Dict[str, Dict[str, Any]],
+        score_results: List[Dict[str, Any]],
+        scored_answer_ids: List[int],
+        badcase_service,
+        badcase_threshold: Optional[float]
+    ) -> int:
+        """
+        把一个问题的评分结果加入会话（不提交）：按模型匹配创建 Score 记录，
+        三个答案都评分后更新问题状态为scored并检测badcase
+        
+        Returns:
+            保存的评分数
+        """
+        # 处理评分结果，按模型匹配
+        model_name_mapping = {
+            'yoyo': 'yoyo',
+            '豆包': 'doubao',
+            '小天': 'xiaotian',
+            '原始模型': 'yoyo',
+            '豆包模型': 'doubao', 
+            '小天模型': 'xiaotian'
+        }
+        
+        # 先在局部构建该问题的全部 Score，任一结果解析失败时整题不加入会话，
+        # 避免半个问题的评分随批次提交、答案被标记为已评分而问题永远停在未评分状态
+        scores = {}
+        for score_result in score_results:
+            model_name = score_result.get('模型名称', '')
+            assistant_type = model_name_mapping.get(model_name)
+            
+            if assistant_type and assistant_type in answers:
+                # 使用新的创建方法，支持动态维度名称
+                scores[assistant_type] = Score.create_from_api_response(answers[assistant_type]['id'], score_result)
+        
+        for assistant_type, score in scores.items():
+            db.session.add(score)
+            scored_answer_ids.append(answers[assistant_type]['id'])
+        
+        # 待评分的问题组三个答案均未评分，本次三个模型都有评分即为评分完成
+        if {'yoyo', 'doubao', 'xiaotian'}.issubset(scores):
+            question.processing_status = 'scored'
+            question.updated_at = datetime.utcnow()
+            self.logger.info(f"问题 {question.business_id} 所有答案评分完成，状态更新为scored")
+            
+            # 检测badcase（直接使用本次的yoyo评分，不再查询和单独提交）
+            if badcase_threshold is not None:
+                try:
+                    if badcase_service.apply_badcase_result(question, scores['yoyo'], badcase_threshold):
+                        self.logger.info(f"问题 {question.business_id} 被标记为badcase")
+                except Exception as e:
+                    self.logger.error(f"检测badcase时出错 {question.business_id}: {str(e)}")
+        
+        return len(scores)
+    
+    def _commit_scoring_batch(self, pending: Dict[str, Any]) -> Tuple[int, int]:
+        """
+        批量提交暂存的评分：答案 is_scored 用一条 UPDATE 更新，随后一次提交
+        
+        Returns:
+            (提交成功的评分数, 提交失败的评分数)
+        """
+        if not pending['questions']:
+            return 0, 0
+        
+        scores = pending['scores']
+        questions = pending['questions']
+        answer_ids = pending['answer_ids']
+        business_ids = pending['business_ids']
+        pending.update({'questions': 0, 'scores': 0, 'answer_ids': [], 'business_ids': []})
+        
+        try:
+            if answer_ids:
+                db.session.query(Answer).filter(Answer.id.in_(answer_ids)).update(
+                    {'is_scored': True, 'updated_at': datetime.utcnow()},
+                    synchronize_session=False
+                )
+            # 评分写回与API结果日志删除在同一事务中提交
+            result_journal.discard('score', business_ids)
+            db.session.commit()
+            self.logger.info(f"批量提交评分成功: {questions} 个问题，共{scores}个模型评分")
+            return scores, 0
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"批量提交评分失败（{questions} 个问题）: {str(e)}")
+            return 0, scores
+    
     def _get_unclassified_questions(
         self,
         limit: Optional[int] = None,
@@ -648,17 +996,17 @@ class AIProcessingService:
         """获取未分类的问题 - 查找所有没有分类的问题，不限制处理状态"""
         self.logger.info(f"查找所有待分类问题（不限制时间范围和处理状态）")
 
-        query = db.session.query(Question).filter(
+        query = self._classification_candidates_query().order_by(Question.created_at.desc())
+        return self._select_questions('classification', query, limit)
+    
+    def _classification_candidates_query(self):
+        """待分类问题查询（不含排序和分页）"""
+        return db.session.query(Question).filter(
             and_(
                 Question.classification.is_(None) | (Question.classification == ''),
                 Question.is_deleted == False
             )
-        ).order_by(Question.created_at.desc())
-
-        if limit:
-            query = query.limit(limit)
-
-        return query.all()
+        )
     
     def _get_questions_for_answer_generation(
         self,
@@ -666,9 +1014,14 @@ class AIProcessingService:
         days_back: int = 1
     ) -> List[Question]:
         """获取需要生成答案的问题"""
+        query = self._answer_generation_candidates_query(days_back).order_by(Question.created_at.desc())
+        return self._select_questions('answer_generation', query, limit)
+    
+    def _answer_generation_candidates_query(self, days_back: int = 1):
+        """需要生成答案的问题查询（不含排序和分页）"""
         cutoff_time = datetime.utcnow() - timedelta(days=days_back)
 
-        query = db.session.query(Question).filter(
+        return db.session.query(Question).filter(
             and_(
                 Question.created_at >= cutoff_time,
                 # ① 不再要求必须已经有分类
@@ -679,12 +1032,49 @@ class AIProcessingService:
                     ['pending', 'classified', 'answer_generation_failed']
                 )
             )
-        ).order_by(Question.created_at.desc())
-
-        if limit:
-            query = query.limit(limit)
-
-        return query.all()
+        )
+    
+    def _select_questions(self, stage: str, query, limit: Optional[int] = None) -> List[Question]:
+        """
+        执行阶段的候选问题查询
+        
+        启用工作队列（WORK_QUEUE_ENABLED）时，候选问题先入队，只返回本进程领取到租约的问题，
+        多个工作进程同时运行也不会重复处理；租约在阶段方法结束时结算。
+        """
+        if not work_queue_service.enabled:
+            if limit:
+                query = query.limit(limit)
+            return query.all()
+        
+        questions, lease = work_queue_service.claim_questions(stage, query, limit)
+        self._held_leases().append(lease)
+        return questions
+    
+    def _held_leases(self) -> list:
+        """本线程当前持有的工作队列租约"""
+        leases = getattr(self._local, 'leases', None)
+        if leases is None:
+            leases = self._local.leases = []
+        return leases
+    
+    def _extend_work_leases(self) -> None:
+        """处理循环中调用：为本线程持有的租约续期（按租约时长的三分之一节流），避免长批次处理期间被其他进程重新领取"""
+        for lease in self._held_leases():
+            work_queue_service.heartbeat(lease)
+    
+    def _settle_work_leases(self, error: Optional[str] = None) -> None:
+        """结算本线程持有的租约：已处理完的条目完成，仍需处理的退避后重试"""
+        leases = self._held_leases()
+        while leases:
+            lease = leases.pop()
+            try:
+                result = work_queue_service.settle(lease, error)
+                if lease.business_ids:
+                    self.logger.info(f"工作队列 {lease.stage} 租约结算: {result}")
+            except Exception as e:
+                # 结算失败时条目在租约到期后会被重新领取
+                db.session.rollback()
+                self.logger.error(f"工作队列 {lease.stage} 租约结算失败: {str(e)}")
     
     def _get_questions_for_scoring(
         self, 
@@ -692,73 +1082,150 @@ class AIProcessingService:
         days_back: int = 1
     ) -> List[Dict[str, Any]]:
         """获取需要评分的问题组（按问题分组，包含多个AI模型答案）"""
+        question_groups = []
+        for page in self._iter_questions_for_scoring(limit, days_back):
+            question_groups.extend(page)
+        return question_groups
+    
+    def _iter_questions_for_scoring(
+        self,
+        limit: Optional[int] = None,
+        days_back: int = 1,
+        page_size: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        按页产出需要评分的问题组（按创建时间倒序，以 (created_at, id) 为游标做键集分页）
+        
+        每页两次查询：一次分组查询选出yoyo/豆包/小天三个答案都存在且都未评分的问题，
+        一次查询取回这些问题的答案。翻页不使用 OFFSET，积压再多每页代价也不变。
+        
+        Args:
+            limit: 最多产出的问题数，None 表示全部
+            days_back: 处理最近几天的数据
+            page_size: 每页问题数，未指定时取 SCORING_PAGE_SIZE
+        """
         cutoff_time = datetime.utcnow() - timedelta(days=days_back)
+        page_size = page_size or Config.SCORING_PAGE_SIZE
+        remaining = limit
+        cursor = None
         
-        # 查询有答案的问题（优化：只查询已生成答案但未评分的问题）
-        questions_with_answers = db.session.query(Question).join(Answer).filter(
-            and_(
-                Question.created_at >= cutoff_time,
-                Question.classification.isnot(None),
-                Question.classification != '',
-                Question.processing_status.in_(['answers_generated', 'scoring']),
-                Answer.answer_text.isnot(None),
-                Answer.answer_text != ''
-            )
-        ).distinct().order_by(Question.created_at.desc())
+        if work_queue_service.enabled:
+            yield from self._claim_scoring_pages(cutoff_time, page_size, limit)
+            return
         
-        if limit:
-            questions_with_answers = questions_with_answers.limit(limit)
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            question_groups, cursor = self._get_scoring_page(cutoff_time, size, cursor)
+            if question_groups:
+                yield question_groups
+            if cursor is None:
+                return
+            if remaining is not None:
+                remaining -= len(question_groups)
+    
+    def _claim_scoring_pages(
+        self,
+        cutoff_time: datetime,
+        page_size: int,
+        limit: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """工作队列模式下按页领取待评分问题：候选问题只入队一次，之后每页领取一次租约"""
+        candidates = self._scoring_candidates_query(cutoff_time).order_by(
+            Question.created_at.desc(), Question.id.desc()
+        )
+        remaining = limit
+        enqueue = True
         
-        question_groups = []
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            questions, lease = work_queue_service.claim_questions('scoring', candidates, size, enqueue=enqueue)
+            self._held_leases().append(lease)
+            enqueue = False
+            if questions:
+                yield self._build_scoring_groups(questions)
+            if len(lease) < size:
+                return
+            if remaining is not None:
+                remaining -= len(lease)
+    
+    def _scoring_candidates_query(self, cutoff_time: datetime):
+        """
+        待评分问题的分组查询（不含排序和分页）
         
-        for question in questions_with_answers:
-            # 获取该问题的所有AI模型答案
-            answers = db.session.query(Answer).filter(
-                and_(
-                    Answer.question_business_id == question.business_id,
-                    Answer.is_scored == False,
-                    Answer.answer_text.isnot(None),
-                    Answer.answer_text != ''
-                )
-            ).all()
-            
-            if not answers:
-                continue
-            
-            # 按assistant_type分组
-            answers_by_type = {}
-            for answer in answers:
-                answers_by_type[answer.assistant_type] = {
-                    'id': answer.id,
-                    'answer_text': answer.answer_text,
-                    'assistant_type': answer.assistant_type,
-                    'is_scored': answer.is_scored
-                }
-            
-            # 只有包含完整三个AI模型答案且未评分的问题才进行评分（符合设计要求）
-            # 注意：数据库中实际存储的是 yoyo, doubao, xiaotian
-            required_types = {'yoyo', 'doubao', 'xiaotian'}
-            available_types = set(answers_by_type.keys())
-
-            if required_types.issubset(available_types):  # 必须有完整的三个答案
-                # 检查三个答案是否都未评分
-                all_unscored = all(
-                    not answers_by_type[ai_type]['is_scored']
-                    for ai_type in required_types
-                )
-
-                if all_unscored:
-                    question_groups.append({
-                        'question': question,
-                        'answers': answers_by_type
-                    })
-                    self.logger.info(f"添加问题到评分队列: {question.business_id} (包含{len(required_types)}个AI答案)")
-                else:
-                    self.logger.debug(f"跳过问题 {question.business_id}：已有答案被评分")
-            else:
-                missing_types = required_types - available_types
-                self.logger.info(f"跳过问题 {question.business_id}：缺少答案类型 {missing_types}, 现有类型 {available_types}")
+        只有包含完整三个AI模型答案且都未评分的问题才进行评分（符合设计要求）
+        注意：数据库中实际存储的是 yoyo, doubao, xiaotian，同一问题每种类型最多一个答案
+        """
+        return db.session.query(Question).join(
+            Answer, Answer.question_business_id == Question.business_id
+        ).filter(
+            Question.created_at >= cutoff_time,
+            Question.classification.isnot(None),
+            Question.classification != '',
+            Question.processing_status.in_(['answers_generated', 'scoring']),
+            *self._scoring_answer_filters()
+        ).group_by(Question.id).having(
+            func.count(func.distinct(Answer.assistant_type)) == len(SCORING_ASSISTANT_TYPES)
+        )
+    
+    def _scoring_answer_filters(self) -> list:
+        return [
+            Answer.assistant_type.in_(SCORING_ASSISTANT_TYPES),
+            Answer.is_scored == False,
+            Answer.answer_text.isnot(None),
+            Answer.answer_text != ''
+        ]
+    
+    def _get_scoring_page(
+        self,
+        cutoff_time: datetime,
+        page_size: int,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[datetime, int]]]:
+        """
+        查询一页待评分的问题组
         
+        Returns:
+            (问题组列表, 下一页游标；没有下一页时为 None)
+        """
+        query = self._scoring_candidates_query(cutoff_time)
+        if after is not None:
+            after_created_at, after_id = after
+            query = query.filter(or_(
+                Question.created_at < after_created_at,
+                and_(Question.created_at == after_created_at, Question.id < after_id)
+            ))
+        
+        questions = query.order_by(Question.created_at.desc(), Question.id.desc()).limit(page_size).all()
+        
+        if not questions:
+            return [], None
+        
+        question_groups = self._build_scoring_groups(questions)
+        next_cursor = (questions[-1].created_at, questions[-1].id) if len(questions) == page_size else None
+        return question_groups, next_cursor
+    
+    def _build_scoring_groups(self, questions: List[Question]) -> List[Dict[str, Any]]:
+        """一次查询取回这些问题的未评分答案，组装为问题组"""
+        answers_by_question: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        answer_rows = db.session.query(
+            Answer.id, Answer.question_business_id, Answer.assistant_type, Answer.answer_text
+        ).filter(
+            Answer.question_business_id.in_([question.business_id for question in questions]),
+            *self._scoring_answer_filters()
+        )
+        for answer_id, business_id, assistant_type, answer_text in answer_rows:
+            answers_by_question.setdefault(business_id, {})[assistant_type] = {
+                'id': answer_id,
+                'answer_text': answer_text,
+                'assistant_type': assistant_type,
+                'is_scored': False
+            }
+        
+        question_groups = [
+            {'question': question, 'answers': answers_by_question.get(question.business_id, {})}
+            for question in questions
+        ]
+        self.logger.info(f"本页选出 {len(question_groups)} 个待评分问题组（包含{len(SCORING_ASSISTANT_TYPES)}个AI答案）")
         return question_groups
     
     def _get_unscored_answers(
@@ -885,7 +1352,7 @@ class AIProcessingService:
                 )
             ).scalar()
             
-            return {
+            statistics = {
                 'time_range': f'最近{days_back}天',
                 'questions': {
                     'total': total_questions,
@@ -902,6 +1369,11 @@ class AIProcessingService:
                     }
                 }
             }
+            if work_queue_service.enabled:
+                statistics['work_queue'] = work_queue_service.get_stats()
+            if result_journal.enabled:
+                statistics['result_journal'] = result_journal.get_stats()
+            return statistics
             
         except Exception as e:
             self.logger.error(f"获取处理统计失败: {str(e)}")
@@ -4,16 +4,23 @@ API客户端基类模块
 """
 import json
 import logging
+import threading
 import time
 import uuid
 from abc import ABC, abstractmethod
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Union, cast
+from urllib.parse import urlsplit
 
 import requests
-from requests.adapters import HTTPAdapter
 
 from app.config import Config
+from app.services.http_cassette import cassette_transport, CassetteMissError
+from app.services.rate_limiter import rate_limiter_registry, parse_retry_after
+from app.services.circuit_breaker import circuit_breaker_registry
+from app.services.request_coalescer import request_coalescer
+from app.services.request_hedging import request_hedger_registry
+from app.services.metrics import metrics_registry, API_REQUEST_DURATION, API_REQUESTS_TOTAL, API_RETRIES_TOTAL
 from app.exceptions import (
     APIException,
     APITimeoutException,
@@ -22,7 +29,8 @@ from app.exceptions import (
     APIAuthenticationException,
     APIValidationException,
     APIServerException,
-    APIResponseException
+    APIResponseException,
+    APICircuitOpenException
 )
 
 
@@ -31,13 +39,22 @@ class BaseAPIClient(ABC):
     API客户端基类
     
     提供统一的外部API调用基础设施，包含：
-    - HTTP请求处理
+    - HTTP请求处理（共享长连接传输层）
     - 自动重试机制
     - 超时控制
     - 错误处理
     - 请求/响应日志记录
     - 性能监控
+    - 按外部API的自适应限流（令牌桶 + AIMD并发）
+    - 按外部API的熔断（错误率/连续超时触发，打开期间快速失败）
+    - 相同载荷的并发请求合并为一次外部调用（single-flight）
     """
+
+    # 限流器名称，对应 API_RATE_LIMITS / 系统配置 api.rate_limit.<client_name>.*
+    client_name = 'default'
+
+    # 对冲执行器，仅答案生成类客户端设置（见 API_HEDGING_*）
+    hedger = None
     
     def __init__(
         self,
@@ -69,26 +86,123 @@ class BaseAPIClient(ABC):
         # 配置日志记录器
         self.logger = logging.getLogger(f"{__name__}.{self.__class__.__name__}")
         
-        # 创建HTTP会话
-        self.session = self._create_session()
+        # 所有客户端共享同一个长连接传输层，客户端只保留各自的默认请求头；
+        # HTTP_CASSETTE_MODE 为 record / replay 时经磁带录制或回放（见 http_cassette）
+        self.transport = cassette_transport
+        self.default_headers = self._build_default_headers()
+
+        # 同一外部API的所有客户端实例、所有线程共享一个限流器
+        self.rate_limiter = rate_limiter_registry.get(self.client_name)
+        self.circuit_breaker = circuit_breaker_registry.get(self.client_name)
         
-        # 请求统计
+        # 请求统计（多个线程可能同时更新）
+        self._stats_lock = threading.Lock()
         self.request_stats = {
             'total_requests': 0,
             'successful_requests': 0,
             'failed_requests': 0,
             'total_response_time': 0.0
         }
+
+    def _update_stats(self, **deltas) -> None:
+        """线程安全地累加统计"""
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self.request_stats[key] += delta
+
+    def _get_endpoint_label(self, url: str) -> str:
+        """指标中的端点标签：请求URL的路径"""
+        return urlsplit(url).path or '/'
     
-    def _create_session(self) -> requests.Session:
-        """创建HTTP会话"""
-        session = requests.Session()
-        
-        # 设置默认请求头
-        session.headers.update(Config.API_REQUEST_HEADERS)
-        session.headers.update(self._get_auth_headers())
-        
-        return session
+    def _build_default_headers(self) -> Dict[str, str]:
+        """构建客户端默认请求头"""
+        headers = dict(Config.API_REQUEST_HEADERS)
+        headers.update(self._get_auth_headers())
+        return headers
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发送请求（请求头需为完整值）
+
+        载荷相同的请求已在途时不再发出，等待并共享其响应；响应体已完整读取，可被多个调用方解析。
+        """
+        key = request_coalescer.make_key(
+            self.client_name, method, url, kwargs.get('json'), kwargs.get('params')
+        )
+        return request_coalescer.execute(
+            self.client_name, key, lambda: self._dispatch(method, url, **kwargs)
+        )
+
+    def _dispatch(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        通过共享传输层实际发出请求
+
+        发送前检查熔断状态（打开时抛出 APICircuitOpenException，不再消耗超时与重试），
+        再向限流器申请令牌和并发名额；请求结果同时反馈给熔断器和限流器，并记录延迟与状态码指标。
+        """
+        endpoint = self._get_endpoint_label(url)
+        try:
+            self.circuit_breaker.before_request()
+        except APICircuitOpenException:
+            metrics_registry.record_api_request(self.client_name, endpoint, 'circuit_open')
+            raise
+        try:
+            slot = self.rate_limiter.acquire()
+        except APIException:
+            self.circuit_breaker.release_probe()
+            metrics_registry.record_api_request(self.client_name, endpoint, 'rate_limited_local')
+            raise
+
+        start_time = time.time()
+        try:
+            response = self.transport.request(method, url, **kwargs)
+        except CassetteMissError:
+            # 回放模式下磁带未命中：请求没有发出，不计入熔断失败、限流反馈和错误指标
+            slot.release()
+            self.circuit_breaker.release_probe()
+            metrics_registry.record_api_request(self.client_name, endpoint, 'cassette_miss')
+            raise
+        except requests.exceptions.Timeout:
+            slot.record_timeout()
+            self.circuit_breaker.record_failure(timeout=True)
+            metrics_registry.record_api_request(self.client_name, endpoint, 'timeout', time.time() - start_time)
+            raise
+        except requests.exceptions.ConnectionError:
+            slot.record_error()
+            self.circuit_breaker.record_failure()
+            metrics_registry.record_api_request(self.client_name, endpoint, 'connection_error', time.time() - start_time)
+            raise
+        except Exception:
+            slot.record_error()
+            self.circuit_breaker.record_failure()
+            metrics_registry.record_api_request(self.client_name, endpoint, 'error', time.time() - start_time)
+            raise
+
+        metrics_registry.record_api_request(
+            self.client_name, endpoint, response.status_code, time.time() - start_time
+        )
+
+        if response.status_code == 429:
+            slot.record_throttled(parse_retry_after(response.headers.get('Retry-After')))
+            self.circuit_breaker.release_probe()
+        elif response.status_code >= 500:
+            if response.status_code == 503:
+                slot.record_overloaded()
+            else:
+                slot.record_error()
+            self.circuit_breaker.record_failure()
+        else:
+            slot.record_success(response.elapsed.total_seconds())
+            self.circuit_breaker.record_success()
+        return response
+
+    def _get_retry_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """重试等待时间：429 且带 Retry-After 时遵守服务端要求，否则按指数退避"""
+        if response is not None and response.status_code == 429:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+        return self.retry_delay * (self.backoff_factor ** attempt)
     
     @abstractmethod
     def _get_auth_headers(self) -> Dict[str, str]:
@@ -161,10 +275,10 @@ class BaseAPIClient(ABC):
                 validation_errors=error_data
             )
         elif status_code == 429:
-            retry_after = response.headers.get('Retry-After')
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
             raise APIRateLimitException(
                 f"API调用频率超限: {error_data.get('error', 'Rate limit exceeded')}",
-                retry_after=int(retry_after) if retry_after else None
+                retry_after=int(retry_after + 0.999) if retry_after is not None else None
             )
         elif 500 <= status_code < 600:
             raise APIServerException(
@@ -217,9 +331,9 @@ class BaseAPIClient(ABC):
         
         for attempt in range(self.retry_times + 1):
             try:
-                response = self.session.request(
-                    method=method,
-                    url=url,
+                response = self._send(
+                    method,
+                    url,
                     json=data,
                     params=params,
                     headers=headers,
@@ -229,15 +343,18 @@ class BaseAPIClient(ABC):
                 # 如果是可重试的错误状态码，抛出异常进入重试逻辑
                 if response.status_code >= 500 or response.status_code == 429:
                     if attempt < self.retry_times:
-                        time.sleep(self.retry_delay * (self.backoff_factor ** attempt))
+                        metrics_registry.record_api_retry(self.client_name, self._get_endpoint_label(url))
+                        time.sleep(self._get_retry_delay(attempt, response))
                         continue
                 
                 return response
                 
             except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
                 last_exception = e
-                if attempt < self.retry_times:
+                # 磁带未命中是确定性的，重试没有意义
+                if attempt < self.retry_times and not isinstance(e, CassetteMissError):
                     self.logger.warning(f"请求失败，{self.retry_delay * (self.backoff_factor ** attempt):.1f}秒后重试 (尝试 {attempt + 1}/{self.retry_times + 1}): {str(e)}")
+                    metrics_registry.record_api_retry(self.client_name, self._get_endpoint_label(url))
                     time.sleep(self.retry_delay * (self.backoff_factor ** attempt))
                     continue
                 else:
@@ -281,12 +398,12 @@ class BaseAPIClient(ABC):
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         
         # 合并请求头
-        request_headers = dict(self.session.headers)
+        request_headers = dict(self.default_headers)
         if headers:
             request_headers.update(headers)
         
         # 更新统计信息
-        self.request_stats['total_requests'] += 1
+        self._update_stats(total_requests=1)
         
         # 记录请求日志（确保headers都是字符串类型）
         log_headers = {k: str(v) for k, v in request_headers.items()}
@@ -300,35 +417,40 @@ class BaseAPIClient(ABC):
                 url=url,
                 data=data,
                 params=params,
-                headers=headers
+                headers=request_headers
             )
             
             duration = time.time() - start_time
-            self.request_stats['total_response_time'] += duration
+            self._update_stats(total_response_time=duration)
             
             # 记录响应日志
             self._log_response(request_id, response, duration)
             
             # 检查响应状态
             if not response.ok:
-                self.request_stats['failed_requests'] += 1
+                self._update_stats(failed_requests=1)
                 self._handle_response_error(response)
             
-            self.request_stats['successful_requests'] += 1
+            self._update_stats(successful_requests=1)
             return self._parse_response(response)
+
+        except APICircuitOpenException as e:
+            self._update_stats(failed_requests=1)
+            self.logger.warning(f"[{request_id}] {str(e)}")
+            raise
             
         except requests.exceptions.Timeout as e:
-            self.request_stats['failed_requests'] += 1
+            self._update_stats(failed_requests=1)
             self.logger.error(f"[{request_id}] API请求超时: {str(e)}")
             raise APITimeoutException(f"API请求超时: {str(e)}", timeout=self.timeout)
             
         except requests.exceptions.ConnectionError as e:
-            self.request_stats['failed_requests'] += 1
+            self._update_stats(failed_requests=1)
             self.logger.error(f"[{request_id}] API连接失败: {str(e)}")
             raise APIConnectionException(f"API连接失败: {str(e)}")
             
         except requests.exceptions.RequestException as e:
-            self.request_stats['failed_requests'] += 1
+            self._update_stats(failed_requests=1)
             self.logger.error(f"[{request_id}] API请求异常: {str(e)}")
             raise APIException(f"API请求异常: {str(e)}")
     
@@ -375,36 +497,47 @@ class BaseAPIClient(ABC):
         Returns:
             包含请求统计信息的字典
         """
-        total_requests = self.request_stats['total_requests']
+        with self._stats_lock:
+            request_stats = dict(self.request_stats)
+
+        total_requests = request_stats['total_requests']
         if total_requests > 0:
-            success_rate = (self.request_stats['successful_requests'] / total_requests) * 100
-            avg_response_time = self.request_stats['total_response_time'] / total_requests
+            success_rate = (request_stats['successful_requests'] / total_requests) * 100
+            avg_response_time = request_stats['total_response_time'] / total_requests
         else:
             success_rate = 0.0
             avg_response_time = 0.0
         
         return {
             'total_requests': total_requests,
-            'successful_requests': self.request_stats['successful_requests'],
-            'failed_requests': self.request_stats['failed_requests'],
+            'successful_requests': request_stats['successful_requests'],
+            'failed_requests': request_stats['failed_requests'],
             'success_rate': round(success_rate, 2),
             'average_response_time': round(avg_response_time, 3),
-            'total_response_time': round(self.request_stats['total_response_time'], 3)
+            'total_response_time': round(request_stats['total_response_time'], 3),
+            # 按端点的单次请求延迟分位数、状态码与重试次数（进程内所有同名客户端合计）
+            'latency': metrics_registry.get_latency_summary(API_REQUEST_DURATION, {'client': self.client_name}),
+            'status_codes': metrics_registry.get_counter_values(API_REQUESTS_TOTAL, {'client': self.client_name}),
+            'retries': metrics_registry.get_counter_values(
+                API_RETRIES_TOTAL, {'client': self.client_name}, group_by='endpoint'
+            ),
+            'rate_limit': self.rate_limiter.get_stats(),
+            'circuit_breaker': self.circuit_breaker.get_stats(),
+            'coalescing': request_coalescer.get_stats(self.client_name),
+            'hedging': self.hedger.get_stats() if self.hedger is not None else None
         }
     
     def reset_stats(self) -> None:
         """重置统计信息"""
-        self.request_stats = {
-            'total_requests': 0,
-            'successful_requests': 0,
-            'failed_requests': 0,
-            'total_response_time': 0.0
-        }
+        with self._stats_lock:
+            self.request_stats = {
+                'total_requests': 0,
+                'successful_requests': 0,
+                'failed_requests': 0,
+                'total_response_time': 0.0
+            }
+        request_coalescer.reset_stats(self.client_name)
     
-    def __del__(self):
-        """析构函数，清理资源"""
-        if hasattr(self, 'session'):
-            self.session.close()
 
 
 # ============================================================================
@@ -417,6 +550,8 @@ class ClassificationAPIClient(BaseAPIClient):
     
     负责调用外部分类API，实现问题领域分类功能
     """
+
+    client_name = 'classification'
     
     def __init__(self):
         super().__init__(
@@ -463,7 +598,7 @@ class ClassificationAPIClient(BaseAPIClient):
         self.logger.info(f"开始问题分类: {question[:50]}...")
         
         try:
-            # 直接使用requests.post调用，符合用户的方式
+            # 按用户的请求格式调用，经共享传输层发送
             response = self._make_classification_request(body)
             
             if response.status_code == 200:
@@ -495,7 +630,7 @@ class ClassificationAPIClient(BaseAPIClient):
         })
         
         # 更新统计
-        self.request_stats['total_requests'] += 1
+        self._update_stats(total_requests=1)
         
         # 记录请求日志
         self.logger.info(f"[{request_id}] 发起分类API请求")
@@ -504,8 +639,9 @@ class ClassificationAPIClient(BaseAPIClient):
         start_time = time.time()
         
         try:
-            # 调用荣耀API格式的接口
-            response = requests.post(
+            # 调用荣耀API格式的接口（经共享连接池复用长连接）
+            response = self._send(
+                'POST',
                 self.base_url,  # 直接使用base_url，因为已经包含完整路径
                 json=body,
                 headers=headers,
@@ -513,7 +649,7 @@ class ClassificationAPIClient(BaseAPIClient):
             )
             
             duration = time.time() - start_time
-            self.request_stats['total_response_time'] += duration
+            self._update_stats(total_response_time=duration)
             
             # 记录响应日志
             self.logger.info(
@@ -522,24 +658,30 @@ class ClassificationAPIClient(BaseAPIClient):
             )
             
             if response.status_code == 200:
-                self.request_stats['successful_requests'] += 1
+                self._update_stats(successful_requests=1)
             else:
-                self.request_stats['failed_requests'] += 1
+                self._update_stats(failed_requests=1)
             
             return response
+
+        except APIException as e:
+            # 熔断快速失败 / 本地限流超时，保留原异常类型
+            self._update_stats(failed_requests=1)
+            self.logger.warning(f"[{request_id}] 分类API请求未发出: {str(e)}")
+            raise
             
         except requests.exceptions.Timeout as e:
-            self.request_stats['failed_requests'] += 1
+            self._update_stats(failed_requests=1)
             self.logger.error(f"[{request_id}] 分类API请求超时: {str(e)}")
             raise APITimeoutException(f"分类API请求超时: {str(e)}", timeout=15)
             
         except requests.exceptions.ConnectionError as e:
-            self.request_stats['failed_requests'] += 1
+            self._update_stats(failed_requests=1)
             self.logger.error(f"[{request_id}] 分类API连接失败: {str(e)}")
             raise APIConnectionException(f"分类API连接失败: {str(e)}")
             
         except Exception as e:
-            self.request_stats['failed_requests'] += 1
+            self._update_stats(failed_requests=1)
             self.logger.error(f"[{request_id}] 分类API请求异常: {str(e)}")
             raise APIException(f"分类API请求异常: {str(e)}")
 
@@ -550,12 +692,15 @@ class DoubaoAPIClient(BaseAPIClient):
     
     负责调用豆包API生成回答
     """
+
+    client_name = 'doubao'
     
     def __init__(self):
         super().__init__(
             base_url=Config.DOUBAO_API_URL,
             api_key=Config.DOUBAO_API_KEY
         )
+        self.hedger = request_hedger_registry.get(self.client_name)
     
     def _get_auth_headers(self) -> Dict[str, str]:
         """获取豆包API认证头"""
@@ -603,7 +748,8 @@ class DoubaoAPIClient(BaseAPIClient):
         self.logger.info(f"开始豆包答案生成: {question[:50]}...")
         
         try:
-            result = self.post('/generate', data=payload)
+            # 开启对冲时，超过近期延迟分位数仍未返回会再发一次相同请求，先返回者胜出
+            result = self.hedger.execute(lambda: self.post('/generate', data=payload))
             
             self.logger.info(
                 f"豆包生成完成: 生成{result.get('tokens_used', 0)}个token"
@@ -622,12 +768,15 @@ class XiaotianAPIClient(BaseAPIClient):
     
     负责调用小天API生成回答
     """
+
+    client_name = 'xiaotian'
     
     def __init__(self):
         super().__init__(
             base_url=Config.XIAOTIAN_API_URL,
             api_key=Config.XIAOTIAN_API_KEY
         )
+        self.hedger = request_hedger_registry.get(self.client_name)
     
     def _get_auth_headers(self) -> Dict[str, str]:
         """获取小天API认证头"""
@@ -672,7 +821,8 @@ class XiaotianAPIClient(BaseAPIClient):
         self.logger.info(f"开始小天答案生成: {question[:50]}...")
         
         try:
-            result = self.post('/answer', data=payload)
+            # 开启对冲时，超过近期延迟分位数仍未返回会再发一次相同请求，先返回者胜出
+            result = self.hedger.execute(lambda: self.post('/answer', data=payload))
             
             self.logger.info(
                 f"小天生成完成: 回答长度{result.get('length', 0)}字符"
@@ -691,6 +841,8 @@ class ScoreAPIClient(BaseAPIClient):
     
     负责调用评分API实现五维评分
     """
+
+    client_name = 'score'
     
     def __init__(self):
         super().__init__(
@@ -750,7 +902,7 @@ class ScoreAPIClient(BaseAPIClient):
         self.logger.info(f"开始多模型答案评分: {question[:50]}...")
         
         try:
-            # 直接使用requests.post调用，符合用户的方式
+            # 按用户的请求格式调用，经共享传输层发送
             response = self._make_score_request(inputs)
             
             if response.status_code == 200:
@@ -794,7 +946,7 @@ class ScoreAPIClient(BaseAPIClient):
         })
         
         # 更新统计
-        self.request_stats['total_requests'] += 1
+        self._update_stats(total_requests=1)
         
         # 记录请求日志
         self.logger.info(f"[{request_id}] 发起评分API请求")
@@ -803,8 +955,9 @@ class ScoreAPIClient(BaseAPIClient):
         start_time = time.time()
         
         try:
-            # 调用荣耀API格式的接口
-            response = requests.post(
+            # 调用荣耀API格式的接口（经共享连接池复用长连接）
+            response = self._send(
+                'POST',
                 self.base_url,  # 直接使用base_url，因为已经包含完整路径
                 json=body,
                 headers=headers,
@@ -812,7 +965,7 @@ class ScoreAPIClient(BaseAPIClient):
             )
             
             duration = time.time() - start_time
-            self.request_stats['total_response_time'] += duration
+            self._update_stats(total_response_time=duration)
             
             # 记录响应日志
             self.logger.info(
@@ -821,24 +974,30 @@ class ScoreAPIClient(BaseAPIClient):
             )
             
             if response.status_code == 200:
-                self.request_stats['successful_requests'] += 1
+                self._update_stats(successful_requests=1)
             else:
-                self.request_stats['failed_requests'] += 1
+                self._update_stats(failed_requests=1)
             
             return response
+
+        except APIException as e:
+            # 熔断快速失败 / 本地限流超时，保留原异常类型
+            self._update_stats(failed_requests=1)
+            self.logger.warning(f"[{request_id}] 评分API请求未发出: {str(e)}")
+            raise
             
         except requests.exceptions.Timeout as e:
-            self.request_stats['failed_requests'] += 1
+            self._update_stats(failed_requests=1)
             self.logger.error(f"[{request_id}] 评分API请求超时: {str(e)}")
             raise APITimeoutException(f"评分API请求超时: {str(e)}", timeout=30)
             
         except requests.exceptions.ConnectionError as e:
-            self.request_stats['failed_requests'] += 1
+            self._update_stats(failed_requests=1)
             self.logger.error(f"[{request_id}] 评分API连接失败: {str(e)}")
             raise APIConnectionException(f"评分API连接失败: {str(e)}")
             
         except Exception as e:
-            self.request_stats['failed_requests'] += 1
+            self._update_stats(failed_requests=1)
             self.logger.error(f"[{request_id}] 评分API请求异常: {str(e)}")
             raise APIException(f"评分API请求异常: {str(e)}")
 
@@ -886,10 +1045,12 @@ class APIClientFactory:
     
     @classmethod
     def get_all_stats(cls) -> Dict[str, Dict[str, Any]]:
-        """获取所有客户端的统计信息"""
+        """获取所有客户端的统计信息（transport 为共享连接池的使用与复用情况及磁带录制/回放计数）"""
         stats = {}
         for name, client in cls._instances.items():
             stats[name] = client.get_stats()
+        stats['transport'] = cassette_transport.get_stats()
+        stats['coalescing'] = request_coalescer.get_stats()
         return stats
     
     @classmethod
@@ -897,11 +1058,11 @@ class APIClientFactory:
         """重置所有客户端的统计信息"""
         for client in cls._instances.values():
             client.reset_stats()
+        cassette_transport.reset_stats()
     
     @classmethod
     def close_all(cls) -> None:
-        """关闭所有客户端连接"""
-        for client in cls._instances.values():
-            if hasattr(client, 'session'):
-                client.session.close()
+        """关闭共享连接池与磁带文件、对冲线程池并清理客户端实例"""
+        cassette_transport.close()
+        request_hedger_registry.shutdown_all()
         cls._instances.clear() 
\ No newline at end of file
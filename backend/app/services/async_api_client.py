@@ -0,0 +1,782 @@
+"""
+异步API客户端模块
+基于 asyncio + aiohttp 的 BaseAPIClient 异步版本，每个客户端按配置限制并发请求数，
+重试与退避语义与同步客户端的 _make_request_with_retry 保持一致，
+便于服务层一次提交成百上千个问题并统一等待结果
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar, Union
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:
+    # aiohttp未安装时的备用处理
+    aiohttp = None
+
+from app.config import Config
+from app.services.rate_limiter import rate_limiter_registry, parse_retry_after
+from app.services.circuit_breaker import circuit_breaker_registry
+from app.services.request_coalescer import request_coalescer
+from app.services.metrics import metrics_registry
+from app.services.http_cassette import http_cassette, CassetteMissError
+from app.exceptions import (
+    APIException,
+    APITimeoutException,
+    APIConnectionException,
+    APIRateLimitException,
+    APIAuthenticationException,
+    APIValidationException,
+    APIServerException,
+    APIResponseException
+)
+
+T = TypeVar('T')
+
+
+class AsyncAPIResponse:
+    """异步请求的响应快照（在连接释放前读取完整响应体）"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], text: str):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class AsyncBaseAPIClient(ABC):
+    """
+    异步API客户端基类
+
+    - 每个事件循环各自持有 aiohttp 会话与并发信号量，可在多个线程的 asyncio.run 中复用同一实例
+    - max_concurrency 限制同一客户端同时在途的请求数
+    - 5xx / 429 / 连接错误 / 超时按 retry_delay * backoff_factor ** attempt 退避重试
+    """
+
+    client_name = 'base'
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        timeout: Optional[float] = None,
+        retry_times: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        backoff_factor: Optional[float] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        """
+        初始化异步API客户端
+
+        Args:
+            base_url: API基础URL
+            api_key: API密钥
+            timeout: 请求超时时间（秒）
+            retry_times: 重试次数
+            retry_delay: 重试延迟（秒）
+            backoff_factor: 退避因子
+            max_concurrency: 最大并发请求数，默认读取 ASYNC_API_MAX_CONCURRENCY
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp未安装，无法使用异步API客户端")
+
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout or Config.API_TIMEOUT
+        self.retry_times = retry_times or Config.API_RETRY_TIMES
+        self.retry_delay = retry_delay or Config.API_RETRY_DELAY
+        self.backoff_factor = backoff_factor or Config.API_RETRY_BACKOFF_FACTOR
+        self.max_concurrency = max_concurrency or Config.ASYNC_API_MAX_CONCURRENCY.get(self.client_name, 10)
+
+        self.logger = logging.getLogger(f"{__name__}.{self.__class__.__name__}")
+
+        # 与同步客户端共享同一外部API的进程级限流器和熔断器
+        self.rate_limiter = rate_limiter_registry.get(self.client_name)
+        self.circuit_breaker = circuit_breaker_registry.get(self.client_name)
+
+        # 事件循环 -> (会话, 并发信号量)
+        self._loop_resources: Dict[asyncio.AbstractEventLoop, tuple] = {}
+        self._resources_lock = threading.Lock()
+
+        # 请求统计（多个事件循环线程可能同时更新）
+        self._stats_lock = threading.Lock()
+        self.request_stats = {
+            'total_requests': 0,
+            'successful_requests': 0,
+            'failed_requests': 0,
+            'retried_requests': 0,
+            'total_response_time': 0.0,
+            'in_flight': 0,
+            'max_in_flight': 0
+        }
+
+    @abstractmethod
+    def _get_auth_headers(self) -> Dict[str, str]:
+        """获取认证请求头"""
+        pass
+
+    def _build_default_headers(self) -> Dict[str, str]:
+        """构建客户端默认请求头（与同步客户端一致）"""
+        headers = dict(Config.API_REQUEST_HEADERS)
+        headers.update(self._get_auth_headers())
+        return headers
+
+    def _get_loop_resources(self):
+        """获取当前事件循环的会话与信号量，不存在时创建"""
+        loop = asyncio.get_running_loop()
+        with self._resources_lock:
+            resources = self._loop_resources.get(loop)
+            if resources is None or resources[0].closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.max_concurrency,
+                    limit_per_host=self.max_concurrency
+                )
+                session = aiohttp.ClientSession(connector=connector)
+                resources = (session, asyncio.Semaphore(self.max_concurrency))
+                self._loop_resources[loop] = resources
+            return resources
+
+    async def close(self) -> None:
+        """关闭当前事件循环中的会话"""
+        loop = asyncio.get_running_loop()
+        with self._resources_lock:
+            resources = self._loop_resources.pop(loop, None)
+        if resources is not None and not resources[0].closed:
+            await resources[0].close()
+
+    def _update_stats(self, **deltas) -> None:
+        """线程安全地累加统计"""
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self.request_stats[key] += delta
+            self.request_stats['max_in_flight'] = max(
+                self.request_stats['max_in_flight'], self.request_stats['in_flight']
+            )
+
+    def _handle_response_error(self, response: AsyncAPIResponse) -> None:
+        """处理HTTP响应错误（与同步客户端相同的异常映射）"""
+        status_code = response.status_code
+
+        try:
+            error_data = response.json()
+        except (json.JSONDecodeError, ValueError):
+            error_data = {'error': response.text}
+        if not isinstance(error_data, dict):
+            error_data = {'error': str(error_data)}
+
+        if status_code == 401:
+            raise APIAuthenticationException(
+                f"API认证失败: {error_data.get('error', 'Unauthorized')}"
+            )
+        elif status_code == 400:
+            raise APIValidationException(
+                f"请求参数无效: {error_data.get('error', 'Bad Request')}",
+                validation_errors=error_data
+            )
+        elif status_code == 429:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            raise APIRateLimitException(
+                f"API调用频率超限: {error_data.get('error', 'Rate limit exceeded')}",
+                retry_after=int(retry_after + 0.999) if retry_after is not None else None
+            )
+        elif 500 <= status_code < 600:
+            raise APIServerException(
+                f"API服务器错误: {error_data.get('error', 'Internal Server Error')}",
+                status_code=status_code
+            )
+        else:
+            raise APIException(
+                f"API请求失败: {error_data.get('error', 'Unknown error')}",
+                status_code=status_code,
+                response_data=error_data
+            )
+
+    def _parse_response(self, response: AsyncAPIResponse) -> Dict[str, Any]:
+        """解析API响应"""
+        try:
+            return response.json()
+        except (json.JSONDecodeError, ValueError) as e:
+            raise APIResponseException(
+                f"API响应格式错误: {str(e)}",
+                response_text=response.text[:500]
+            )
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        json_data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncAPIResponse:
+        """发送单次请求；同一事件循环内载荷相同的请求已在途时等待并共享其响应"""
+        key = request_coalescer.make_key(self.client_name, method, url, json_data, params)
+        return await request_coalescer.execute_async(
+            self.client_name,
+            key,
+            lambda: self._dispatch(method, url, json_data, params, headers, timeout)
+        )
+
+    async def _dispatch(
+        self,
+        method: str,
+        url: str,
+        json_data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncAPIResponse:
+        """实际发出请求并读取完整响应（熔断打开时快速失败；限流器的阻塞等待放到线程中，不阻塞事件循环）"""
+        session, _ = self._get_loop_resources()
+        endpoint = urlsplit(url).path or '/'
+        try:
+            self.circuit_breaker.before_request()
+        except APIException:
+            metrics_registry.record_api_request(self.client_name, endpoint, 'circuit_open')
+            raise
+        try:
+            slot = await asyncio.to_thread(self.rate_limiter.acquire)
+        except BaseException as e:
+            self.circuit_breaker.release_probe()
+            if isinstance(e, APIException):
+                metrics_registry.record_api_request(self.client_name, endpoint, 'rate_limited_local')
+            raise
+
+        start_time = time.time()
+        try:
+            if http_cassette.replaying:
+                result = await self._replay_from_cassette(method, url, json_data, params)
+            else:
+                async with session.request(
+                    method,
+                    url,
+                    json=json_data,
+                    params=params,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout or self.timeout)
+                ) as response:
+                    text = await response.text()
+                    result = AsyncAPIResponse(response.status, dict(response.headers), text)
+                if http_cassette.recording:
+                    http_cassette.record(
+                        method, url, json_data, params,
+                        status_code=result.status_code,
+                        headers=result.headers,
+                        body=result.text,
+                        elapsed=time.time() - start_time
+                    )
+        except asyncio.TimeoutError:
+            if http_cassette.recording:
+                http_cassette.record(method, url, json_data, params, elapsed=time.time() - start_time, error='timeout')
+            slot.record_timeout()
+            self.circuit_breaker.record_failure(timeout=True)
+            metrics_registry.record_api_request(self.client_name, endpoint, 'timeout', time.time() - start_time)
+            raise
+        except asyncio.CancelledError:
+            slot.record_error()
+            self.circuit_breaker.release_probe()
+            raise
+        except BaseException as e:
+            slot.record_error()
+            self.circuit_breaker.record_failure()
+            status = 'connection_error' if isinstance(e, aiohttp.ClientConnectionError) else 'error'
+            if status == 'connection_error' and http_cassette.recording:
+                http_cassette.record(method, url, json_data, params, elapsed=time.time() - start_time, error=status)
+            metrics_registry.record_api_request(self.client_name, endpoint, status, time.time() - start_time)
+            raise
+
+        metrics_registry.record_api_request(self.client_name, endpoint, result.status_code, time.time() - start_time)
+        if result.status_code == 429:
+            slot.record_throttled(parse_retry_after(result.headers.get('Retry-After')))
+            self.circuit_breaker.release_probe()
+        elif result.status_code >= 500:
+            if result.status_code == 503:
+                slot.record_overloaded()
+            else:
+                slot.record_error()
+            self.circuit_breaker.record_failure()
+        else:
+            slot.record_success(time.time() - start_time)
+            self.circuit_breaker.record_success()
+        return result
+
+    async def _replay_from_cassette(
+        self,
+        method: str,
+        url: str,
+        json_data: Optional[Dict[str, Any]],
+        params: Optional[Dict[str, Any]]
+    ) -> AsyncAPIResponse:
+        """从磁带回放响应（不访问网络），录制的超时/连接失败按 aiohttp 的异常重新抛出"""
+        try:
+            entry = http_cassette.lookup(method, url, json_data, params)
+        except CassetteMissError as e:
+            raise aiohttp.ClientConnectionError(str(e))
+
+        delay = http_cassette.get_delay(entry)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if entry.get('e') == 'timeout':
+            raise asyncio.TimeoutError()
+        if entry.get('e'):
+            raise aiohttp.ClientConnectionError(f"回放录制的连接失败: {method.upper()} {entry['p']}")
+        return AsyncAPIResponse(entry['s'], dict(entry.get('h') or {}), entry.get('b') or '')
+
+    def _get_retry_delay(self, attempt: int, response: Optional[AsyncAPIResponse] = None) -> float:
+        """重试等待时间：429 且带 Retry-After 时遵守服务端要求，否则按指数退避"""
+        if response is not None and response.status_code == 429:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+        return self.retry_delay * (self.backoff_factor ** attempt)
+
+    async def _make_request_with_retry(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncAPIResponse:
+        """执行带重试的异步HTTP请求（语义同 BaseAPIClient._make_request_with_retry）"""
+        last_exception = None
+
+        for attempt in range(self.retry_times + 1):
+            delay = self.retry_delay * (self.backoff_factor ** attempt)
+            try:
+                response = await self._send(method, url, data, params, headers, timeout)
+
+                # 可重试的错误状态码：未到最后一次则退避后重试，否则交由调用方处理
+                if response.status_code >= 500 or response.status_code == 429:
+                    if attempt < self.retry_times:
+                        self._update_stats(retried_requests=1)
+                        metrics_registry.record_api_retry(self.client_name, urlsplit(url).path or '/')
+                        await asyncio.sleep(self._get_retry_delay(attempt, response))
+                        continue
+
+                return response
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                last_exception = e
+                if attempt < self.retry_times:
+                    self.logger.warning(
+                        f"请求失败，{delay:.1f}秒后重试 (尝试 {attempt + 1}/{self.retry_times + 1}): {str(e) or type(e).__name__}"
+                    )
+                    self._update_stats(retried_requests=1)
+                    metrics_registry.record_api_retry(self.client_name, urlsplit(url).path or '/')
+                    await asyncio.sleep(delay)
+                    continue
+                raise
+
+        if last_exception:
+            raise last_exception
+
+        raise APIException("所有重试均失败")
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncAPIResponse:
+        """
+        在并发信号量内执行带重试的请求，并把网络异常转换为平台API异常
+
+        Returns:
+            响应快照（状态码错误由调用方处理）
+        """
+        _, semaphore = self._get_loop_resources()
+        request_id = str(uuid.uuid4())
+
+        async with semaphore:
+            self._update_stats(total_requests=1, in_flight=1)
+            self.logger.debug(f"[{request_id}] 异步API请求开始 - {method} {url}")
+            start_time = time.time()
+            try:
+                response = await self._make_request_with_retry(method, url, data, params, headers, timeout)
+                duration = time.time() - start_time
+                self._update_stats(total_response_time=duration)
+                self.logger.info(f"[{request_id}] 异步API响应完成 - {response.status_code} ({duration:.3f}s)")
+
+                if response.ok:
+                    self._update_stats(successful_requests=1)
+                else:
+                    self._update_stats(failed_requests=1)
+                return response
+
+            except APIException as e:
+                # 熔断快速失败 / 本地限流超时
+                self._update_stats(failed_requests=1)
+                self.logger.warning(f"[{request_id}] 异步API请求未发出: {str(e)}")
+                raise
+
+            except asyncio.TimeoutError as e:
+                self._update_stats(failed_requests=1)
+                self.logger.error(f"[{request_id}] 异步API请求超时: {str(e)}")
+                raise APITimeoutException(f"API请求超时: {str(e)}", timeout=timeout or self.timeout)
+
+            except aiohttp.ClientConnectionError as e:
+                self._update_stats(failed_requests=1)
+                self.logger.error(f"[{request_id}] 异步API连接失败: {str(e)}")
+                raise APIConnectionException(f"API连接失败: {str(e)}")
+
+            except aiohttp.ClientError as e:
+                self._update_stats(failed_requests=1)
+                self.logger.error(f"[{request_id}] 异步API请求异常: {str(e)}")
+                raise APIException(f"API请求异常: {str(e)}")
+
+            finally:
+                self._update_stats(in_flight=-1)
+
+    async def post(
+        self,
+        endpoint: str,
+        data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """执行POST请求并解析JSON（请求头与默认请求头合并）"""
+        request_headers = self._build_default_headers()
+        if headers:
+            request_headers.update(headers)
+
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        response = await self._request('POST', url, data=data, params=params, headers=request_headers)
+        if not response.ok:
+            self._handle_response_error(response)
+        return self._parse_response(response)
+
+    async def gather(self, coroutines: Iterable[Awaitable[T]]) -> List[Union[T, Exception]]:
+        """
+        并发等待一批请求，单个请求失败不影响其他请求
+
+        Returns:
+            与输入顺序一致的结果列表，失败项为对应的异常对象
+        """
+        return await asyncio.gather(*coroutines, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取客户端统计信息"""
+        with self._stats_lock:
+            stats = dict(self.request_stats)
+
+        total_requests = stats['total_requests']
+        return {
+            'total_requests': total_requests,
+            'successful_requests': stats['successful_requests'],
+            'failed_requests': stats['failed_requests'],
+            'retried_requests': stats['retried_requests'],
+            'success_rate': round(stats['successful_requests'] / total_requests * 100, 2) if total_requests else 0.0,
+            'average_response_time': round(stats['total_response_time'] / total_requests, 3) if total_requests else 0.0,
+            'total_response_time': round(stats['total_response_time'], 3),
+            'in_flight': stats['in_flight'],
+            'max_in_flight': stats['max_in_flight'],
+            'max_concurrency': self.max_concurrency,
+            'rate_limit': self.rate_limiter.get_stats(),
+            'circuit_breaker': self.circuit_breaker.get_stats(),
+            'coalescing': request_coalescer.get_stats(self.client_name)
+        }
+
+    def reset_stats(self) -> None:
+        """重置统计信息"""
+        with self._stats_lock:
+            in_flight = self.request_stats['in_flight']
+            self.request_stats = {
+                'total_requests': 0,
+                'successful_requests': 0,
+                'failed_requests': 0,
+                'retried_requests': 0,
+                'total_response_time': 0.0,
+                'in_flight': in_flight,
+                'max_in_flight': in_flight
+            }
+
+
+# ============================================================================
+# 具体异步API客户端实现
+# ============================================================================
+
+class AsyncClassificationAPIClient(AsyncBaseAPIClient):
+    """问题分类API异步客户端"""
+
+    client_name = 'classification'
+
+    def __init__(self):
+        super().__init__(
+            base_url=Config.CLASSIFY_API_URL,
+            api_key=Config.CLASSIFY_API_KEY,
+            timeout=15
+        )
+
+    def _get_auth_headers(self) -> Dict[str, str]:
+        """获取分类API认证头 - 分类API需要Bearer认证"""
+        headers = {
+            'Content-Type': 'application/json'
+        }
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        return headers
+
+    async def classify_question(
+        self,
+        question: str,
+        answer: Optional[str] = None,
+        user_id: str = "00031559"
+    ) -> str:
+        """对问题进行分类，返回分类结果文本"""
+        body = {
+            "inputs": {
+                "QUERY": question,
+                "ANSWER": answer or ""
+            },
+            "response_mode": "blocking",
+            "user": user_id
+        }
+
+        # base_url 已包含完整路径，请求头与同步客户端一致只使用认证头
+        response = await self._request('POST', self.base_url, data=body, headers=self._get_auth_headers())
+        if response.status_code != 200:
+            raise APIException(
+                f"分类API请求失败，状态码: {response.status_code}",
+                status_code=response.status_code
+            )
+        return response.json()["data"]["outputs"]["text"]
+
+    async def classify_many(self, items: List[Dict[str, Optional[str]]]) -> List[Union[str, Exception]]:
+        """
+        批量并发分类
+
+        Args:
+            items: [{'question': ..., 'answer': ...}, ...]
+        """
+        return await self.gather(
+            self.classify_question(item['question'], item.get('answer')) for item in items
+        )
+
+
+class AsyncDoubaoAPIClient(AsyncBaseAPIClient):
+    """豆包AI API异步客户端"""
+
+    client_name = 'doubao'
+
+    def __init__(self):
+        super().__init__(
+            base_url=Config.DOUBAO_API_URL,
+            api_key=Config.DOUBAO_API_KEY
+        )
+
+    def _get_auth_headers(self) -> Dict[str, str]:
+        """获取豆包API认证头"""
+        return {
+            'Authorization': f'Bearer {self.api_key}',
+            'X-API-Key': self.api_key
+        }
+
+    async def generate_answer(
+        self,
+        question: str,
+        context: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """生成问题回答（返回结构同 DoubaoAPIClient.generate_answer）"""
+        payload = {
+            'question': question,
+            'context': context,
+            'max_tokens': max_tokens or 1000,
+            'temperature': temperature or 0.7,
+            'model': model or 'doubao-default'
+        }
+        return await self.post('/generate', data=payload)
+
+    async def generate_many(self, questions: List[str]) -> List[Union[Dict[str, Any], Exception]]:
+        """批量并发生成回答"""
+        return await self.gather(self.generate_answer(question) for question in questions)
+
+
+class AsyncXiaotianAPIClient(AsyncBaseAPIClient):
+    """小天AI API异步客户端"""
+
+    client_name = 'xiaotian'
+
+    def __init__(self):
+        super().__init__(
+            base_url=Config.XIAOTIAN_API_URL,
+            api_key=Config.XIAOTIAN_API_KEY
+        )
+
+    def _get_auth_headers(self) -> Dict[str, str]:
+        """获取小天API认证头"""
+        return {
+            'X-Auth-Token': self.api_key,
+            'Authorization': f'ApiKey {self.api_key}'
+        }
+
+    async def generate_answer(
+        self,
+        question: str,
+        context: Optional[str] = None,
+        style: Optional[str] = None,
+        max_length: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """生成问题回答（返回结构同 XiaotianAPIClient.generate_answer）"""
+        payload = {
+            'question': question,
+            'context': context,
+            'style': style or 'professional',
+            'max_length': max_length or 500
+        }
+        return await self.post('/answer', data=payload)
+
+    async def generate_many(self, questions: List[str]) -> List[Union[Dict[str, Any], Exception]]:
+        """批量并发生成回答"""
+        return await self.gather(self.generate_answer(question) for question in questions)
+
+
+class AsyncScoreAPIClient(AsyncBaseAPIClient):
+    """评分系统API异步客户端"""
+
+    client_name = 'score'
+
+    def __init__(self):
+        super().__init__(
+            base_url=Config.SCORE_API_URL,
+            api_key=Config.SCORE_API_KEY,
+            timeout=30
+        )
+
+    def _get_auth_headers(self) -> Dict[str, str]:
+        """获取评分API认证头 - 荣耀API使用Bearer认证"""
+        return {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+
+    async def score_multiple_answers(
+        self,
+        question: str,
+        our_answer: str,
+        doubao_answer: str,
+        xiaotian_answer: str,
+        classification: str
+    ) -> List[Dict[str, Any]]:
+        """对多个AI模型的答案进行评分（返回结构同 ScoreAPIClient.score_multiple_answers）"""
+        body = {
+            'inputs': {
+                'QUERY': question,
+                'ANSWER': our_answer,
+                'ANSWER_DOUBAO': doubao_answer,
+                'ANSWER_XIAOTIAN': xiaotian_answer,
+                'RESORT': classification
+            },
+            'response_mode': 'blocking',
+            'user': 'user'
+        }
+
+        response = await self._request('POST', self.base_url, data=body, headers=self._get_auth_headers())
+        if response.status_code != 200:
+            raise APIException(
+                f"评分API请求失败，状态码: {response.status_code}",
+                status_code=response.status_code
+            )
+        return json.loads(response.json()["data"]["outputs"]["text"])
+
+    async def score_many(self, items: List[Dict[str, str]]) -> List[Union[List[Dict[str, Any]], Exception]]:
+        """
+        批量并发评分
+
+        Args:
+            items: [{'question', 'our_answer', 'doubao_answer', 'xiaotian_answer', 'classification'}, ...]
+        """
+        return await self.gather(self.score_multiple_answers(**item) for item in items)
+
+
+# ============================================================================
+# 异步API客户端工厂类
+# ============================================================================
+
+class AsyncAPIClientFactory:
+    """异步API客户端工厂类（单例，会话按事件循环管理）"""
+
+    _instances: Dict[str, AsyncBaseAPIClient] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_client(cls, name: str, client_class) -> AsyncBaseAPIClient:
+        with cls._lock:
+            if name not in cls._instances:
+                cls._instances[name] = client_class()
+            return cls._instances[name]
+
+    @classmethod
+    def get_classification_client(cls) -> AsyncClassificationAPIClient:
+        """获取分类API异步客户端（单例）"""
+        return cls._get_client('classification', AsyncClassificationAPIClient)
+
+    @classmethod
+    def get_doubao_client(cls) -> AsyncDoubaoAPIClient:
+        """获取豆包API异步客户端（单例）"""
+        return cls._get_client('doubao', AsyncDoubaoAPIClient)
+
+    @classmethod
+    def get_xiaotian_client(cls) -> AsyncXiaotianAPIClient:
+        """获取小天API异步客户端（单例）"""
+        return cls._get_client('xiaotian', AsyncXiaotianAPIClient)
+
+    @classmethod
+    def get_score_client(cls) -> AsyncScoreAPIClient:
+        """获取评分API异步客户端（单例）"""
+        return cls._get_client('score', AsyncScoreAPIClient)
+
+    @classmethod
+    def get_all_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """获取所有异步客户端的统计信息"""
+        return {name: client.get_stats() for name, client in list(cls._instances.items())}
+
+    @classmethod
+    def reset_all_stats(cls) -> None:
+        """重置所有异步客户端的统计信息"""
+        for client in list(cls._instances.values()):
+            client.reset_stats()
+
+    @classmethod
+    async def close_all(cls) -> None:
+        """关闭所有客户端在当前事件循环中的会话"""
+        for client in list(cls._instances.values()):
+            await client.close()
+
+
+def run_async(coroutine_factory: Callable[[], Awaitable[T]]) -> T:
+    """
+    在新的事件循环中执行异步任务并等待结果（供同步的服务层调用）
+
+    结束时关闭本次事件循环中创建的客户端会话。
+
+    Example:
+        results = run_async(lambda: AsyncAPIClientFactory.get_doubao_client().generate_many(questions))
+    """
+    async def runner():
+        try:
+            return await coroutine_factory()
+        finally:
+            await AsyncAPIClientFactory.close_all()
+
+    return asyncio.run(runner())
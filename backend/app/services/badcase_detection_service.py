@@ -62,24 +62,6 @@ class BadcaseDetectionService:
                 self.logger.debug(f"问题 {question_business_id} 的yoyo答案没有评分记录")
                 return False
             
-            # 检查五个维度的评分
-            low_score_dimensions = []
-            dimension_scores = [
-                (score_record.dimension_1_name, score_record.score_1),
-                (score_record.dimension_2_name, score_record.score_2),
-                (score_record.dimension_3_name, score_record.score_3),
-                (score_record.dimension_4_name, score_record.score_4),
-                (score_record.dimension_5_name, score_record.score_5)
-            ]
-            
-            for dimension_name, score in dimension_scores:
-                if dimension_name and score is not None and score < threshold:
-                    low_score_dimensions.append({
-                        "dimension_name": dimension_name,
-                        "score": float(score),
-                        "threshold": threshold
-                    })
-            
             # 更新问题的badcase状态
             question = db.session.query(Question).filter_by(
                 business_id=question_business_id
@@ -89,38 +71,7 @@ class BadcaseDetectionService:
                 self.logger.error(f"问题 {question_business_id} 不存在")
                 return False
             
-            is_badcase = len(low_score_dimensions) > 0
-            question.is_badcase = is_badcase
-            
-            if is_badcase:
-                question.badcase_detected_at = datetime.utcnow()
-                question.badcase_dimensions = json.dumps({
-                    "low_score_dimensions": low_score_dimensions,
-                    "detection_threshold": threshold,
-                    "detected_at": datetime.utcnow().isoformat()
-                }, ensure_ascii=False)
-                
-                # 如果之前不是badcase，重置复核状态
-                if question.badcase_review_status != 'pending':
-                    question.badcase_review_status = 'pending'
-                    question.reviewed_at = None
-                
-                self.logger.info(
-                    f"检测到badcase: {question_business_id}, "
-                    f"低分维度: {[d['dimension_name'] for d in low_score_dimensions]}, "
-                    f"阈值: {threshold}"
-                )
-            else:
-                # 如果之前是badcase但现在不是，清除相关信息
-                if question.is_badcase:
-                    question.badcase_detected_at = None
-                    question.badcase_dimensions = None
-                    question.badcase_review_status = 'pending'
-                    question.reviewed_at = None
-                
-                self.logger.debug(f"问题 {question_business_id} 不是badcase")
-            
-            question.updated_at = datetime.utcnow()
+            is_badcase = self.apply_badcase_result(question, score_record, threshold)
             db.session.commit()
             
             return is_badcase
@@ -130,6 +81,70 @@ class BadcaseDetectionService:
             db.session.rollback()
             return False
     
+    def apply_badcase_result(self, question: Question, score_record: Score, threshold: float) -> bool:
+        """
+        按yoyo答案的评分记录设置问题的badcase状态（只修改对象，不提交）
+        
+        Args:
+            question: 问题对象
+            score_record: yoyo答案的评分记录
+            threshold: badcase评分阈值
+            
+        Returns:
+            bool: True表示是badcase，False表示不是
+        """
+        # 检查五个维度的评分
+        low_score_dimensions = []
+        dimension_scores = [
+            (score_record.dimension_1_name, score_record.score_1),
+            (score_record.dimension_2_name, score_record.score_2),
+            (score_record.dimension_3_name, score_record.score_3),
+            (score_record.dimension_4_name, score_record.score_4),
+            (score_record.dimension_5_name, score_record.score_5)
+        ]
+        
+        for dimension_name, score in dimension_scores:
+            if dimension_name and score is not None and score < threshold:
+                low_score_dimensions.append({
+                    "dimension_name": dimension_name,
+                    "score": float(score),
+                    "threshold": threshold
+                })
+        
+        is_badcase = len(low_score_dimensions) > 0
+        question.is_badcase = is_badcase
+        
+        if is_badcase:
+            question.badcase_detected_at = datetime.utcnow()
+            question.badcase_dimensions = json.dumps({
+                "low_score_dimensions": low_score_dimensions,
+                "detection_threshold": threshold,
+                "detected_at": datetime.utcnow().isoformat()
+            }, ensure_ascii=False)
+            
+            # 如果之前不是badcase，重置复核状态
+            if question.badcase_review_status != 'pending':
+                question.badcase_review_status = 'pending'
+                question.reviewed_at = None
+            
+            self.logger.info(
+                f"检测到badcase: {question.business_id}, "
+                f"低分维度: {[d['dimension_name'] for d in low_score_dimensions]}, "
+                f"阈值: {threshold}"
+            )
+        else:
+            # 如果之前是badcase但现在不是，清除相关信息
+            if question.is_badcase:
+                question.badcase_detected_at = None
+                question.badcase_dimensions = None
+                question.badcase_review_status = 'pending'
+                question.reviewed_at = None
+            
+            self.logger.debug(f"问题 {question.business_id} 不是badcase")
+        
+        question.updated_at = datetime.utcnow()
+        return is_badcase
+    
     def batch_detect_badcases(self, question_business_ids: List[str] = None) -> Dict[str, Any]:
         """
         批量检测badcase
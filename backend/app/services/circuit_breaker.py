@@ -0,0 +1,220 @@
+"""
+外部API熔断服务
+每个外部API一个进程级熔断器（所有线程共享），状态：
+- closed: 正常放行，按最近请求窗口统计错误率与连续超时
+- open: 错误率或连续超时超过阈值后打开，期间请求直接快速失败
+- half_open: 打开时长到期后放行少量探测请求，探测成功则关闭，失败则重新打开
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.config import Config
+from app.exceptions import APICircuitOpenException
+
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """单个外部API的熔断器"""
+
+    def __init__(
+        self,
+        name: str,
+        window_size: Optional[int] = None,
+        min_requests: Optional[int] = None,
+        error_rate_threshold: Optional[float] = None,
+        consecutive_timeouts: Optional[int] = None,
+        open_seconds: Optional[float] = None,
+        half_open_probes: Optional[int] = None
+    ):
+        """
+        初始化熔断器
+
+        Args:
+            name: 外部API名称
+            window_size: 错误率统计窗口（最近请求数）
+            min_requests: 窗口内至少多少请求才按错误率判断
+            error_rate_threshold: 触发熔断的错误率（0-1）
+            consecutive_timeouts: 触发熔断的连续超时次数
+            open_seconds: 打开状态持续时间，到期后进入半开
+            half_open_probes: 半开状态允许同时在途的探测请求数
+        """
+        self.name = name
+        self.logger = logging.getLogger(f"{__name__}.{name}")
+        self.window_size = window_size or Config.CIRCUIT_BREAKER_WINDOW_SIZE
+        self.min_requests = min_requests or Config.CIRCUIT_BREAKER_MIN_REQUESTS
+        self.error_rate_threshold = error_rate_threshold or Config.CIRCUIT_BREAKER_ERROR_RATE
+        self.consecutive_timeouts_threshold = consecutive_timeouts or Config.CIRCUIT_BREAKER_CONSECUTIVE_TIMEOUTS
+        self.open_seconds = open_seconds or Config.CIRCUIT_BREAKER_OPEN_SECONDS
+        self.half_open_probes = half_open_probes or Config.CIRCUIT_BREAKER_HALF_OPEN_PROBES
+
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._outcomes = deque(maxlen=self.window_size)  # True 表示失败
+        self._consecutive_timeouts = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+
+        self.stats = {
+            'rejected': 0,
+            'opened': 0,
+            'probes': 0,
+            'last_opened_at': None,
+            'last_open_reason': None
+        }
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._check_half_open(time.monotonic())
+            return self._state
+
+    def _check_half_open(self, now: float) -> None:
+        """打开时长到期后转入半开（调用方已持有锁）"""
+        if self._state == STATE_OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = STATE_HALF_OPEN
+            self._probes_in_flight = 0
+            self.logger.info(f"[{self.name}] 熔断进入半开状态，开始探测")
+
+    def before_request(self) -> None:
+        """
+        请求发出前检查熔断状态
+
+        Raises:
+            APICircuitOpenException: 熔断打开，或半开状态下探测名额已满
+        """
+        if not Config.CIRCUIT_BREAKER_ENABLED:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._check_half_open(now)
+
+            if self._state == STATE_CLOSED:
+                return
+
+            if self._state == STATE_HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                self.stats['probes'] += 1
+                return
+
+            self.stats['rejected'] += 1
+            retry_after = max(0.0, self.open_seconds - (now - self._opened_at)) if self._state == STATE_OPEN else None
+
+        raise APICircuitOpenException(
+            f"{self.name} API熔断已打开，请求被快速拒绝",
+            retry_after=retry_after
+        )
+
+    def record_success(self) -> None:
+        """记录一次成功（包括4xx等服务端可正常响应的结果）"""
+        with self._lock:
+            self._consecutive_timeouts = 0
+            if self._state == STATE_HALF_OPEN:
+                self._close()
+                return
+            self._outcomes.append(False)
+
+    def record_failure(self, timeout: bool = False) -> None:
+        """记录一次失败（5xx、连接错误或超时）"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._open('半开探测失败')
+                return
+            if self._state == STATE_OPEN:
+                return
+
+            self._outcomes.append(True)
+            self._consecutive_timeouts = self._consecutive_timeouts + 1 if timeout else 0
+
+            if self._consecutive_timeouts >= self.consecutive_timeouts_threshold:
+                self._open(f'连续超时 {self._consecutive_timeouts} 次')
+                return
+
+            if len(self._outcomes) >= self.min_requests:
+                error_rate = sum(self._outcomes) / len(self._outcomes)
+                if error_rate >= self.error_rate_threshold:
+                    self._open(f'错误率 {error_rate:.0%}（最近 {len(self._outcomes)} 次请求）')
+
+    def release_probe(self) -> None:
+        """探测请求未产生成功/失败结论（如被限流）时归还探测名额"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def _open(self, reason: str) -> None:
+        """打开熔断（调用方已持有锁）"""
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._consecutive_timeouts = 0
+        self._probes_in_flight = 0
+        self.stats['opened'] += 1
+        self.stats['last_opened_at'] = datetime.now().isoformat()
+        self.stats['last_open_reason'] = reason
+        self.logger.warning(f"[{self.name}] 熔断打开: {reason}，{self.open_seconds}秒后探测恢复")
+
+    def _close(self) -> None:
+        """关闭熔断（调用方已持有锁）"""
+        self._state = STATE_CLOSED
+        self._outcomes.clear()
+        self._consecutive_timeouts = 0
+        self._probes_in_flight = 0
+        self.logger.info(f"[{self.name}] 探测成功，熔断关闭")
+
+    def reset(self) -> None:
+        """手动重置为关闭状态"""
+        with self._lock:
+            self._close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器状态"""
+        with self._lock:
+            now = time.monotonic()
+            self._check_half_open(now)
+            failures = sum(self._outcomes)
+            stats = dict(self.stats)
+            stats.update({
+                'enabled': Config.CIRCUIT_BREAKER_ENABLED,
+                'state': self._state,
+                'window_requests': len(self._outcomes),
+                'window_error_rate': round(failures / len(self._outcomes) * 100, 2) if self._outcomes else 0.0,
+                'consecutive_timeouts': self._consecutive_timeouts,
+                'open_remaining_seconds': round(
+                    max(0.0, self.open_seconds - (now - self._opened_at)), 2
+                ) if self._state == STATE_OPEN else 0.0
+            })
+            return stats
+
+
+class CircuitBreakerRegistry:
+    """进程级熔断器注册表"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        """获取（或创建）指定外部API的熔断器"""
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name)
+            return self._breakers[name]
+
+    def reset_all(self) -> None:
+        for breaker in list(self._breakers.values()):
+            breaker.reset()
+
+    def get_all_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.get_stats() for name, breaker in list(self._breakers.items())}
+
+
+# 创建全局熔断器注册表
+circuit_breaker_registry = CircuitBreakerRegistry()
@@ -0,0 +1,291 @@
+"""
+分类结果缓存服务
+两级缓存：进程内LRU + classification_cache 表。键为规范化问题文本与yoyo答案的 sha256，
+条目带分类器版本和过期时间，分类器变更时修改 CLASSIFICATION_CACHE_VERSION 即可整体失效
+"""
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.config import Config
+from app.utils.database import db, get_dialect_name
+from app.models.classification_cache import ClassificationCacheEntry
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """规范化文本：NFKC（全角转半角等）、去首尾空白、合并连续空白、转小写"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKC', str(value))
+    return _WHITESPACE_RE.sub(' ', value).strip().lower()
+
+
+def make_cache_key(query: Optional[str], answer: Optional[str]) -> str:
+    """由规范化后的问题和答案计算缓存键"""
+    raw = f"{normalize_text(query)}\x1f{normalize_text(answer)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ClassificationCache:
+    """分类结果两级缓存"""
+
+    def __init__(self, memory_size: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.memory_size = memory_size or Config.CLASSIFICATION_CACHE_MEMORY_SIZE
+
+        # cache_key -> (分类结果, 分类器版本, 过期时间)
+        self._memory: 'OrderedDict[str, Tuple[str, str, Optional[datetime]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'memory_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'errors': 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return Config.CLASSIFICATION_CACHE_ENABLED
+
+    @property
+    def version(self) -> str:
+        return Config.CLASSIFICATION_CACHE_VERSION
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _is_valid(self, version: str, expires_at: Optional[datetime], now: datetime) -> bool:
+        return version == self.version and (expires_at is None or expires_at > now)
+
+    def _remember(self, cache_key: str, classification: str, version: str, expires_at: Optional[datetime]) -> None:
+        """写入进程内LRU，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._memory[cache_key] = (classification, version, expires_at)
+            self._memory.move_to_end(cache_key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, query: Optional[str], answer: Optional[str]) -> Optional[str]:
+        """
+        查找缓存的分类结果
+
+        先查进程内LRU，未命中再查数据库并回填LRU；版本不一致或已过期的条目视为未命中。
+
+        Returns:
+            分类结果，未命中返回 None
+        """
+        return self.get_many([(query, answer)])[0]
+
+    def get_many(self, items: List[Tuple[Optional[str], Optional[str]]]) -> List[Optional[str]]:
+        """
+        批量查找缓存的分类结果（进程内LRU未命中的键合并为一次数据库查询）
+
+        Args:
+            items: [(问题, 答案)]
+
+        Returns:
+            与 items 一一对应的分类结果，未命中为 None
+        """
+        results: List[Optional[str]] = [None] * len(items)
+        if not self.enabled or not items:
+            return results
+
+        now = datetime.utcnow()
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for index, (query, answer) in enumerate(items):
+                cache_key = make_cache_key(query, answer)
+                cached = self._memory.get(cache_key)
+                if cached is not None:
+                    if self._is_valid(cached[1], cached[2], now):
+                        self._memory.move_to_end(cache_key)
+                        self.stats['memory_hits'] += 1
+                        results[index] = cached[0]
+                        continue
+                    del self._memory[cache_key]
+                missing.setdefault(cache_key, []).append(index)
+
+        if not missing:
+            return results
+
+        try:
+            entries = db.session.query(ClassificationCacheEntry).filter(
+                ClassificationCacheEntry.cache_key.in_(list(missing))
+            ).all()
+        except Exception as e:
+            self._count('errors')
+            self.logger.warning(f"批量读取分类缓存失败: {str(e)}")
+            return results
+
+        db_hits = 0
+        for entry in entries:
+            if not self._is_valid(entry.classifier_version, entry.expires_at, now):
+                continue
+            indexes = missing.pop(entry.cache_key)
+            for index in indexes:
+                results[index] = entry.classification
+            entry.hit_count = (entry.hit_count or 0) + len(indexes)
+            entry.last_hit_at = now
+            self._remember(entry.cache_key, entry.classification, entry.classifier_version, entry.expires_at)
+            db_hits += len(indexes)
+
+        with self._lock:
+            self.stats['db_hits'] += db_hits
+            self.stats['misses'] += sum(len(indexes) for indexes in missing.values())
+        return results
+
+    def _build_values(self, cache_key: str, classification: str, now: datetime) -> Dict[str, Any]:
+        ttl_days = Config.CLASSIFICATION_CACHE_TTL_DAYS
+        return {
+            'cache_key': cache_key,
+            'classification': classification,
+            'classifier_version': self.version,
+            'expires_at': now + timedelta(days=ttl_days) if ttl_days > 0 else None,
+            'hit_count': 0,
+            'created_at': now,
+            'updated_at': now
+        }
+
+    def put(self, query: Optional[str], answer: Optional[str], classification: Optional[str]) -> None:
+        """
+        写入分类结果（同一键已有条目时覆盖结果、版本和过期时间）
+
+        在调用方的会话中执行（包在 SAVEPOINT 内），随调用方事务提交；写入失败只记录日志，不影响分类流程。
+        """
+        if not self.enabled or not classification:
+            return
+
+        self.put_many([(query, answer, classification)])
+
+    def put_many(self, items: List[Tuple[Optional[str], Optional[str], Optional[str]]]) -> None:
+        """
+        批量写入分类结果 [(问题, 答案, 分类结果)]，一条多行 UPSERT 语句完成（同一键以最后一条为准）
+
+        与 put 相同：在调用方的会话中执行（SAVEPOINT 内），写入失败只记录日志。
+        """
+        if not self.enabled:
+            return
+
+        now = datetime.utcnow()
+        rows: Dict[str, Dict[str, Any]] = {}
+        for query, answer, classification in items:
+            if classification:
+                cache_key = make_cache_key(query, answer)
+                rows[cache_key] = self._build_values(cache_key, classification, now)
+        if not rows:
+            return
+
+        try:
+            with db.session.begin_nested():
+                self._upsert(list(rows.values()))
+        except Exception as e:
+            self._count('errors')
+            self.logger.warning(f"写入分类缓存失败: {str(e)}")
+            return
+
+        for values in rows.values():
+            self._remember(values['cache_key'], values['classification'], self.version, values['expires_at'])
+        with self._lock:
+            self.stats['writes'] += len(rows)
+
+    def _upsert(self, rows: List[Dict[str, Any]]) -> None:
+        """按缓存键插入或覆盖条目（键不重复）"""
+        dialect_name = get_dialect_name()
+        if dialect_name in ('postgresql', 'sqlite'):
+            if dialect_name == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(ClassificationCacheEntry.__table__).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['cache_key'],
+                set_={
+                    'classification': stmt.excluded.classification,
+                    'classifier_version': stmt.excluded.classifier_version,
+                    'expires_at': stmt.excluded.expires_at,
+                    'hit_count': 0,
+                    'created_at': stmt.excluded.created_at,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            )
+            db.session.execute(stmt)
+        else:
+            for values in rows:
+                entry = db.session.query(ClassificationCacheEntry).filter_by(cache_key=values['cache_key']).first()
+                if entry is None:
+                    db.session.add(ClassificationCacheEntry(**values))
+                else:
+                    for key, value in values.items():
+                        setattr(entry, key, value)
+
+    def invalidate(self, all_versions: bool = False) -> Dict[str, Any]:
+        """
+        清理失效条目并清空进程内LRU
+
+        Args:
+            all_versions: True 时删除全部条目；否则只删除旧版本和已过期的条目
+        """
+        try:
+            query = db.session.query(ClassificationCacheEntry)
+            if not all_versions:
+                query = query.filter(
+                    (ClassificationCacheEntry.classifier_version != self.version) |
+                    (ClassificationCacheEntry.expires_at <= datetime.utcnow())
+                )
+            deleted = query.delete(synchronize_session=False)
+            db.session.commit()
+
+            with self._lock:
+                self._memory.clear()
+
+            message = f"分类缓存清理完成，删除 {deleted} 条"
+            self.logger.info(message)
+            return {'success': True, 'message': message, 'deleted_count': deleted}
+
+        except Exception as e:
+            db.session.rollback()
+            error_msg = f"分类缓存清理失败: {str(e)}"
+            self.logger.error(error_msg)
+            return {'success': False, 'message': error_msg}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计（命中率按本进程的查找次数计算）"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+
+        hits = stats['memory_hits'] + stats['db_hits']
+        lookups = hits + stats['misses']
+        stats.update({
+            'enabled': self.enabled,
+            'version': self.version,
+            'ttl_days': Config.CLASSIFICATION_CACHE_TTL_DAYS,
+            'memory_size': self.memory_size,
+            'lookups': lookups,
+            'hits': hits,
+            'hit_rate': round(hits / lookups * 100, 2) if lookups else 0.0
+        })
+
+        try:
+            stats['db_entries'] = db.session.query(func.count(ClassificationCacheEntry.id)).filter(
+                ClassificationCacheEntry.classifier_version == self.version
+            ).scalar() or 0
+        except Exception:
+            stats['db_entries'] = None
+        return stats
+
+
+# 创建全局分类缓存实例
+classification_cache = ClassificationCache()
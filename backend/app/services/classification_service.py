@@ -3,6 +3,7 @@
 支持Mock API和外部API的灵活切换，提供完整的问题分类处理功能
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from sqlalchemy import func
@@ -11,6 +12,7 @@ from app import db
 from app.models.question import Question
 from app.models.answer import Answer
 from app.services.api_client import APIClientFactory
+from app.services.classification_cache import classification_cache
 from app.config import Config
 
 class ClassificationService:
@@ -23,6 +25,7 @@ class ClassificationService:
             'total_processed': 0,
             'total_success': 0,
             'total_failed': 0,
+            'cache_hits': 0,
             'api_mode': Config.API_MODE,
             'use_mock': Config.USE_MOCK_CLASSIFICATION,
             'last_process_time': None
@@ -94,46 +97,25 @@ class ClassificationService:
             if answers:
                 yoyo_answer = answers.answer_text
 
-            # 调用分类API - 荣耀API格式
-            classification_data = classification_client.classify_question(
-                question=question.query,
-                answer=yoyo_answer,  # 使用yoyo答案
-                user_id="00031559"
-            )
-            
-            # 更新问题分类信息 - 荣耀API返回纯文本分类结果
-            question.classification = classification_data  # 直接是分类文本
-            question.classification_confidence = 0.9  # 荣耀API没有置信度，设置默认值
-            question.classification_subcategory = None  # 荣耀API没有子分类
-            question.classification_tags = ''  # 荣耀API没有标签
-            question.classification_reasoning = f'通过荣耀API分类为: {classification_data}'
-            question.classification_api_used = 'mock' if self._is_using_mock_api() else 'external'
-            question.classified_at = datetime.utcnow()
-            
-            # 检查置信度是否达到阈值
-            confidence_threshold = Config.CLASSIFICATION_CONFIDENCE_THRESHOLD
-            if question.classification_confidence >= confidence_threshold:
-                question.processing_status = 'classified'
-                status = 'success'
-                message = f"分类成功，置信度: {question.classification_confidence:.2f}"
+            # 相同问题+答案优先使用缓存结果，命中时不调用分类API
+            classification_data = classification_cache.get(question.query, yoyo_answer)
+            from_cache = classification_data is not None
+            if from_cache:
+                self.classification_stats['cache_hits'] += 1
+                self.logger.info(f"问题 {question.id} 命中分类缓存: {classification_data}")
             else:
-                question.processing_status = 'classification_uncertain'
-                status = 'uncertain'
-                message = f"分类完成但置信度较低: {question.classification_confidence:.2f}"
-            
-            question.updated_at = datetime.utcnow()
+                # 调用分类API - 荣耀API格式
+                classification_data = classification_client.classify_question(
+                    question=question.query,
+                    answer=yoyo_answer,  # 使用yoyo答案
+                    user_id="00031559"
+                )
+            
+            result = self._apply_classification(question, classification_data, from_cache)
+            if not from_cache:
+                classification_cache.put(question.query, yoyo_answer, classification_data)
             db.session.commit()
             
-            result = {
-                'success': True,
-                'status': status,
-                'message': message,
-                'question_id': question.id,
-                'classification': question.classification,
-                'confidence': question.classification_confidence,
-                'api_mode': 'mock' if self._is_using_mock_api() else 'external'
-            }
-            
             self.classification_stats['total_success'] += 1
             self.logger.info(f"问题 {question.id} 分类成功: {question.classification}")
             
@@ -159,21 +141,69 @@ class ClassificationService:
             self.logger.error(f"问题 {question.id} 分类失败: {str(e)}")
             return result
     
-    def classify_batch_questions(self, batch_size: Optional[int] = None) -> Dict:
+    def _apply_classification(self, question: Question, classification_data: str, from_cache: bool) -> Dict:
+        """把分类结果写到问题对象上（不提交），返回单个问题的分类结果字典"""
+        # 更新问题分类信息 - 荣耀API返回纯文本分类结果
+        question.classification = classification_data  # 直接是分类文本
+        question.classification_confidence = 0.9  # 荣耀API没有置信度，设置默认值
+        question.classification_subcategory = None  # 荣耀API没有子分类
+        question.classification_tags = ''  # 荣耀API没有标签
+        question.classification_reasoning = f'通过荣耀API分类为: {classification_data}'
+        if from_cache:
+            question.classification_api_used = 'cache'
+        else:
+            question.classification_api_used = 'mock' if self._is_using_mock_api() else 'external'
+        question.classified_at = datetime.utcnow()
+        
+        # 检查置信度是否达到阈值
+        confidence_threshold = Config.CLASSIFICATION_CONFIDENCE_THRESHOLD
+        if question.classification_confidence >= confidence_threshold:
+            question.processing_status = 'classified'
+            status = 'success'
+            message = f"分类成功，置信度: {question.classification_confidence:.2f}"
+        else:
+            question.processing_status = 'classification_uncertain'
+            status = 'uncertain'
+            message = f"分类完成但置信度较低: {question.classification_confidence:.2f}"
+        
+        question.updated_at = datetime.utcnow()
+        
+        return {
+            'success': True,
+            'status': status,
+            'message': message,
+            'question_id': question.id,
+            'classification': question.classification,
+            'confidence': question.classification_confidence,
+            'from_cache': from_cache,
+            'api_mode': 'mock' if self._is_using_mock_api() else 'external'
+        }
+    
+    def classify_batch_questions(self, batch_size: Optional[int] = None, max_workers: Optional[int] = None) -> Dict:
         """
         批量分类处理
         
+        整批问题一条UPDATE标记为分类中，yoyo答案与分类缓存各一次批量查询，
+        未命中缓存的问题由线程池并发调用分类API（CLASSIFICATION_WORKERS），
+        分类结果、失败状态和缓存写入最后一次性提交。
+        
         Args:
             batch_size: 批处理大小
+            max_workers: 分类API并发调用数，未指定时取 CLASSIFICATION_WORKERS
             
         Returns:
             批处理结果
         """
         if batch_size is None:
             batch_size = Config.CLASSIFICATION_BATCH_SIZE
+        workers = max(1, int(max_workers or Config.CLASSIFICATION_WORKERS))
+        question_ids = []
         
         try:
-            self.logger.info(f"开始批量分类处理，批大小: {batch_size}")
+            self.logger.info(f"开始批量分类处理，批大小: {batch_size}，并发数: {workers}")
+            
+            # 之前中断（进程退出等）而停留在分类中的问题先恢复为待处理，本批即可重新选中
+            self.reset_stale_classifying_questions()
             
             # 获取待处理问题
             pending_questions = self.get_pending_questions(limit=batch_size)
@@ -188,21 +218,88 @@ class ClassificationService:
                     'results': []
                 }
             
-            # 批量处理
+            # 1. 整批更新状态为分类中（提交后用一次查询重新加载，避免逐条刷新过期对象）
+            question_ids = [question.id for question in pending_questions]
+            db.session.query(Question).filter(Question.id.in_(question_ids)).update(
+                {'processing_status': 'classifying', 'updated_at': datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.session.commit()
+            questions_by_id = {
+                question.id: question
+                for question in db.session.query(Question).filter(Question.id.in_(question_ids)).all()
+            }
+            pending_questions = [questions_by_id[question_id] for question_id in question_ids if question_id in questions_by_id]
+            
+            # 2. 一次查询获取整批的yoyo答案作为分类依据
+            yoyo_answers = {}
+            for business_id, answer_text in db.session.query(Answer.question_business_id, Answer.answer_text).filter(
+                Answer.question_business_id.in_([question.business_id for question in pending_questions]),
+                Answer.assistant_type == 'yoyo'
+            ).order_by(Answer.id):
+                yoyo_answers.setdefault(business_id, answer_text)
+            
+            # 3. 批量查缓存，未命中的问题并发调用分类API（工作线程只发HTTP请求，不访问数据库会话）
+            inputs = [(question.query, yoyo_answers.get(question.business_id)) for question in pending_questions]
+            cached = classification_cache.get_many(inputs)
+            classification_client = self._get_classification_client()
+            
+            outcomes = [None] * len(pending_questions)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='classify') as executor:
+                futures = {}
+                for index, (query, yoyo_answer) in enumerate(inputs):
+                    if cached[index] is None:
+                        futures[index] = executor.submit(
+                            classification_client.classify_question,
+                            question=query,
+                            answer=yoyo_answer,  # 使用yoyo答案
+                            user_id="00031559"
+                        )
+                for index, future in futures.items():
+                    try:
+                        outcomes[index] = future.result()
+                    except Exception as e:
+                        outcomes[index] = e
+            
+            # 4. 在主线程中更新问题对象，最后一次性提交
             results = []
+            cache_items = []
             success_count = 0
             failed_count = 0
             
-            for question in pending_questions:
-                result = self.classify_single_question(question)
-                results.append(result)
+            for index, question in enumerate(pending_questions):
+                from_cache = cached[index] is not None
+                outcome = cached[index] if from_cache else outcomes[index]
                 
-                if result['success']:
-                    success_count += 1
-                else:
+                if isinstance(outcome, Exception):
+                    question.processing_status = 'classification_failed'
+                    question.error_message = f"分类处理失败: {str(outcome)}"
+                    question.updated_at = datetime.utcnow()
+                    results.append({
+                        'success': False,
+                        'status': 'failed',
+                        'message': f"分类处理失败: {str(outcome)}",
+                        'question_id': question.id,
+                        'api_mode': 'mock' if self._is_using_mock_api() else 'external'
+                    })
                     failed_count += 1
+                    self.logger.error(f"问题 {question.id} 分类失败: {str(outcome)}")
+                    continue
+                
+                results.append(self._apply_classification(question, outcome, from_cache))
+                if from_cache:
+                    self.classification_stats['cache_hits'] += 1
+                else:
+                    cache_items.append((inputs[index][0], inputs[index][1], outcome))
+                success_count += 1
+            
+            classification_cache.put_many(cache_items)
+            db.session.commit()
             
             # 更新统计
+            self.classification_stats['total_processed'] += len(results)
+            self.classification_stats['total_success'] += success_count
+            self.classification_stats['total_failed'] += failed_count
             self.classification_stats['last_process_time'] = datetime.utcnow().isoformat()
             
             batch_result = {
@@ -213,15 +310,18 @@ class ClassificationService:
                 'failed_count': failed_count,
                 'results': results,
                 'api_mode': 'mock' if self._is_using_mock_api() else 'external',
-                'batch_size': batch_size
+                'batch_size': batch_size,
+                'max_workers': workers
             }
             
             self.logger.info(f"批量分类完成: {batch_result['message']}")
             return batch_result
             
         except Exception as e:
+            db.session.rollback()
             error_msg = f"批量分类处理失败: {str(e)}"
             self.logger.error(error_msg)
+            self._restore_pending(question_ids)
             
             return {
                 'success': False,
@@ -280,6 +380,7 @@ class ClassificationService:
                     'confidence_threshold': Config.CLASSIFICATION_CONFIDENCE_THRESHOLD
                 },
                 'service_stats': self.classification_stats,
+                'cache': classification_cache.get_stats(),
                 'config': {
                     'enabled': Config.CLASSIFICATION_ENABLED,
                     'batch_size': Config.CLASSIFICATION_BATCH_SIZE
@@ -290,8 +391,57 @@ class ClassificationService:
             self.logger.error(f"获取分类统计失败: {str(e)}")
             return {'error': str(e)}
     
+    def _restore_pending(self, question_ids: List[int]) -> None:
+        """批次中途失败时，把已标记为分类中的问题整批恢复为待处理（已提交的整批 classifying 状态不会随回滚撤销）"""
+        if not question_ids:
+            return
+        try:
+            restored = db.session.query(Question).filter(
+                Question.id.in_(question_ids),
+                Question.processing_status == 'classifying'
+            ).update(
+                {'processing_status': 'pending', 'updated_at': datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.session.commit()
+            self.logger.info(f"已将 {restored} 个分类中的问题恢复为待处理")
+        except Exception as e:
+            db.session.rollback()
+            # 恢复失败时由 reset_stale_classifying_questions 按超时兜底
+            self.logger.error(f"恢复分类中问题状态失败: {str(e)}")
+    
+    def reset_stale_classifying_questions(self, stale_minutes: Optional[int] = None) -> int:
+        """
+        把停留在分类中超过 CLASSIFICATION_STALE_MINUTES 的问题重置为待处理
+        
+        整批问题在调用分类API之前就提交为 classifying，进程在批次提交前退出时这些问题不会再被选中，由此兜底。
+        
+        Returns:
+            重置的问题数
+        """
+        stale_minutes = Config.CLASSIFICATION_STALE_MINUTES if stale_minutes is None else stale_minutes
+        cutoff = datetime.utcnow() - timedelta(minutes=stale_minutes)
+        try:
+            reset_count = db.session.query(Question).filter(
+                Question.processing_status == 'classifying',
+                Question.updated_at < cutoff
+            ).update(
+                {'processing_status': 'pending', 'updated_at': datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"重置超时的分类中问题失败: {str(e)}")
+            return 0
+        
+        if reset_count:
+            self.logger.warning(f"已将 {reset_count} 个停留在分类中超过 {stale_minutes} 分钟的问题重置为待处理")
+        return reset_count
+    
     def reset_failed_questions(self) -> Dict:
-        """重置失败的问题状态，允许重新分类"""
+        """重置失败的问题状态（以及停留在分类中已超时的问题），允许重新分类"""
+        stale_count = self.reset_stale_classifying_questions()
         try:
             failed_questions = db.session.query(Question).filter(
                 Question.processing_status.in_(['classification_failed', 'classification_error'])
@@ -307,12 +457,15 @@ class ClassificationService:
             db.session.commit()
             
             message = f"已重置 {reset_count} 个失败问题的状态"
+            if stale_count:
+                message += f"，{stale_count} 个超时的分类中问题"
             self.logger.info(message)
             
             return {
                 'success': True,
                 'message': message,
-                'reset_count': reset_count
+                'reset_count': reset_count,
+                'stale_reset_count': stale_count
             }
             
         except Exception as e:
@@ -0,0 +1,288 @@
+"""
+流水线计数器服务
+写入方的增量先累积在会话上，事务提交后在独立的短事务中原子递增累计行数（计数器热点行的行锁
+不会持有到写入方事务结束，并发写入方不会在计数器行上排队），统计接口直接读取计数器（O(1)），
+后台定时任务再与精确 COUNT(*) 对账修正漂移；源表可选使用 PostgreSQL 规划器估算值
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session, scoped_session
+
+from app.config import Config
+from app.utils.database import db, get_dialect_name
+from app.models.question import Question
+from app.models.answer import Answer
+from app.models.pipeline_counter import PipelineCounter
+
+
+QUESTIONS_TOTAL = 'questions.total'
+ANSWERS_TOTAL = 'answers.total'
+ANSWERS_BY_TYPE = 'answers.{}'
+SOURCE_TOTAL = 'source.total'
+SOURCE_WITH_ANSWER = 'source.with_answer'
+
+# session.info 中累积的待应用增量
+_PENDING_KEY = 'pipeline_counter_deltas'
+
+
+class CounterService:
+    """流水线计数器服务"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._listeners_registered = False
+
+    def _get_insert(self, dialect_name: str):
+        """获取支持 ON CONFLICT 的 insert 构造器，不支持的方言返回 None"""
+        if dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return None
+        return insert
+
+    def increment_many(self, deltas: Dict[str, int], session=None) -> None:
+        """
+        递增多个计数器：累积到会话上，调用方事务提交后在独立短事务中应用，回滚则丢弃
+
+        会话没有进行中的事务时立即应用。提交后、应用前进程退出造成的少量偏差由对账修正。
+
+        Args:
+            deltas: {计数器名: 增量}，增量可为负
+            session: 数据库会话，默认使用 db.session
+        """
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        session = session or db.session
+        if isinstance(session, scoped_session):
+            session = session()
+        if not session.in_transaction():
+            self._apply(deltas, session.get_bind())
+            return
+
+        pending = session.info.setdefault(_PENDING_KEY, defaultdict(int))
+        for name, delta in deltas.items():
+            pending[name] += delta
+
+    def _apply(self, deltas: Dict[str, int], bind) -> None:
+        """在独立的短事务中原子递增计数器（只持有计数器行锁到本语句提交）"""
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas or bind is None:
+            return
+
+        insert = self._get_insert(bind.dialect.name)
+        if insert is None:
+            return
+
+        now = datetime.utcnow()
+        table = PipelineCounter.__table__
+        # 按名称排序写入，避免并发事务以不同顺序加行锁导致死锁
+        stmt = insert(table).values([
+            {'name': name, 'value': deltas[name], 'updated_at': now}
+            for name in sorted(deltas)
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['name'],
+            set_={
+                'value': table.c.value + stmt.excluded.value,
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        with bind.engine.begin() as connection:
+            connection.execute(stmt)
+
+    def increment(self, name: str, delta: int = 1, session=None) -> None:
+        """原子递增单个计数器"""
+        self.increment_many({name: delta}, session=session)
+
+    def _set_values(self, values: Dict[str, int]) -> None:
+        """以精确值覆盖计数器并记录对账时间"""
+        insert = self._get_insert(get_dialect_name())
+        if insert is None or not values:
+            return
+
+        now = datetime.utcnow()
+        table = PipelineCounter.__table__
+        stmt = insert(table).values([
+            {'name': name, 'value': values[name], 'reconciled_at': now, 'updated_at': now}
+            for name in sorted(values)
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['name'],
+            set_={
+                'value': stmt.excluded.value,
+                'reconciled_at': stmt.excluded.reconciled_at,
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+
+    def _exact_counts(self) -> Dict[str, int]:
+        """执行精确计数（全表 COUNT(*)，仅在后台对账时调用）"""
+        values = {
+            QUESTIONS_TOTAL: db.session.query(func.count(Question.id)).scalar() or 0,
+            ANSWERS_TOTAL: db.session.query(func.count(Answer.id)).scalar() or 0
+        }
+        for assistant_type in ('yoyo', 'doubao', 'xiaotian'):
+            values[ANSWERS_BY_TYPE.format(assistant_type)] = 0
+        for assistant_type, count in db.session.query(
+            Answer.assistant_type, func.count(Answer.id)
+        ).group_by(Answer.assistant_type).all():
+            values[ANSWERS_BY_TYPE.format(assistant_type)] = count
+
+        source_table = f"{Config.DATABASE_SCHEMA}.{Config.SOURCE_TABLE_NAME}"
+        values[SOURCE_TOTAL] = db.session.execute(
+            text(f"SELECT COUNT(*) FROM {source_table}")
+        ).scalar() or 0
+        values[SOURCE_WITH_ANSWER] = db.session.execute(
+            text(f"SELECT COUNT(*) FROM {source_table} WHERE answer IS NOT NULL AND answer != '' AND TRIM(answer) != ''")
+        ).scalar() or 0
+        return values
+
+    def reconcile(self) -> Dict:
+        """
+        与精确计数对账：用 COUNT(*) 结果覆盖计数器并返回漂移情况
+
+        对账期间并发写入的增量可能被覆盖，造成的少量偏差会在下次对账时修正。
+        """
+        try:
+            before = self.get_counters()
+            values = self._exact_counts()
+            self._set_values(values)
+            db.session.commit()
+
+            drift = {
+                name: value - before.get(name, 0)
+                for name, value in values.items()
+                if value != before.get(name, 0)
+            }
+            if drift:
+                self.logger.info(f"计数器对账完成，修正漂移: {drift}")
+            else:
+                self.logger.info("计数器对账完成，无漂移")
+            return {'success': True, 'counters': values, 'drift': drift}
+
+        except Exception as e:
+            db.session.rollback()
+            error_msg = f"计数器对账失败: {str(e)}"
+            self.logger.error(error_msg)
+            return {'success': False, 'message': error_msg}
+
+    def get_counters(self, names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """读取计数器当前值（单次主键/唯一索引查找）"""
+        query = db.session.query(PipelineCounter.name, PipelineCounter.value)
+        if names is not None:
+            query = query.filter(PipelineCounter.name.in_(list(names)))
+        return {name: value or 0 for name, value in query.all()}
+
+    def estimate_source_counts(self) -> Optional[Dict[str, int]]:
+        """
+        基于 PostgreSQL 规划器统计估算源表行数（pg_class.reltuples 与 answer 列的 null_frac）
+
+        估算值依赖 ANALYZE/autovacuum 的时效；有答案的行数按非空比例估算，不区分空白字符串。
+        表尚未分析或非 PostgreSQL 时返回 None。
+        """
+        if get_dialect_name() != 'postgresql':
+            return None
+
+        params = {'schema': Config.DATABASE_SCHEMA, 'table': Config.SOURCE_TABLE_NAME}
+        reltuples = db.session.execute(text("""
+            SELECT c.reltuples
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :schema AND c.relname = :table
+        """), params).scalar()
+        if reltuples is None or reltuples < 0:
+            return None
+
+        null_frac = db.session.execute(text("""
+            SELECT null_frac FROM pg_stats
+            WHERE schemaname = :schema AND tablename = :table AND attname = 'answer'
+        """), params).scalar()
+
+        total = int(reltuples)
+        return {
+            SOURCE_TOTAL: total,
+            SOURCE_WITH_ANSWER: int(total * (1 - (null_frac or 0)))
+        }
+
+    def get_pipeline_counts(self) -> Dict:
+        """
+        获取统计接口使用的计数
+
+        计数器尚未建立时同步执行一次对账；开启 COUNTER_SOURCE_ESTIMATE_ENABLED 时源表计数使用规划器估算。
+        """
+        names = [
+            QUESTIONS_TOTAL, ANSWERS_TOTAL, ANSWERS_BY_TYPE.format('yoyo'),
+            SOURCE_TOTAL, SOURCE_WITH_ANSWER
+        ]
+        counters = db.session.query(PipelineCounter).filter(PipelineCounter.name.in_(names)).all()
+        if len(counters) < len(names) or any(counter.reconciled_at is None for counter in counters):
+            self.logger.info("计数器尚未对账，执行首次精确计数")
+            self.reconcile()
+            counters = db.session.query(PipelineCounter).filter(PipelineCounter.name.in_(names)).all()
+
+        values = {counter.name: counter.value or 0 for counter in counters}
+        reconciled_times = [counter.reconciled_at for counter in counters if counter.reconciled_at]
+
+        source_estimated = False
+        if Config.COUNTER_SOURCE_ESTIMATE_ENABLED:
+            estimates = self.estimate_source_counts()
+            if estimates:
+                values.update(estimates)
+                source_estimated = True
+
+        return {
+            'values': values,
+            'reconciled_at': min(reconciled_times) if reconciled_times else None,
+            'source_estimated': source_estimated
+        }
+
+    def _after_flush(self, session, flush_context):
+        """ORM 写入（逐条新增/删除的问题和答案）后累积计数器增量，提交后应用"""
+        deltas = defaultdict(int)
+        for instances, sign in ((session.new, 1), (session.deleted, -1)):
+            for instance in instances:
+                if isinstance(instance, Question):
+                    deltas[QUESTIONS_TOTAL] += sign
+                elif isinstance(instance, Answer):
+                    deltas[ANSWERS_TOTAL] += sign
+                    deltas[ANSWERS_BY_TYPE.format(instance.assistant_type)] += sign
+
+        if deltas:
+            self.increment_many(deltas, session=session)
+
+    def _after_commit(self, session):
+        """写入方事务提交后应用累积的增量，失败只记录日志（由对账修正）"""
+        deltas = session.info.pop(_PENDING_KEY, None)
+        if not deltas:
+            return
+        try:
+            self._apply(deltas, session.get_bind())
+        except Exception as e:
+            self.logger.warning(f"递增流水线计数器失败，等待下次对账修正: {str(e)}")
+
+    def _after_rollback(self, session):
+        """写入方事务回滚时丢弃累积的增量"""
+        session.info.pop(_PENDING_KEY, None)
+
+    def register_listeners(self) -> None:
+        """注册 ORM flush/提交/回滚监听；批量 Core 写入（如同步 UPSERT）需显式调用 increment_many"""
+        if self._listeners_registered:
+            return
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+        self._listeners_registered = True
+        self.logger.info("流水线计数器监听已注册")
+
+
+# 创建全局计数器服务实例
+counter_service = CounterService()
@@ -0,0 +1,300 @@
+"""
+HTTP录制/回放服务
+record 模式下把外部API的真实（或Mock）响应追加写入 gzip 压缩的 JSONL 磁带文件；
+replay 模式下按请求方法、路径和载荷从磁带取回响应，不建立任何网络连接，
+并按录制时的延迟、固定延迟或零延迟返回，用于离线、可复现的全流程基准测试
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from app.config import Config
+from app.services.http_transport import http_transport
+
+
+CASSETTE_MODES = ('off', 'record', 'replay')
+
+# 只保留客户端逻辑会读取的响应头，磁带保持紧凑
+_RECORDED_HEADERS = ('Content-Type', 'Retry-After')
+
+
+class CassetteMissError(requests.exceptions.ConnectionError):
+    """回放模式下磁带中没有匹配的录制（按连接失败处理，不会真正发出请求）"""
+
+
+class HTTPCassette:
+    """
+    HTTP磁带
+
+    匹配键为 请求方法 + URL路径 + 规范化的 JSON 载荷/查询参数，不含主机和请求头，
+    因此对 Mock 服务录制的磁带可以在任意 base_url 下回放。同一键录制多次时按录制顺序依次回放，
+    取完后从头循环。
+    """
+
+    def __init__(self, mode: Optional[str] = None, path: Optional[str] = None, latency: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._mode = None
+        self._path = None
+        self._latency = None
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = defaultdict(int)
+        self._loaded_path: Optional[str] = None
+        self._writer = None
+        self.stats = self._empty_stats()
+        self.configure(mode, path, latency)
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {'recorded': 0, 'replayed': 0, 'misses': 0}
+
+    def configure(self, mode: Optional[str] = None, path: Optional[str] = None, latency: Optional[str] = None) -> None:
+        """
+        切换模式或磁带文件（基准脚本可在运行时调用），未指定的参数取 Config 中的值
+
+        Args:
+            mode: off / record / replay
+            path: 磁带文件路径（.jsonl.gz）
+            latency: 回放延迟，recorded（按录制耗时 × HTTP_CASSETTE_LATENCY_SCALE）、none 或固定秒数
+        """
+        mode = (mode or Config.HTTP_CASSETTE_MODE or 'off').lower()
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"不支持的磁带模式: {mode}，可选值: {', '.join(CASSETTE_MODES)}")
+
+        self.close()
+        with self._lock:
+            self._mode = mode
+            self._path = path or Config.HTTP_CASSETTE_PATH
+            self._latency = str(latency or Config.HTTP_CASSETTE_LATENCY).lower()
+            self._entries = {}
+            self._cursors = defaultdict(int)
+            self._loaded_path = None
+            self.stats = self._empty_stats()
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @property
+    def recording(self) -> bool:
+        return self._mode == 'record'
+
+    @property
+    def replaying(self) -> bool:
+        return self._mode == 'replay'
+
+    # ------------------------------------------------------------------
+    # 匹配键
+    # ------------------------------------------------------------------
+
+    def make_key(self, method: str, url: str, payload: Optional[Any] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        raw = json.dumps(
+            [method.upper(), urlsplit(url).path or '/', payload, params],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    # ------------------------------------------------------------------
+    # 录制
+    # ------------------------------------------------------------------
+
+    def _get_writer(self):
+        """以追加方式打开磁带（gzip 多成员格式，可多次追加录制）"""
+        if self._writer is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._writer = gzip.open(self._path, 'at', encoding='utf-8')
+        return self._writer
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        payload: Optional[Any] = None,
+        params: Optional[Dict[str, Any]] = None,
+        status_code: Optional[int] = None,
+        headers: Optional[Dict[str, str]] = None,
+        body: str = '',
+        elapsed: float = 0.0,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        追加一条录制
+
+        Args:
+            error: 请求未得到响应时的错误类型（timeout / connection_error），回放时重新抛出
+        """
+        headers = headers or {}
+        entry = {
+            'k': self.make_key(method, url, payload, params),
+            'm': method.upper(),
+            'p': urlsplit(url).path or '/',
+            's': status_code,
+            'h': {name: headers[name] for name in _RECORDED_HEADERS if headers.get(name) is not None},
+            'b': body,
+            't': round(elapsed, 4),
+            'e': error
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            writer = self._get_writer()
+            writer.write(line + '\n')
+            writer.flush()
+            self.stats['recorded'] += 1
+
+    # ------------------------------------------------------------------
+    # 回放
+    # ------------------------------------------------------------------
+
+    def _ensure_loaded(self) -> None:
+        """首次回放时读入磁带（调用方已持有锁）"""
+        if self._loaded_path == self._path:
+            return
+        entries: Dict[str, List[Dict[str, Any]]] = {}
+        if os.path.exists(self._path):
+            with gzip.open(self._path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        entry = json.loads(line)
+                        entries.setdefault(entry['k'], []).append(entry)
+        else:
+            self.logger.warning(f"磁带文件不存在: {self._path}，所有回放请求都将未命中")
+        self._entries = entries
+        self._cursors = defaultdict(int)
+        self._loaded_path = self._path
+        self.logger.info(f"已加载磁带 {self._path}: {sum(len(item) for item in entries.values())} 条录制")
+
+    def lookup(self, method: str, url: str, payload: Optional[Any] = None, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """取出下一条匹配的录制，没有匹配时抛出 CassetteMissError"""
+        key = self.make_key(method, url, payload, params)
+        with self._lock:
+            self._ensure_loaded()
+            recordings = self._entries.get(key)
+            if not recordings:
+                self.stats['misses'] += 1
+                raise CassetteMissError(f"磁带中没有匹配的录制: {method.upper()} {urlsplit(url).path}")
+            entry = recordings[self._cursors[key] % len(recordings)]
+            self._cursors[key] += 1
+            self.stats['replayed'] += 1
+        return entry
+
+    def get_delay(self, entry: Dict[str, Any]) -> float:
+        """回放延迟（秒）"""
+        if self._latency == 'none':
+            return 0.0
+        if self._latency == 'recorded':
+            return max(0.0, float(entry.get('t') or 0.0) * Config.HTTP_CASSETTE_LATENCY_SCALE)
+        try:
+            return max(0.0, float(self._latency))
+        except ValueError:
+            return 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                'mode': self._mode,
+                'path': self._path,
+                'latency': self._latency,
+                'loaded_entries': sum(len(item) for item in self._entries.values())
+            })
+        return stats
+
+
+class CassetteTransport:
+    """
+    带录制/回放的传输层，接口与 HTTPTransport 一致
+
+    off 模式直接转发给内层传输层；replay 模式完全不访问网络。
+    """
+
+    def __init__(self, inner, cassette: HTTPCassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        payload = kwargs.get('json', kwargs.get('data'))
+        params = kwargs.get('params')
+
+        if self.cassette.replaying:
+            return self._replay(method, url, payload, params)
+
+        if not self.cassette.recording:
+            return self.inner.request(method, url, **kwargs)
+
+        start_time = time.time()
+        try:
+            response = self.inner.request(method, url, **kwargs)
+        except requests.exceptions.Timeout:
+            self.cassette.record(method, url, payload, params, elapsed=time.time() - start_time, error='timeout')
+            raise
+        except requests.exceptions.ConnectionError:
+            self.cassette.record(method, url, payload, params, elapsed=time.time() - start_time, error='connection_error')
+            raise
+
+        self.cassette.record(
+            method, url, payload, params,
+            status_code=response.status_code,
+            headers=response.headers,
+            body=response.text,
+            elapsed=response.elapsed.total_seconds()
+        )
+        return response
+
+    def _replay(self, method: str, url: str, payload: Optional[Any], params: Optional[Dict[str, Any]]) -> requests.Response:
+        entry = self.cassette.lookup(method, url, payload, params)
+        delay = self.cassette.get_delay(entry)
+        if delay > 0:
+            time.sleep(delay)
+
+        if entry.get('e') == 'timeout':
+            raise requests.exceptions.ReadTimeout(f"回放录制的超时: {method.upper()} {entry['p']}")
+        if entry.get('e'):
+            raise requests.exceptions.ConnectionError(f"回放录制的连接失败: {method.upper()} {entry['p']}")
+
+        response = requests.Response()
+        response.status_code = entry['s']
+        response.headers = CaseInsensitiveDict(entry.get('h') or {})
+        response._content = (entry.get('b') or '').encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = url
+        response.elapsed = timedelta(seconds=delay)
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.inner.get_stats()
+        stats['cassette'] = self.cassette.get_stats()
+        return stats
+
+    def reset_stats(self) -> None:
+        self.inner.reset_stats()
+
+    def close(self) -> None:
+        self.cassette.close()
+        self.inner.close()
+
+
+# 创建全局磁带及带录制/回放的传输层实例
+http_cassette = HTTPCassette()
+cassette_transport = CassetteTransport(http_transport, http_cassette)
@@ -0,0 +1,193 @@
+"""
+共享HTTP传输层
+所有外部API客户端复用同一个 requests.Session 及其 urllib3 连接池（长连接），
+按主机限制并发请求数，并统计连接复用情况
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import Config
+
+
+class HTTPTransport:
+    """共享的长连接HTTP传输层"""
+
+    def __init__(
+        self,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        pool_block: Optional[bool] = None,
+        per_host_limit: Optional[int] = None
+    ):
+        """
+        初始化传输层
+
+        Args:
+            pool_connections: 缓存的主机连接池数量
+            pool_maxsize: 每个主机连接池保持的最大连接数
+            pool_block: 连接池耗尽时是否阻塞等待空闲连接
+            per_host_limit: 每个主机的最大并发请求数
+        """
+        self.logger = logging.getLogger(__name__)
+        self.pool_connections = pool_connections or Config.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or Config.HTTP_POOL_MAXSIZE
+        self.pool_block = Config.HTTP_POOL_BLOCK if pool_block is None else pool_block
+        self.per_host_limit = per_host_limit or Config.HTTP_POOL_PER_HOST_LIMIT
+
+        self._lock = threading.Lock()
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_stats: Dict[str, Dict[str, Any]] = {}
+
+        self.session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        """创建挂载连接池适配器的会话（重试由各API客户端负责，适配器不重试）"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=0
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Connection': 'keep-alive'})
+        return session
+
+    def _get_host_key(self, url: str) -> str:
+        """以 scheme://host:port 作为主机维度的键"""
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        return f"{parts.scheme}://{parts.hostname}:{port}"
+
+    def _get_host_slot(self, host_key: str):
+        """获取主机并发信号量及统计项"""
+        with self._lock:
+            if host_key not in self._host_semaphores:
+                self._host_semaphores[host_key] = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_stats[host_key] = {
+                    'requests': 0,
+                    'errors': 0,
+                    'in_flight': 0,
+                    'max_in_flight': 0,
+                    'waited_requests': 0,
+                    'total_wait_time': 0.0
+                }
+            return self._host_semaphores[host_key], self._host_stats[host_key]
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        通过共享连接池发送请求
+
+        请求头、超时等参数原样传给 requests.Session.request，请求头需由调用方提供完整值。
+        """
+        host_key = self._get_host_key(url)
+        semaphore, stats = self._get_host_slot(host_key)
+
+        # 超过主机并发上限时等待空闲名额
+        waited = False
+        wait_start = time.time()
+        if not semaphore.acquire(blocking=False):
+            waited = True
+            semaphore.acquire()
+        wait_time = time.time() - wait_start
+
+        with self._lock:
+            stats['requests'] += 1
+            stats['in_flight'] += 1
+            stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+            if waited:
+                stats['waited_requests'] += 1
+                stats['total_wait_time'] += wait_time
+
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                stats['in_flight'] -= 1
+            semaphore.release()
+
+    def _get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """读取 urllib3 连接池的连接创建数与请求数，计算连接复用率"""
+        pool_stats = {}
+        for adapter in set(self.session.adapters.values()):
+            pools = getattr(getattr(adapter, 'poolmanager', None), 'pools', None)
+            if pools is None:
+                continue
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host_key = f"{pool.scheme}://{pool.host}:{pool.port}"
+                num_connections = getattr(pool, 'num_connections', 0)
+                num_requests = getattr(pool, 'num_requests', 0)
+                pool_stats[host_key] = {
+                    'connections_created': num_connections,
+                    'requests_sent': num_requests,
+                    'connection_reuse_rate': round(
+                        (1 - num_connections / num_requests) * 100, 2
+                    ) if num_requests else 0.0,
+                    # 连接池队列中以 None 占位未建立的连接，只统计真实的空闲长连接
+                    'idle_connections': sum(
+                        1 for conn in list(getattr(pool.pool, 'queue', [])) if conn is not None
+                    ) if getattr(pool, 'pool', None) is not None else 0
+                }
+        return pool_stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取传输层统计信息（连接池配置、各主机并发与连接复用情况）"""
+        pool_stats = self._get_pool_stats()
+        with self._lock:
+            hosts = {}
+            for host_key, stats in self._host_stats.items():
+                host = dict(stats)
+                host['total_wait_time'] = round(host['total_wait_time'], 3)
+                host.update(pool_stats.get(host_key, {}))
+                hosts[host_key] = host
+
+        total_connections = sum(item.get('connections_created', 0) for item in hosts.values())
+        total_requests = sum(item.get('requests_sent', 0) for item in hosts.values())
+        return {
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'pool_block': self.pool_block,
+            'per_host_limit': self.per_host_limit,
+            'connections_created': total_connections,
+            'requests_sent': total_requests,
+            'connection_reuse_rate': round(
+                (1 - total_connections / total_requests) * 100, 2
+            ) if total_requests else 0.0,
+            'hosts': hosts
+        }
+
+    def reset_stats(self) -> None:
+        """重置主机维度统计（连接池自身的计数随连接池重建清零）"""
+        with self._lock:
+            for stats in self._host_stats.values():
+                stats.update({
+                    'requests': 0,
+                    'errors': 0,
+                    'max_in_flight': stats['in_flight'],
+                    'waited_requests': 0,
+                    'total_wait_time': 0.0
+                })
+
+    def close(self) -> None:
+        """关闭所有连接并重建会话"""
+        self.session.close()
+        self.session = self._create_session()
+        self.logger.info("HTTP传输层连接池已关闭并重建")
+
+
+# 创建全局共享传输层实例
+http_transport = HTTPTransport()
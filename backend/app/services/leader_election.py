@@ -0,0 +1,172 @@
+"""
+主节点选举服务
+多个工作进程（可跨主机）中只选出一个运行定时任务调度器：
+PostgreSQL 下在一条专用连接上持有会话级 advisory lock（pg_try_advisory_lock），
+持有者进程退出或连接断开时锁自动释放，其他进程在下一次尝试时接任；
+其他数据库（SQLite，单机）退化为锁文件上的排他 flock
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.config import Config
+from app.utils.database import db, get_dialect_name
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 下没有 fcntl，非 PostgreSQL 时无法选举
+    fcntl = None
+
+
+class LeaderElection:
+    """基于数据库 advisory lock 的主节点选举"""
+
+    def __init__(self, name: str = 'scheduler', lock_key: Optional[int] = None, lock_file: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.lock_key = lock_key if lock_key is not None else Config.LEADER_LOCK_KEY
+        self.lock_file = lock_file or Config.LEADER_LOCK_FILE
+        self.node_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._lock = threading.Lock()
+        self._connection = None  # PostgreSQL：持有 advisory lock 的原始连接
+        self._file = None  # 其他数据库：持有 flock 的锁文件
+        self.mode: Optional[str] = None
+        self.stats = {
+            'is_leader': False,
+            'acquired_at': None,
+            'lost_at': None,
+            'terms': 0
+        }
+
+    @property
+    def is_leader(self) -> bool:
+        return self.stats['is_leader']
+
+    def try_acquire(self, app) -> bool:
+        """尝试成为主节点（不阻塞），已是主节点时返回 True"""
+        with self._lock:
+            if self.stats['is_leader']:
+                return True
+
+            with app.app_context():
+                use_advisory_lock = get_dialect_name() == 'postgresql'
+
+            try:
+                acquired = self._acquire_advisory_lock(app) if use_advisory_lock else self._acquire_file_lock()
+            except Exception as e:
+                self.logger.error(f"主节点选举失败: {str(e)}")
+                self._release_locked()
+                return False
+
+            if acquired:
+                self.mode = 'advisory_lock' if use_advisory_lock else 'file_lock'
+                self.stats['is_leader'] = True
+                self.stats['acquired_at'] = datetime.now().isoformat()
+                self.stats['terms'] += 1
+                self.logger.info(f"{self.node_id} 成为 {self.name} 主节点（{self.mode}）")
+            return acquired
+
+    def _acquire_advisory_lock(self, app) -> bool:
+        with app.app_context():
+            raw_connection = db.engine.raw_connection()
+        connection = raw_connection.driver_connection
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', (self.lock_key,))
+            acquired = bool(cursor.fetchone()[0])
+        if acquired:
+            # 锁随会话存在，连接必须一直保持打开
+            self._connection = raw_connection
+        else:
+            raw_connection.invalidate()
+        return acquired
+
+    def _acquire_file_lock(self) -> bool:
+        if fcntl is None:
+            self.logger.error("当前平台不支持文件锁，非 PostgreSQL 数据库下无法进行主节点选举")
+            return False
+        directory = os.path.dirname(self.lock_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.lock_file, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(self.node_id)
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def check(self) -> bool:
+        """确认仍持有锁（PostgreSQL 下探测连接是否存活），失去锁时返回 False"""
+        with self._lock:
+            if not self.stats['is_leader']:
+                return False
+            if self._connection is None:
+                return True
+            try:
+                with self._connection.driver_connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                return True
+            except Exception as e:
+                self.logger.error(f"{self.name} 主节点锁连接已断开，放弃主节点身份: {str(e)}")
+                self._release_locked()
+                return False
+
+    def release(self) -> None:
+        """主动放弃主节点身份"""
+        with self._lock:
+            was_leader = self.stats['is_leader']
+            self._release_locked()
+        if was_leader:
+            self.logger.info(f"{self.node_id} 已释放 {self.name} 主节点锁")
+
+    def _release_locked(self) -> None:
+        """释放锁（调用方已持有 self._lock）"""
+        if self._connection is not None:
+            try:
+                with self._connection.driver_connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', (self.lock_key,))
+            except Exception:
+                pass
+            try:
+                # 不放回连接池：连接关闭即释放会话级锁
+                self._connection.invalidate()
+            except Exception:
+                pass
+            self._connection = None
+
+        if self._file is not None:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+        if self.stats['is_leader']:
+            self.stats['is_leader'] = False
+            self.stats['lost_at'] = datetime.now().isoformat()
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = dict(self.stats)
+        status.update({
+            'name': self.name,
+            'node_id': self.node_id,
+            'mode': self.mode,
+            'lock_key': self.lock_key
+        })
+        return status
+
+
+# 创建全局调度器主节点选举实例
+scheduler_leader_election = LeaderElection('scheduler')
@@ -0,0 +1,305 @@
+"""
+运行指标服务
+线程安全的计数器与延迟直方图（外部API请求按客户端/端点/状态码、流水线阶段耗时），
+提供 p50/p95/p99 摘要并以 Prometheus 文本格式导出
+"""
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import Config
+
+
+# API请求延迟分桶（秒），覆盖到 API_TIMEOUT 之后
+API_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+# 流水线阶段耗时分桶（秒）
+PHASE_DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+SUMMARY_QUANTILES = (0.5, 0.95, 0.99)
+
+API_REQUEST_DURATION = 'api_client_request_duration_seconds'
+API_REQUESTS_TOTAL = 'api_client_requests_total'
+API_RETRIES_TOTAL = 'api_client_retries_total'
+PHASE_DURATION = 'pipeline_phase_duration_seconds'
+PHASE_RUNS_TOTAL = 'pipeline_phase_runs_total'
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    return tuple(sorted((str(key), str(value)) for key, value in (labels or {}).items()))
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    parts = []
+    for key, value in labels:
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """固定分桶直方图 + 最近样本蓄水池（用于计算分位数）"""
+
+    def __init__(self, buckets: Sequence[float], reservoir_size: int):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=reservoir_size)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def quantiles(self, quantiles: Sequence[float] = SUMMARY_QUANTILES) -> Dict[float, Optional[float]]:
+        if not self.samples:
+            return {q: None for q in quantiles}
+        ordered = sorted(self.samples)
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles}
+
+    def cumulative_buckets(self) -> List[Tuple[float, int]]:
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            total += count
+            result.append((bound, total))
+        result.append((float('inf'), self.count))
+        return result
+
+
+class MetricsRegistry:
+    """进程级指标注册表"""
+
+    def __init__(self, reservoir_size: Optional[int] = None):
+        self.reservoir_size = reservoir_size or Config.METRICS_RESERVOIR_SIZE
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]] = []
+
+    def describe(self, name: str, metric_type: str, help_text: str) -> None:
+        self._help[name] = (metric_type, help_text)
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None,
+                buckets: Sequence[float] = API_LATENCY_BUCKETS) -> None:
+        """记录一次直方图观测值"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets, self.reservoir_size)
+            histogram.observe(value)
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, amount: float = 1) -> None:
+        """累加计数器"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]) -> None:
+        """注册采集时才计算的 gauge，collector 返回 (指标名, 帮助文本, 标签, 值) 列表"""
+        self._collectors.append(collector)
+
+    # ------------------------------------------------------------------
+    # 便捷记录方法
+    # ------------------------------------------------------------------
+
+    def record_api_request(self, client: str, endpoint: str, status: Any, duration: Optional[float] = None) -> None:
+        """记录一次外部API请求（status 为HTTP状态码或 timeout / connection_error 等）"""
+        self.inc(API_REQUESTS_TOTAL, {'client': client, 'endpoint': endpoint, 'status': status})
+        if duration is not None:
+            self.observe(API_REQUEST_DURATION, duration, {'client': client, 'endpoint': endpoint})
+
+    def record_api_retry(self, client: str, endpoint: str) -> None:
+        self.inc(API_RETRIES_TOTAL, {'client': client, 'endpoint': endpoint})
+
+    def record_phase(self, phase: str, status: str, duration: float) -> None:
+        """记录一次流水线阶段执行耗时"""
+        self.inc(PHASE_RUNS_TOTAL, {'phase': phase, 'status': status})
+        self.observe(PHASE_DURATION, duration, {'phase': phase}, buckets=PHASE_DURATION_BUCKETS)
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def get_latency_summary(self, name: str, match: Optional[Dict[str, Any]] = None,
+                            group_by: str = 'endpoint') -> Dict[str, Dict[str, Any]]:
+        """按标签汇总直方图：{group_by 的取值: {count, avg, p50, p95, p99}}"""
+        match_items = set(_label_key(match))
+        summary = {}
+        with self._lock:
+            for key, histogram in self._histograms.get(name, {}).items():
+                if not match_items.issubset(set(key)):
+                    continue
+                group = dict(key).get(group_by, '')
+                quantiles = histogram.quantiles()
+                summary[group] = {
+                    'count': histogram.count,
+                    'avg': round(histogram.sum / histogram.count, 4) if histogram.count else 0.0,
+                    'p50': round(quantiles[0.5], 4) if quantiles[0.5] is not None else None,
+                    'p95': round(quantiles[0.95], 4) if quantiles[0.95] is not None else None,
+                    'p99': round(quantiles[0.99], 4) if quantiles[0.99] is not None else None
+                }
+        return summary
+
+    def get_counter_values(self, name: str, match: Optional[Dict[str, Any]] = None,
+                           group_by: str = 'status') -> Dict[str, float]:
+        """按标签汇总计数器"""
+        match_items = set(_label_key(match))
+        values: Dict[str, float] = {}
+        with self._lock:
+            for key, value in self._counters.get(name, {}).items():
+                if match_items.issubset(set(key)):
+                    group = dict(key).get(group_by, '')
+                    values[group] = values.get(group, 0) + value
+        return values
+
+    def render_prometheus(self) -> str:
+        """以 Prometheus 文本格式（0.0.4）导出全部指标"""
+        lines: List[str] = []
+
+        def header(name: str, default_type: str) -> None:
+            metric_type, help_text = self._help.get(name, (default_type, name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+        with self._lock:
+            for name in sorted(self._counters):
+                header(name, 'counter')
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+
+            for name in sorted(self._histograms):
+                header(name, 'histogram')
+                for key, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in histogram.cumulative_buckets():
+                        labels = _format_labels(key + (('le', _format_value(bound)),))
+                        lines.append(f'{name}_bucket{labels} {count}')
+                    lines.append(f'{name}_sum{_format_labels(key)} {_format_value(histogram.sum)}')
+                    lines.append(f'{name}_count{_format_labels(key)} {histogram.count}')
+
+                # 基于最近样本的分位数，便于直接查看尾延迟
+                quantile_name = f'{name}_recent'
+                lines.append(f'# HELP {quantile_name} {name} quantiles over the most recent samples')
+                lines.append(f'# TYPE {quantile_name} gauge')
+                for key, histogram in sorted(self._histograms[name].items()):
+                    for quantile, value in histogram.quantiles().items():
+                        if value is not None:
+                            labels = _format_labels(key + (('quantile', str(quantile)),))
+                            lines.append(f'{quantile_name}{labels} {_format_value(value)}')
+
+        gauges: Dict[str, List[Tuple[Dict[str, Any], float]]] = {}
+        gauge_help: Dict[str, str] = {}
+        for collector in list(self._collectors):
+            try:
+                for name, help_text, labels, value in collector():
+                    gauges.setdefault(name, []).append((labels, value))
+                    gauge_help[name] = help_text
+            except Exception:
+                continue
+        for name in sorted(gauges):
+            lines.append(f'# HELP {name} {gauge_help[name]}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in gauges[name]:
+                lines.append(f'{name}{_format_labels(_label_key(labels))} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """只提供 GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        try:
+            app = getattr(self.server, 'app', None)
+            if app is not None:
+                # 工作队列等 collector 需要数据库会话；应用上下文结束时会话随之释放
+                with app.app_context():
+                    body = metrics_registry.render_prometheus().encode('utf-8')
+            else:
+                body = metrics_registry.render_prometheus().encode('utf-8')
+        except Exception as e:
+            self.send_error(500, f'export metrics failed: {str(e)}')
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0', app=None) -> Optional[ThreadingHTTPServer]:
+    """
+    在后台线程中启动只提供 /metrics 的HTTP服务，导出本进程的指标
+
+    指标注册表是进程内的，不经过Flask的进程（worker.py 的主进程与子进程）用它供 Prometheus 分别抓取。
+    传入 app 时在其应用上下文中导出，否则访问数据库的 collector（如工作队列条目数）会失败而被跳过。
+    启动失败（端口被占用等）只记录日志，返回 None。
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    except OSError as e:
+        logger.error(f"指标端点启动失败 {host}:{port}: {str(e)}")
+        return None
+
+    server.daemon_threads = True
+    server.app = app
+    threading.Thread(target=server.serve_forever, name=f'metrics-server-{port}', daemon=True).start()
+    logger.info(f"指标端点已启动: http://{host}:{port}/metrics")
+    return server
+
+
+def _collect_api_client_gauges():
+    """外部API限流器与熔断器的当前状态"""
+    from app.services.rate_limiter import rate_limiter_registry
+    from app.services.circuit_breaker import circuit_breaker_registry
+
+    state_values = {'closed': 0, 'half_open': 1, 'open': 2}
+    for name, stats in circuit_breaker_registry.get_all_stats().items():
+        yield ('api_client_circuit_state', 'Circuit breaker state (0=closed, 1=half_open, 2=open)',
+               {'client': name}, state_values.get(stats['state'], 0))
+    for name, stats in rate_limiter_registry.get_all_stats().items():
+        yield ('api_client_concurrency_limit', 'Adaptive concurrency limit of the client rate limiter',
+               {'client': name}, stats['concurrency_limit'])
+        yield ('api_client_in_flight', 'Requests currently holding a rate limiter slot',
+               {'client': name}, stats['in_flight'])
+
+
+# 创建全局指标注册表
+metrics_registry = MetricsRegistry()
+metrics_registry.describe(API_REQUEST_DURATION, 'histogram', 'External API request latency per attempt')
+metrics_registry.describe(API_REQUESTS_TOTAL, 'counter', 'External API requests by status code or error kind')
+metrics_registry.describe(API_RETRIES_TOTAL, 'counter', 'External API request retries')
+metrics_registry.describe(PHASE_DURATION, 'histogram', 'Workflow phase execution duration')
+metrics_registry.describe(PHASE_RUNS_TOTAL, 'counter', 'Workflow phase executions by result')
+metrics_registry.register_collector(_collect_api_client_gauges)
@@ -0,0 +1,331 @@
+"""
+外部API自适应限流服务
+每个外部API一个进程级限流器（所有线程共享）：令牌桶控制请求速率，
+AIMD 调整并发上限——延迟健康时加性增长，遇到 429 / 超时 / 503 时乘性减半，
+并遵守服务端返回的 Retry-After
+"""
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.config import Config
+from app.exceptions import APIRateLimitException
+
+
+CONFIG_PREFIX = 'api.rate_limit.'
+
+# 延迟超过目标值时的温和收缩系数、限流/超时时的乘性减小系数
+LATENCY_DECREASE_FACTOR = 0.9
+THROTTLE_DECREASE_FACTOR = 0.5
+# 两次乘性减小的最小间隔（秒），避免一批并发请求同时429把并发压到最低
+DECREASE_COOLDOWN_SECONDS = 1.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或HTTP日期），无法解析时返回 None"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitSlot:
+    """一次已获得许可的请求，请求结束后上报结果并释放并发名额"""
+
+    def __init__(self, limiter: 'EndpointRateLimiter'):
+        self.limiter = limiter
+        self.started_at = time.time()
+        self._released = False
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        self.limiter._on_success(latency if latency is not None else time.time() - self.started_at)
+        self.release()
+
+    def record_throttled(self, retry_after: Optional[float] = None) -> None:
+        self.limiter._on_throttled(retry_after)
+        self.release()
+
+    def record_timeout(self) -> None:
+        self.limiter._on_overload('timeouts')
+        self.release()
+
+    def record_overloaded(self) -> None:
+        """服务端过载（503）"""
+        self.limiter._on_overload('overloaded')
+        self.release()
+
+    def record_error(self) -> None:
+        self.release()
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.limiter._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+        return False
+
+
+class EndpointRateLimiter:
+    """单个外部API的令牌桶 + AIMD 并发限流器"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.logger = logging.getLogger(f"{__name__}.{name}")
+        self._condition = threading.Condition()
+
+        defaults = Config.API_RATE_LIMITS.get(name, {})
+        self.settings: Dict[str, Any] = {
+            'requests_per_second': defaults.get('requests_per_second', 0),
+            'burst': defaults.get('burst', 1),
+            'min_concurrency': defaults.get('min_concurrency', 1),
+            'max_concurrency': defaults.get('max_concurrency', 10),
+            'latency_target_ms': defaults.get('latency_target_ms', 10000)
+        }
+        self._config_loaded_at = 0.0
+
+        # 令牌桶
+        self._tokens = float(self.settings['burst'])
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+        # AIMD 并发窗口：从上限的一半起步
+        self._concurrency_limit = float(max(
+            self.settings['min_concurrency'], self.settings['max_concurrency'] / 2
+        ))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+
+        self.stats = {
+            'acquired': 0,
+            'waited': 0,
+            'total_wait_time': 0.0,
+            'throttled': 0,
+            'timeouts': 0,
+            'overloaded': 0,
+            'retry_after_honored': 0,
+            'increases': 0,
+            'decreases': 0
+        }
+
+    # ------------------------------------------------------------------
+    # 配置
+    # ------------------------------------------------------------------
+
+    def refresh_config(self, force: bool = False) -> None:
+        """从系统配置（api.rate_limit.<name>.*）刷新限流参数，无应用上下文时沿用当前值"""
+        now = time.monotonic()
+        if not force and now - self._config_loaded_at < Config.API_RATE_LIMIT_REFRESH_SECONDS:
+            return
+        self._config_loaded_at = now
+
+        try:
+            from flask import has_app_context
+            if not has_app_context():
+                return
+            from app.services.system_config_service import SystemConfigService
+            prefix = f'{CONFIG_PREFIX}{self.name}.'
+            overrides = SystemConfigService().get_configs_by_prefix(prefix)
+        except Exception as e:
+            self.logger.warning(f"读取限流配置失败，沿用当前配置: {str(e)}")
+            return
+
+        if overrides:
+            self.apply_settings({key[len(prefix):]: value for key, value in overrides.items()})
+
+    def apply_settings(self, settings: Dict[str, Any]) -> None:
+        """更新限流参数（忽略未知键和无效值）"""
+        with self._condition:
+            changed = {}
+            for key, value in settings.items():
+                if key not in self.settings:
+                    continue
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                if key in ('burst', 'min_concurrency', 'max_concurrency'):
+                    value = max(1, int(value))
+                if value != self.settings[key]:
+                    changed[key] = value
+                    self.settings[key] = value
+
+            if changed:
+                self.settings['min_concurrency'] = min(self.settings['min_concurrency'], self.settings['max_concurrency'])
+                self._tokens = min(self._tokens, float(self.settings['burst']))
+                self._concurrency_limit = min(
+                    max(self._concurrency_limit, self.settings['min_concurrency']),
+                    self.settings['max_concurrency']
+                )
+                self._condition.notify_all()
+                self.logger.info(f"限流配置已更新 [{self.name}]: {changed}")
+
+    # ------------------------------------------------------------------
+    # 获取 / 释放
+    # ------------------------------------------------------------------
+
+    def _refill(self, now: float) -> None:
+        rate = self.settings['requests_per_second']
+        if rate > 0:
+            self._tokens = min(float(self.settings['burst']), self._tokens + (now - self._last_refill) * rate)
+        self._last_refill = now
+
+    def _next_ready_delay(self, now: float) -> float:
+        """距离可以发出下一次请求的秒数，0 表示立即可发"""
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._in_flight >= int(self._concurrency_limit):
+            return -1  # 等待并发名额释放
+        rate = self.settings['requests_per_second']
+        if rate <= 0 or self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / rate
+
+    def acquire(self, timeout: Optional[float] = None) -> RateLimitSlot:
+        """
+        阻塞直到获得一个令牌和一个并发名额
+
+        Raises:
+            APIRateLimitException: 超过 timeout（默认 API_RATE_LIMIT_ACQUIRE_TIMEOUT）仍未获得许可
+        """
+        self.refresh_config()
+        timeout = Config.API_RATE_LIMIT_ACQUIRE_TIMEOUT if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._next_ready_delay(now)
+                if delay == 0:
+                    break
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise APIRateLimitException(
+                        f"{self.name} API本地限流等待超时（{timeout}秒）",
+                        retry_after=int(delay) + 1 if delay > 0 else None
+                    )
+                waited = True
+                # delay<0 表示等待并发名额，由 release 唤醒；仍设置上限以便定期复查
+                self._condition.wait(timeout=min(remaining, delay if delay > 0 else 1.0))
+
+            if self.settings['requests_per_second'] > 0:
+                self._tokens -= 1
+            self._in_flight += 1
+            self.stats['acquired'] += 1
+            if waited:
+                self.stats['waited'] += 1
+                self.stats['total_wait_time'] += time.monotonic() - start
+
+        return RateLimitSlot(self)
+
+    def _release(self) -> None:
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._condition.notify_all()
+
+    # ------------------------------------------------------------------
+    # AIMD 反馈
+    # ------------------------------------------------------------------
+
+    def _on_success(self, latency: float) -> None:
+        with self._condition:
+            if latency * 1000 <= self.settings['latency_target_ms']:
+                # 加性增长：每个并发窗口的请求全部成功约增加1
+                if self._concurrency_limit < self.settings['max_concurrency']:
+                    self._concurrency_limit = min(
+                        float(self.settings['max_concurrency']),
+                        self._concurrency_limit + 1.0 / self._concurrency_limit
+                    )
+                    self.stats['increases'] += 1
+            else:
+                self._decrease(LATENCY_DECREASE_FACTOR)
+
+    def _on_throttled(self, retry_after: Optional[float]) -> None:
+        with self._condition:
+            self.stats['throttled'] += 1
+            if retry_after:
+                # 服务端要求的等待期内暂停所有线程发出新请求
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                self.stats['retry_after_honored'] += 1
+            self._decrease(THROTTLE_DECREASE_FACTOR)
+
+    def _on_overload(self, stat_key: str) -> None:
+        with self._condition:
+            self.stats[stat_key] += 1
+            self._decrease(THROTTLE_DECREASE_FACTOR)
+
+    def _decrease(self, factor: float) -> None:
+        """乘性减小并发上限（调用方已持有锁）"""
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        new_limit = max(float(self.settings['min_concurrency']), self._concurrency_limit * factor)
+        if new_limit < self._concurrency_limit:
+            self.logger.info(f"[{self.name}] 并发上限下调: {self._concurrency_limit:.2f} -> {new_limit:.2f}")
+            self._concurrency_limit = new_limit
+            self.stats['decreases'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流器状态"""
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            stats = dict(self.stats)
+            stats['total_wait_time'] = round(stats['total_wait_time'], 3)
+            stats.update({
+                'settings': dict(self.settings),
+                'concurrency_limit': round(self._concurrency_limit, 2),
+                'in_flight': self._in_flight,
+                'available_tokens': round(self._tokens, 2),
+                'blocked_for_seconds': round(max(0.0, self._blocked_until - now), 2)
+            })
+            return stats
+
+
+class RateLimiterRegistry:
+    """进程级限流器注册表"""
+
+    def __init__(self):
+        self._limiters: Dict[str, EndpointRateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> EndpointRateLimiter:
+        """获取（或创建）指定外部API的限流器"""
+        with self._lock:
+            if name not in self._limiters:
+                self._limiters[name] = EndpointRateLimiter(name)
+            return self._limiters[name]
+
+    def refresh_all(self) -> None:
+        """立即从系统配置刷新所有限流器（需在应用上下文中调用）"""
+        for limiter in list(self._limiters.values()):
+            limiter.refresh_config(force=True)
+
+    def get_all_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.get_stats() for name, limiter in list(self._limiters.items())}
+
+
+# 创建全局限流器注册表
+rate_limiter_registry = RateLimiterRegistry()
@@ -0,0 +1,203 @@
+"""
+请求合并（single-flight）服务
+同一时刻载荷相同的外部API请求只发出一次，其余调用方等待并共享该请求的结果（或异常）。
+同步客户端按进程内线程合并，异步客户端按事件循环合并
+"""
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.config import Config
+
+
+T = TypeVar('T')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _normalize_payload(value: Any) -> Any:
+    """规范化载荷中的文本（NFKC、去首尾空白、合并连续空白），不改变大小写"""
+    if isinstance(value, str):
+        return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFKC', value)).strip()
+    if isinstance(value, dict):
+        return {str(key): _normalize_payload(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_payload(item) for item in value]
+    return value
+
+
+class _InFlightCall:
+    """一次进行中的请求"""
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class RequestCoalescer:
+    """进程级请求合并器"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+        self._async_calls: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return Config.API_COALESCING_ENABLED and not getattr(self._local, 'bypass', False)
+
+    @contextlib.contextmanager
+    def bypass(self):
+        """当前线程内的请求不参与合并（如对冲请求需要真正发出第二次调用）"""
+        previous = getattr(self._local, 'bypass', False)
+        self._local.bypass = True
+        try:
+            yield
+        finally:
+            self._local.bypass = previous
+
+    def make_key(
+        self,
+        namespace: str,
+        method: str,
+        url: str,
+        payload: Optional[Any] = None,
+        params: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """由客户端、请求方法、URL 和规范化后的载荷计算合并键"""
+        raw = json.dumps(
+            [namespace, method.upper(), url, _normalize_payload(payload), _normalize_payload(params)],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _count(self, namespace: str, key: str) -> None:
+        """累加统计（调用方已持有锁）"""
+        stats = self._stats.setdefault(namespace, {'executed': 0, 'coalesced': 0, 'shared_errors': 0})
+        stats[key] += 1
+
+    def execute(self, namespace: str, key: str, fn: Callable[[], T]) -> T:
+        """
+        执行请求：相同键已有请求在途时等待其结果，否则由当前线程发出请求
+
+        Args:
+            namespace: 统计维度（客户端名称）
+            key: 合并键（见 make_key）
+            fn: 实际发出请求的函数
+        """
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self._count(namespace, 'executed')
+            else:
+                self._count(namespace, 'coalesced')
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                with self._lock:
+                    self._count(namespace, 'shared_errors')
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def execute_async(self, namespace: str, key: str, coroutine_factory: Callable[[], Awaitable[T]]) -> T:
+        """execute 的异步版本：同一事件循环内相同键的协程共享一次请求"""
+        if not self.enabled:
+            return await coroutine_factory()
+
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        with self._lock:
+            future = self._async_calls.get(call_key)
+            leader = future is None
+            if leader:
+                future = loop.create_future()
+                self._async_calls[call_key] = future
+                self._count(namespace, 'executed')
+            else:
+                self._count(namespace, 'coalesced')
+
+        if not leader:
+            try:
+                # shield：单个等待方被取消时不影响其他等待方
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                raise
+            except BaseException:
+                with self._lock:
+                    self._count(namespace, 'shared_errors')
+                raise
+
+        try:
+            result = await coroutine_factory()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 标记异常已读取，没有等待方时不产生告警
+            raise
+        finally:
+            with self._lock:
+                self._async_calls.pop(call_key, None)
+
+    def get_stats(self, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """获取合并统计；coalesced 即节省的外部请求次数"""
+        with self._lock:
+            if namespace is not None:
+                stats = dict(self._stats.get(namespace, {'executed': 0, 'coalesced': 0, 'shared_errors': 0}))
+                total = stats['executed'] + stats['coalesced']
+                stats['saved_rate'] = round(stats['coalesced'] / total * 100, 2) if total else 0.0
+                stats['enabled'] = Config.API_COALESCING_ENABLED
+                return stats
+
+            return {
+                'enabled': Config.API_COALESCING_ENABLED,
+                'in_flight': len(self._calls) + len(self._async_calls),
+                'saved_calls': sum(item['coalesced'] for item in self._stats.values()),
+                'clients': {name: dict(item) for name, item in self._stats.items()}
+            }
+
+    def reset_stats(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._stats.clear()
+            else:
+                self._stats.pop(namespace, None)
+
+
+# 创建全局请求合并器实例
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,228 @@
+"""
+对冲请求服务
+请求在最近延迟的指定分位数时间内仍未返回时，再发出一个相同的对冲请求，先返回的成功结果胜出；
+对冲比例受上限约束，避免消耗过多外部API配额
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.config import Config
+from app.services.request_coalescer import request_coalescer
+
+
+T = TypeVar('T')
+
+
+class RequestHedger:
+    """单个外部API的对冲请求执行器"""
+
+    def __init__(
+        self,
+        name: str,
+        percentile: Optional[float] = None,
+        window_size: Optional[int] = None,
+        min_samples: Optional[int] = None,
+        max_hedge_rate: Optional[float] = None,
+        min_delay: Optional[float] = None
+    ):
+        """
+        初始化对冲执行器
+
+        Args:
+            name: 外部API名称
+            percentile: 触发对冲的延迟分位数（0-100）
+            window_size: 延迟与对冲比例的统计窗口（最近调用数）
+            min_samples: 样本数不足时不对冲
+            max_hedge_rate: 窗口内对冲调用占比上限（0-1）
+            min_delay: 对冲等待时间下限（秒）
+        """
+        self.name = name
+        self.logger = logging.getLogger(f"{__name__}.{name}")
+        self.percentile = percentile or Config.API_HEDGING_PERCENTILE
+        self.window_size = window_size or Config.API_HEDGING_WINDOW_SIZE
+        self.min_samples = min_samples or Config.API_HEDGING_MIN_SAMPLES
+        self.max_hedge_rate = Config.API_HEDGING_MAX_RATE if max_hedge_rate is None else max_hedge_rate
+        self.min_delay = Config.API_HEDGING_MIN_DELAY if min_delay is None else min_delay
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=self.window_size)
+        self._hedged_window = deque(maxlen=self.window_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.stats = {
+            'calls': 0,
+            'hedged': 0,
+            'hedge_wins': 0,
+            'skipped_by_rate_cap': 0,
+            'failed': 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return Config.API_HEDGING_ENABLED
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=Config.API_HEDGING_MAX_WORKERS,
+                    thread_name_prefix=f'hedge-{self.name}'
+                )
+            return self._executor
+
+    def get_hedge_delay(self) -> Optional[float]:
+        """按最近成功的原请求的延迟分位数计算对冲等待时间，样本不足时返回 None"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def _allow_hedge(self) -> bool:
+        """对冲后窗口内的对冲比例不超过上限时才允许（调用方已持有锁）"""
+        hedged = sum(self._hedged_window) + 1
+        total = max(len(self._hedged_window) + 1, self.min_samples)
+        return hedged / total <= self.max_hedge_rate
+
+    def _record(self, latency: Optional[float], hedged: bool) -> None:
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self._hedged_window.append(hedged)
+
+    def _record_late_primary(self, future: Future) -> None:
+        """对冲请求胜出后，原请求完成时补记其延迟"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, latency = future.result()
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _timed(self, fn: Callable[[], T], bypass_coalescing: bool = False):
+        """在工作线程中执行并返回 (结果, 耗时)；对冲请求不参与请求合并，否则会被并入原请求"""
+        start = time.time()
+        if bypass_coalescing:
+            with request_coalescer.bypass():
+                result = fn()
+        else:
+            result = fn()
+        return result, time.time() - start
+
+    def execute(self, fn: Callable[[], T]) -> T:
+        """
+        执行请求，必要时发出对冲请求
+
+        对冲请求发出后不取消较慢的一方（其结果被丢弃），两者都失败时抛出原请求的异常。
+        """
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            self.stats['calls'] += 1
+
+        delay = self.get_hedge_delay()
+        executor = self._get_executor()
+        primary = executor.submit(self._timed, fn)
+
+        if delay is None:
+            return self._finish(primary, None)
+
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return self._finish(primary, None)
+
+        with self._lock:
+            allowed = self._allow_hedge()
+            if allowed:
+                self.stats['hedged'] += 1
+            else:
+                self.stats['skipped_by_rate_cap'] += 1
+
+        if not allowed:
+            return self._finish(primary, None)
+
+        self.logger.info(f"[{self.name}] 请求超过 {delay:.2f}s 未返回，发出对冲请求")
+        hedge = executor.submit(self._timed, fn, True)
+        return self._finish(primary, hedge)
+
+    def _finish(self, primary: Future, hedge: Optional[Future]) -> T:
+        """等待首个成功结果"""
+        pending = {primary} if hedge is None else {primary, hedge}
+        errors = {}
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # 同时完成时优先采用原请求
+            for future in sorted(done, key=lambda item: item is not primary):
+                error = future.exception()
+                if error is None:
+                    result, latency = future.result()
+                    if future is primary:
+                        self._record(latency, hedge is not None)
+                    else:
+                        # 延迟样本只取原请求：对冲请求晚发出、耗时只是胜出者的剩余时间，计入会使分位数偏低、对冲越来越早；
+                        # 原请求仍在执行时等它完成后补记，先于对冲请求失败的不计入
+                        self._record(None, True)
+                        primary.add_done_callback(self._record_late_primary)
+                        with self._lock:
+                            self.stats['hedge_wins'] += 1
+                    return result
+                errors[future] = error
+
+        self._record(None, hedge is not None)
+        with self._lock:
+            self.stats['failed'] += 1
+        raise errors.get(primary) or next(iter(errors.values()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取对冲统计"""
+        delay = self.get_hedge_delay()
+        with self._lock:
+            stats = dict(self.stats)
+            window = len(self._hedged_window)
+            stats.update({
+                'enabled': self.enabled,
+                'percentile': self.percentile,
+                'max_hedge_rate': self.max_hedge_rate,
+                'window_hedge_rate': round(sum(self._hedged_window) / window * 100, 2) if window else 0.0,
+                'latency_samples': len(self._latencies),
+                'current_hedge_delay': round(delay, 3) if delay is not None else None
+            })
+        return stats
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+class RequestHedgerRegistry:
+    """进程级对冲执行器注册表"""
+
+    def __init__(self):
+        self._hedgers: Dict[str, RequestHedger] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> RequestHedger:
+        """获取（或创建）指定外部API的对冲执行器"""
+        with self._lock:
+            if name not in self._hedgers:
+                self._hedgers[name] = RequestHedger(name)
+            return self._hedgers[name]
+
+    def get_all_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: hedger.get_stats() for name, hedger in list(self._hedgers.items())}
+
+    def shutdown_all(self) -> None:
+        for hedger in list(self._hedgers.values()):
+            hedger.shutdown()
+
+
+# 创建全局对冲执行器注册表
+request_hedger_registry = RequestHedgerRegistry()
@@ -0,0 +1,224 @@
+"""
+API结果日志服务
+答案生成、评分API每返回一个结果就在独立连接上写入 api_result_journal 并立即提交（不随批次事务），
+批次写回答案/评分时在同一事务中删除对应条目。进程在写回之前退出（或批次提交失败）时，
+下次选中同一问题会按 (问题, AI类型, 输入摘要) 重放日志中的结果，不再重复调用付费API。
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.config import Config
+from app.models.result_journal import ApiResultJournalEntry
+from app.services.metrics import metrics_registry
+from app.utils.database import db, get_dialect_name
+
+
+RESULT_JOURNAL_EVENTS_TOTAL = 'api_result_journal_events_total'
+_CHUNK_SIZE = 500
+
+
+def make_input_hash(*parts: Any) -> str:
+    """API输入的摘要（各部分按JSON序列化后拼接）"""
+    raw = '\x1f'.join(json.dumps(part, ensure_ascii=False, sort_keys=True, default=str) for part in parts)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResultJournal:
+    """API结果日志"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {'recorded': 0, 'replayed': 0, 'discarded': 0, 'errors': 0}
+
+    @property
+    def enabled(self) -> bool:
+        # SQLite 同一时间只允许一个写事务，独立连接的日志提交会一直等待批次事务，本地SQLite环境不启用
+        return Config.RESULT_JOURNAL_ENABLED and get_dialect_name() != 'sqlite'
+
+    def _count(self, kind: str, event: str, amount: int = 1) -> None:
+        if not amount:
+            return
+        with self._lock:
+            self._stats[event] += amount
+        metrics_registry.inc(RESULT_JOURNAL_EVENTS_TOTAL, {'kind': kind, 'event': event}, amount)
+
+    def record(self, kind: str, business_id: str, assistant_type: str, input_hash: str, result: Any) -> bool:
+        """
+        写入一条API结果并立即提交
+
+        使用独立连接，不经过调用方的会话和事务：批次稍后回滚或进程退出时结果仍然保留。
+        写入失败只记录日志，不影响处理流程。
+        """
+        if not self.enabled:
+            return False
+
+        values = {
+            'kind': kind,
+            'question_business_id': business_id,
+            'assistant_type': assistant_type or '',
+            'input_hash': input_hash,
+            'payload': json.dumps(result, ensure_ascii=False, default=str),
+            'created_at': datetime.utcnow()
+        }
+        try:
+            with db.engine.begin() as connection:
+                self._upsert(connection, values)
+        except Exception as e:
+            self._count(kind, 'errors')
+            self.logger.warning(f"写入API结果日志失败 {kind}:{business_id}:{assistant_type}: {str(e)}")
+            return False
+
+        self._count(kind, 'recorded')
+        return True
+
+    def _upsert(self, connection, values: Dict[str, Any]) -> None:
+        """同一问题同一类结果覆盖为最新一条"""
+        table = ApiResultJournalEntry.__table__
+        dialect_name = get_dialect_name()
+        if dialect_name in ('postgresql', 'sqlite'):
+            if dialect_name == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['kind', 'question_business_id', 'assistant_type'],
+                set_={
+                    'input_hash': stmt.excluded.input_hash,
+                    'payload': stmt.excluded.payload,
+                    'created_at': stmt.excluded.created_at
+                }
+            )
+            connection.execute(stmt)
+        else:
+            connection.execute(table.delete().where(
+                (table.c.kind == values['kind']) &
+                (table.c.question_business_id == values['question_business_id']) &
+                (table.c.assistant_type == values['assistant_type'])
+            ))
+            connection.execute(table.insert().values(values))
+
+    def load(self, kind: str, business_ids: Iterable[str]) -> Dict[Tuple[str, str, str], Any]:
+        """
+        批量读取这些问题的日志结果
+
+        Returns:
+            {(问题业务ID, AI类型, 输入摘要): API返回结果}，评分结果的AI类型为空字符串
+        """
+        business_ids = list(dict.fromkeys(business_ids))
+        journaled = {}
+        if not self.enabled or not business_ids:
+            return journaled
+
+        try:
+            for start in range(0, len(business_ids), _CHUNK_SIZE):
+                entries = db.session.query(ApiResultJournalEntry).filter(
+                    ApiResultJournalEntry.kind == kind,
+                    ApiResultJournalEntry.question_business_id.in_(business_ids[start:start + _CHUNK_SIZE])
+                ).all()
+                for entry in entries:
+                    journaled[(entry.question_business_id, entry.assistant_type, entry.input_hash)] = entry.get_payload()
+        except Exception as e:
+            self._count(kind, 'errors')
+            self.logger.warning(f"读取API结果日志失败: {str(e)}")
+            return {}
+
+        if journaled:
+            self.logger.info(f"API结果日志中有 {len(journaled)} 条未写回的{kind}结果，将直接重放")
+        return journaled
+
+    def replay(
+        self,
+        journaled: Dict[Tuple[str, str, str], Any],
+        kind: str,
+        business_id: str,
+        assistant_type: str,
+        input_hash: str
+    ) -> Optional[Any]:
+        """从 load 的结果中取出可重放的结果，没有或输入已变化时返回 None"""
+        result = journaled.get((business_id, assistant_type or '', input_hash))
+        if result is not None:
+            self._count(kind, 'replayed')
+        return result
+
+    def discard(self, kind: str, business_ids: Iterable[str]) -> None:
+        """
+        删除这些问题的日志条目
+
+        在调用方的会话中执行（SAVEPOINT 内）、随写回答案/评分的事务一起提交：写回成功则条目消失，
+        回滚则条目保留待下次重放。删除失败只记录日志，残留条目由 cleanup 按保留天数清理。
+        """
+        business_ids = list(dict.fromkeys(business_ids))
+        if not self.enabled or not business_ids:
+            return
+
+        deleted = 0
+        try:
+            with db.session.begin_nested():
+                for start in range(0, len(business_ids), _CHUNK_SIZE):
+                    deleted += db.session.query(ApiResultJournalEntry).filter(
+                        ApiResultJournalEntry.kind == kind,
+                        ApiResultJournalEntry.question_business_id.in_(business_ids[start:start + _CHUNK_SIZE])
+                    ).delete(synchronize_session=False)
+        except Exception as e:
+            self._count(kind, 'errors')
+            self.logger.warning(f"删除API结果日志失败: {str(e)}")
+            return
+        self._count(kind, 'discarded', deleted)
+
+    def cleanup(self, retention_days: Optional[int] = None) -> Dict[str, Any]:
+        """删除超过保留天数仍未被重放的条目（问题已删除、输入已变化等）"""
+        retention_days = Config.RESULT_JOURNAL_RETENTION_DAYS if retention_days is None else retention_days
+        try:
+            deleted = db.session.query(ApiResultJournalEntry).filter(
+                ApiResultJournalEntry.created_at < datetime.utcnow() - timedelta(days=retention_days)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+
+            message = f"API结果日志清理完成，删除 {deleted} 条"
+            self.logger.info(message)
+            return {'success': True, 'message': message, 'deleted_count': deleted}
+
+        except Exception as e:
+            db.session.rollback()
+            error_msg = f"API结果日志清理失败: {str(e)}"
+            self.logger.error(error_msg)
+            return {'success': False, 'message': error_msg, 'deleted_count': 0}
+
+    def get_pending_counts(self) -> Dict[str, int]:
+        """各类结果尚未写回的条目数"""
+        rows = db.session.query(
+            ApiResultJournalEntry.kind, func.count(ApiResultJournalEntry.id)
+        ).group_by(ApiResultJournalEntry.kind)
+        return {kind: count for kind, count in rows}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({'enabled': self.enabled, 'retention_days': Config.RESULT_JOURNAL_RETENTION_DAYS})
+        try:
+            stats['pending'] = self.get_pending_counts()
+        except Exception as e:
+            stats['pending'] = {}
+            stats['error'] = str(e)
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = self._empty_stats()
+
+
+# 创建全局API结果日志实例
+result_journal = ResultJournal()
+metrics_registry.describe(RESULT_JOURNAL_EVENTS_TOTAL, 'counter', 'API result journal events by kind')
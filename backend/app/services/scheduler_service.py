@@ -4,6 +4,7 @@
 """
 import logging
 import threading
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Callable, Union
 from enum import Enum
@@ -22,6 +23,7 @@ except ImportError:
     EVENT_JOB_ERROR = None
 
 from app.config import Config
+from app.services.metrics import metrics_registry
 
 
 class TaskStatus(Enum):
@@ -42,6 +44,10 @@ class WorkflowPhase(Enum):
     REVIEW = "review"                    # 审核阶段
 
 
+# 流式执行模式下由流式流水线一并处理的阶段
+STREAMING_PHASES = (WorkflowPhase.CLASSIFICATION, WorkflowPhase.ANSWER_GENERATION, WorkflowPhase.SCORING)
+
+
 class SchedulerService:
     """定时任务调度服务"""
     
@@ -53,6 +59,11 @@ class SchedulerService:
         self.execution_history: List[Dict[str, Any]] = []
         self.max_history_size = 200
         self._lock = threading.Lock()
+        # 工作流执行锁：定时任务与数据到达事件触发的工作流不重叠执行
+        self._workflow_run_lock = threading.Lock()
+        # 数据到达事件因已有工作流运行而跳过时登记，当前工作流结束后重新触发一次
+        self._rerun_lock = threading.Lock()
+        self._rerun_requested = False
         
         # 工作流配置
         self.workflow_config = {
@@ -126,6 +137,10 @@ class SchedulerService:
             
             # 初始化工作流状态
             self._initialize_workflow_status()
+
+            # 事件驱动同步：新数据到达后数秒内触发工作流，定时任务保留为兜底
+            if app.config.get('SYNC_EVENT_DRIVEN_ENABLED', False):
+                self._start_sync_notifier(app)
             
             # 启动时立即处理已有数据
             if app.config.get('AUTO_PROCESS_ON_STARTUP', True):
@@ -166,6 +181,19 @@ class SchedulerService:
         timer = threading.Timer(3.0, immediate_process)
         timer.start()
     
+    def _start_sync_notifier(self, app):
+        """启动源表新数据到达通知器"""
+        from app.services.sync_notifier import sync_notifier
+
+        def on_data_arrival():
+            self.logger.info("⚡ 检测到源表新数据，触发工作流")
+            return self.execute_full_workflow_with_suspend_check(app, rerun_on_skip=True)
+
+        try:
+            sync_notifier.start(app, on_data_arrival)
+        except Exception as e:
+            self.logger.error(f"数据到达通知器启动失败，仅使用定时任务: {str(e)}")
+
     def _register_default_jobs(self, app):
         """注册默认的定时任务"""
         # 获取可配置的间隔时间
@@ -196,6 +224,23 @@ class SchedulerService:
             description=f'每{interval_minutes}分钟自动同步数据（可独立执行）',
             enabled=False  # 默认禁用，由主工作流控制
         )
+
+        # 流水线计数器对账任务 - 修正计数器与精确计数间的漂移
+        reconcile_minutes = app.config.get('COUNTER_RECONCILE_MINUTES', 30)
+        self.add_interval_job(
+            job_id='counter_reconcile',
+            job_name='流水线计数器对账',
+            func=lambda: self._reconcile_counters(app),
+            minutes=reconcile_minutes,
+            description=f'每{reconcile_minutes}分钟用精确计数校正统计计数器',
+            enabled=reconcile_minutes > 0
+        )
+
+    def _reconcile_counters(self, app):
+        """执行流水线计数器对账"""
+        with app.app_context():
+            from app.services.counter_service import counter_service
+            return counter_service.reconcile()
     
     def _initialize_workflow_status(self):
         """初始化工作流状态"""
@@ -213,6 +258,7 @@ class SchedulerService:
                     'current_batch_id': None,
                     'progress': 0,
                     'message': '',
+                    'last_duration': None,
                     'can_execute': self._can_execute_phase(phase)
                 }
     
@@ -232,8 +278,14 @@ class SchedulerService:
                 WorkflowPhase.ANSWER_GENERATION,
                 WorkflowPhase.SCORING
             ]
+            execution_mode = self._get_execution_mode(app)
             
             for phase in phases:
+                if execution_mode == 'streaming' and phase in STREAMING_PHASES:
+                    # 流式模式：数据同步之后，分类/答案生成/评分由流式流水线逐题流转
+                    results.update(self._execute_streaming_phases(app, workflow_id))
+                    break
+                
                 self.logger.info(f"执行工作流阶段: {phase.value}")
                 
                 result = self.execute_workflow_phase(app, phase, workflow_id)
@@ -268,9 +320,87 @@ class SchedulerService:
                 'results': {}
             }
     
-    def execute_full_workflow_with_suspend_check(self, app) -> Dict[str, Any]:
-        """执行完整工作流（带无数据挂起检查）"""
+    def _get_execution_mode(self, app) -> str:
+        """工作流执行模式：batch（各阶段整批依次执行）或 streaming（逐题流式流转）"""
+        try:
+            with app.app_context():
+                from app.services.system_config_service import SystemConfigService
+                mode = SystemConfigService().get_config('workflow.execution_mode', Config.WORKFLOW_EXECUTION_MODE)
+        except Exception as e:
+            self.logger.error(f"获取工作流执行模式失败，使用默认值: {str(e)}")
+            mode = Config.WORKFLOW_EXECUTION_MODE
+        return mode if mode in ('batch', 'streaming') else 'batch'
+    
+    def _execute_streaming_phases(self, app, workflow_id: str) -> Dict[str, Any]:
+        """以流式流水线执行分类、答案生成、评分阶段，按阶段更新工作流状态"""
+        from app.services.streaming_pipeline import streaming_pipeline
+        
+        self.logger.info(f"开始执行流式处理阶段 [workflow: {workflow_id}]")
+        for phase in STREAMING_PHASES:
+            self._update_phase_status(phase, TaskStatus.RUNNING, workflow_id, message='流式处理中')
+        start_time = time.time()
+        
+        try:
+            run_result = streaming_pipeline.run(app)
+        except Exception as e:
+            run_result = {'success': False, 'message': f"流式处理阶段异常: {str(e)}"}
+            self.logger.error(run_result['message'])
+        duration = time.time() - start_time
+        
+        results = {}
+        for phase in STREAMING_PHASES:
+            stage_stats = run_result.get('stages', {}).get(phase.value, {})
+            success = run_result.get('success', False)
+            message = (
+                f"流式处理: 接收 {stage_stats.get('received', 0)}, 成功 {stage_stats.get('success', 0)}, "
+                f"失败 {stage_stats.get('failed', 0)}"
+            ) if success else run_result.get('message', '')
+            status = TaskStatus.SUCCESS if success else TaskStatus.FAILED
+            
+            metrics_registry.record_phase(phase.value, status.value, duration)
+            self._update_phase_status(
+                phase,
+                status,
+                workflow_id,
+                message=message,
+                progress=100 if success else 0,
+                duration=duration
+            )
+            results[phase.value] = {'success': success, 'message': message, 'mode': 'streaming', 'stats': stage_stats}
+        
+        results['streaming'] = {
+            'success': run_result.get('success', False),
+            'message': run_result.get('message', ''),
+            'duration': run_result.get('duration'),
+            'question_latency': run_result.get('question_latency')
+        }
+        return results
+    
+    def execute_full_workflow_with_suspend_check(self, app, rerun_on_skip: bool = False) -> Dict[str, Any]:
+        """
+        执行完整工作流（带无数据挂起检查）
+        
+        Args:
+            rerun_on_skip: 已有工作流在执行而跳过时，登记在当前工作流结束后重新触发一次（数据到达事件使用）
+        """
         workflow_id = f"workflow_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        # 已有工作流在执行（定时任务或数据到达事件触发）时跳过本次；
+        # 获取失败与登记重跑在同一把锁内，不会与结束时的检查交错而丢失
+        with self._rerun_lock:
+            acquired = self._workflow_run_lock.acquire(blocking=False)
+            if not acquired and rerun_on_skip:
+                self._rerun_requested = True
+        if not acquired:
+            message = '已有工作流正在执行，跳过本次触发' + ('，结束后重新执行' if rerun_on_skip else '')
+            self.logger.info(message)
+            return {
+                'success': True,
+                'workflow_id': workflow_id,
+                'message': message,
+                'skipped': True,
+                'results': {}
+            }
         
         try:
             # 检查是否启用数据检测
@@ -308,6 +438,14 @@ class SchedulerService:
                 'suspended': False,
                 'results': {}
             }
+        finally:
+            with self._rerun_lock:
+                rerun = self._rerun_requested
+                self._rerun_requested = False
+                self._workflow_run_lock.release()
+            if rerun:
+                from app.services.sync_notifier import sync_notifier
+                sync_notifier.notify('rerun_after_workflow')
     
     def _check_if_has_data_to_process(self, app) -> bool:
         """检查是否有可处理的数据"""
@@ -321,35 +459,9 @@ class SchedulerService:
                 min_batch_size = app.config.get('MIN_BATCH_SIZE', 1)
                 
                 # 检查数据同步阶段：是否有新数据需要同步（限制本周数据，避免重复同步）
+                # 优先使用检查点游标/影子表的索引查找，避免逐行计算MD5
                 from app.services.sync_service import sync_service
-                from datetime import datetime, timedelta
-
-                # 获取本周开始时间
-                today = datetime.utcnow()
-                days_since_monday = today.weekday()
-                week_start = today - timedelta(days=days_since_monday)
-                week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-
-                from sqlalchemy import text
-                # 检查本周未同步的数据量（排除已存在的business_id）
-                new_data_query = text("""
-                    SELECT COUNT(*) FROM table1 t1
-                    WHERE t1.query IS NOT NULL
-                    AND t1.query != ''
-                    AND TRIM(t1.query) != ''
-                    AND t1.sendmessagetime >= :week_start
-                    AND NOT EXISTS (
-                        SELECT 1 FROM questions q
-                        WHERE q.business_id = MD5(CONCAT(
-                            t1.pageid,
-                            COALESCE(to_char(t1.sendmessagetime, 'YYYY-MM-DD"T"HH24:MI:SS.US'), ''),
-                            t1.query
-                        ))
-                    )
-                """)
-                new_data_count = db.session.execute(new_data_query, {
-                    'week_start': week_start
-                }).scalar()
+                new_data_count = sync_service.count_pending_source_rows()
                 
                 if new_data_count >= min_batch_size:
                     self.logger.info(f"🔍 检测到 {new_data_count} 条新数据需要同步")
@@ -421,6 +533,7 @@ class SchedulerService:
         
         # 更新阶段状态
         self._update_phase_status(phase, TaskStatus.RUNNING, workflow_id)
+        start_time = time.time()
         
         try:
             with app.app_context():
@@ -439,12 +552,15 @@ class SchedulerService:
                 
                 # 更新阶段状态
                 status = TaskStatus.SUCCESS if result.get('success', False) else TaskStatus.FAILED
+                duration = time.time() - start_time
+                metrics_registry.record_phase(phase.value, status.value, duration)
                 self._update_phase_status(
                     phase, 
                     status, 
                     workflow_id, 
                     message=result.get('message', ''),
-                    progress=100 if status == TaskStatus.SUCCESS else 0
+                    progress=100 if status == TaskStatus.SUCCESS else 0,
+                    duration=duration
                 )
                 
                 return result
@@ -452,12 +568,15 @@ class SchedulerService:
         except Exception as e:
             error_msg = f"阶段 {phase.value} 执行异常: {str(e)}"
             self.logger.error(error_msg)
-            
+
+            duration = time.time() - start_time
+            metrics_registry.record_phase(phase.value, TaskStatus.FAILED.value, duration)
             self._update_phase_status(
                 phase, 
                 TaskStatus.FAILED, 
                 workflow_id, 
-                message=error_msg
+                message=error_msg,
+                duration=duration
             )
             
             return {
@@ -467,13 +586,24 @@ class SchedulerService:
             }
     
     def _execute_data_sync_phase(self, app, workflow_id: str) -> Dict[str, Any]:
-        """执行数据同步阶段"""
+        """执行数据同步阶段（支持增量同步和按时间分片并行的追赶同步）"""
         from app.services.sync_service import sync_service
+        from app.services.system_config_service import SystemConfigService
         
         self.logger.info(f"开始执行数据同步阶段 [workflow: {workflow_id}]")
         
         try:
-            result = sync_service.perform_sync()
+            # 获取数据同步模式配置：incremental（默认）或 catchup
+            config_service = SystemConfigService()
+            data_sync_mode = config_service.get_config('workflow.data_sync_mode', 'incremental')
+            self.logger.info(f"当前数据同步模式: {data_sync_mode}")
+
+            if data_sync_mode == 'catchup':
+                result = sync_service.perform_catchup_sync(
+                    slices=config_service.get_config('workflow.catchup_slices', None)
+                )
+            else:
+                result = sync_service.perform_sync()
             
             if result['success']:
                 self.logger.info(f"数据同步阶段完成: {result['message']}")
@@ -610,9 +740,10 @@ class SchedulerService:
         status: TaskStatus,
         workflow_id: Optional[str] = None,
         message: str = '',
-        progress: int = 0
+        progress: int = 0,
+        duration: Optional[float] = None
     ):
-        """更新阶段状态"""
+        """更新阶段状态（duration 为本次执行耗时，秒）"""
         with self._lock:
             if phase.value in self.workflow_status:
                 self.workflow_status[phase.value].update({
@@ -622,6 +753,8 @@ class SchedulerService:
                     'message': message,
                     'progress': progress
                 })
+                if duration is not None:
+                    self.workflow_status[phase.value]['last_duration'] = round(duration, 3)
                 
                 if status == TaskStatus.RUNNING:
                     self.workflow_status[phase.value]['execution_count'] += 1
@@ -898,9 +1031,21 @@ class SchedulerService:
                 'workflow': {
                     'phases': dict(self.workflow_status),
                     'execution_history': self.execution_history[-10:]  # 最近10条记录
-                }
+                },
+                'sync_notifier': self._get_sync_notifier_status(),
+                'streaming_pipeline': self._get_streaming_pipeline_status()
             }
     
+    def _get_sync_notifier_status(self) -> Dict[str, Any]:
+        """获取数据到达通知器状态"""
+        from app.services.sync_notifier import sync_notifier
+        return sync_notifier.get_status()
+
+    def _get_streaming_pipeline_status(self) -> Dict[str, Any]:
+        """获取流式流水线状态"""
+        from app.services.streaming_pipeline import streaming_pipeline
+        return streaming_pipeline.get_status()
+
     def get_workflow_status(self) -> Dict[str, Any]:
         """获取工作流状态"""
         with self._lock:
@@ -933,9 +1078,14 @@ class SchedulerService:
     
     def shutdown(self):
         """关闭调度器"""
+        from app.services.sync_notifier import sync_notifier
+        sync_notifier.stop()
+
         if self.scheduler and self.scheduler.running:
             self.scheduler.shutdown(wait=False)
             self.logger.info("定时任务调度器已关闭")
+        # 允许再次 initialize（如主节点身份失而复得）
+        self.scheduler = None
 
 
 # 创建全局调度器实例
@@ -0,0 +1,399 @@
+"""
+流式流水线服务
+分类、答案生成、评分三个阶段各有一组工作线程，阶段之间以有界内存队列连接：
+问题分类完成即进入答案生成，三个AI答案齐全即进入评分，不必等待整批完成；
+队列满时上游等待（背压）。记录各阶段队列深度、单题各阶段耗时和端到端耗时
+"""
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.models.question import Question
+from app.services.metrics import metrics_registry, API_LATENCY_BUCKETS, PHASE_DURATION_BUCKETS
+from app.utils.database import db
+
+
+STREAMING_STAGES = ('classification', 'answer_generation', 'scoring')
+
+STAGE_DURATION = 'streaming_pipeline_stage_duration_seconds'
+QUESTION_LATENCY = 'streaming_pipeline_question_latency_seconds'
+STAGE_ITEMS_TOTAL = 'streaming_pipeline_items_total'
+
+# 结束标记：上游全部结束后向每个工作线程投递一个
+_SENTINEL = object()
+
+
+class StageQueue:
+    """阶段输入队列：所有生产者（预加载线程、上游阶段）结束后向每个消费线程投递结束标记"""
+
+    def __init__(self, stage: str, maxsize: int, consumers: int, producers: int):
+        self.stage = stage
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._consumers = consumers
+        self._producers = producers
+        self._lock = threading.Lock()
+        self.max_depth = 0
+        self.received = 0
+
+    def put(self, item: Tuple[str, float]) -> None:
+        self._queue.put(item)
+        with self._lock:
+            self.received += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def get(self):
+        return self._queue.get()
+
+    def producer_done(self) -> None:
+        with self._lock:
+            self._producers -= 1
+            closed = self._producers == 0
+        if closed:
+            for _ in range(self._consumers):
+                self._queue.put(_SENTINEL)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+
+class StreamingRun:
+    """一次流式运行的状态与统计"""
+
+    def __init__(self, queues: Dict[str, StageQueue], workers: Dict[str, int]):
+        self.queues = queues
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._running_workers = dict(workers)
+        self.counts = {stage: Counter() for stage in STREAMING_STAGES}
+        self.latencies: List[float] = []
+
+    def count(self, stage: str, outcome: str) -> None:
+        with self._lock:
+            self.counts[stage][outcome] += 1
+        metrics_registry.inc(STAGE_ITEMS_TOTAL, {'stage': stage, 'outcome': outcome})
+
+    def finish_question(self, started_at: float, outcome: str) -> None:
+        """问题离开流水线：记录端到端耗时"""
+        latency = time.time() - started_at
+        with self._lock:
+            self.latencies.append(latency)
+        metrics_registry.observe(QUESTION_LATENCY, latency, {'outcome': outcome}, buckets=PHASE_DURATION_BUCKETS)
+
+    def worker_done(self, stage: str) -> bool:
+        """工作线程退出，返回是否为该阶段最后一个线程"""
+        with self._lock:
+            self._running_workers[stage] -= 1
+            return self._running_workers[stage] == 0
+
+    def get_queue_depths(self) -> Dict[str, int]:
+        return {stage: stage_queue.depth for stage, stage_queue in self.queues.items()}
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            counts = {stage: dict(counter) for stage, counter in self.counts.items()}
+
+        def quantile(q: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3)
+
+        return {
+            'duration': round(time.time() - self.started_at, 3),
+            'stages': {
+                stage: {
+                    'received': self.queues[stage].received,
+                    'max_queue_depth': self.queues[stage].max_depth,
+                    **counts[stage]
+                }
+                for stage in STREAMING_STAGES
+            },
+            'question_latency': {
+                'count': len(latencies),
+                'p50': quantile(0.5),
+                'p95': quantile(0.95),
+                'max': round(latencies[-1], 3) if latencies else None
+            }
+        }
+
+
+class StreamingPipeline:
+    """流式流水线"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._run_lock = threading.Lock()
+        self._current_run: Optional[StreamingRun] = None
+        self.last_summary: Optional[Dict[str, Any]] = None
+
+    def run(self, app, days_back: int = 1, workers: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        执行一次流式处理，待处理问题全部流经流水线后返回
+
+        预加载线程按当前状态把问题放入对应阶段的队列（未分类 → 分类；已分类待生成答案 → 答案生成；
+        答案齐全待评分 → 评分），各阶段处理成功后按下一阶段的选取条件判断是否继续流转。
+
+        Args:
+            app: Flask应用（工作线程各自进入应用上下文，使用独立的数据库会话）
+            days_back: 答案生成与评分只处理最近几天的问题，与批量模式一致
+            workers: 各阶段工作线程数，未指定时取 STREAMING_STAGE_WORKERS
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return {'success': False, 'message': '流式流水线正在运行，跳过本次执行'}
+
+        try:
+            from app.services.ai_processing_service import ai_processing_service
+            from app.services.api_client import APIClientFactory
+            from app.services.badcase_detection_service import BadcaseDetectionService
+            from app.services.system_config_service import SystemConfigService
+
+            workers = {
+                stage: max(1, int((workers or {}).get(stage) or Config.STREAMING_STAGE_WORKERS.get(stage, 1)))
+                for stage in STREAMING_STAGES
+            }
+
+            with app.app_context():
+                # 与批量模式一致：只有API模式才自动生成答案
+                generation_mode = SystemConfigService().get_config('workflow.answer_generation_mode', 'manual')
+                badcase_service = BadcaseDetectionService()
+                try:
+                    badcase_threshold = badcase_service.get_badcase_threshold()
+                except Exception as e:
+                    self.logger.error(f"获取badcase阈值失败，本次跳过badcase检测: {str(e)}")
+                    badcase_threshold = None
+
+            context = {
+                'service': ai_processing_service,
+                'days_back': days_back,
+                'generate_answers': generation_mode == 'api',
+                'classification_client': APIClientFactory.get_classification_client(),
+                'generation_clients': {
+                    'doubao': APIClientFactory.get_doubao_client(),
+                    'xiaotian': APIClientFactory.get_xiaotian_client()
+                },
+                'score_client': APIClientFactory.get_score_client(),
+                'badcase_service': badcase_service,
+                'badcase_threshold': badcase_threshold
+            }
+
+            # 分类队列的生产者：预加载线程；答案生成/评分队列：预加载线程 + 上游阶段
+            queues = {
+                'classification': StageQueue('classification', Config.STREAMING_QUEUE_SIZE, workers['classification'], 1),
+                'answer_generation': StageQueue('answer_generation', Config.STREAMING_QUEUE_SIZE, workers['answer_generation'], 2),
+                'scoring': StageQueue('scoring', Config.STREAMING_QUEUE_SIZE, workers['scoring'], 2)
+            }
+            run = StreamingRun(queues, workers)
+            self._current_run = run
+            self.logger.info(f"流式流水线启动，各阶段线程数: {workers}，队列容量: {Config.STREAMING_QUEUE_SIZE}")
+
+            threads = [threading.Thread(
+                target=self._seed, args=(app, run, context), name='streaming-seeder', daemon=True
+            )]
+            for stage in STREAMING_STAGES:
+                for index in range(workers[stage]):
+                    threads.append(threading.Thread(
+                        target=self._stage_worker, args=(app, run, context, stage),
+                        name=f'streaming-{stage}-{index}', daemon=True
+                    ))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            summary = run.summary()
+            failed = sum(item.get('failed', 0) for item in summary['stages'].values())
+            processed = sum(item.get('received', 0) for item in summary['stages'].values())
+            result = {
+                'success': True,
+                'message': (
+                    f"流式处理完成，分类: {summary['stages']['classification'].get('success', 0)}, "
+                    f"答案生成: {summary['stages']['answer_generation'].get('success', 0)}, "
+                    f"评分: {summary['stages']['scoring'].get('success', 0)}, 失败: {failed}"
+                ),
+                'processed_count': processed,
+                'error_count': failed,
+                'mode': 'streaming',
+                **summary
+            }
+            self.last_summary = result
+            self.logger.info(f"流式流水线完成: {result['message']}，端到端耗时: {summary['question_latency']}")
+            return result
+
+        except Exception as e:
+            error_msg = f"流式流水线执行异常: {str(e)}"
+            self.logger.error(error_msg)
+            return {'success': False, 'message': error_msg, 'mode': 'streaming'}
+        finally:
+            self._current_run = None
+            self._run_lock.release()
+
+    # ------------------------------------------------------------------
+    # 预加载
+    # ------------------------------------------------------------------
+
+    def _seed(self, app, run: StreamingRun, context: Dict[str, Any]) -> None:
+        """按问题当前状态放入对应阶段的队列（三个集合互不重叠）"""
+        service = context['service']
+        try:
+            with app.app_context():
+                seeds = {
+                    'scoring': self._business_ids(
+                        service._scoring_candidates_query(self._cutoff(context)).order_by(Question.created_at)
+                    ),
+                    'answer_generation': self._business_ids(
+                        service._answer_generation_candidates_query(context['days_back']).filter(
+                            Question.classification.isnot(None),
+                            Question.classification != ''
+                        ).order_by(Question.created_at)
+                    ) if context['generate_answers'] else [],
+                    'classification': self._business_ids(
+                        service._classification_candidates_query().order_by(Question.created_at)
+                    )
+                }
+            self.logger.info(f"流式流水线预加载: { {stage: len(ids) for stage, ids in seeds.items()} }")
+
+            for stage in ('scoring', 'answer_generation', 'classification'):
+                for business_id in seeds[stage]:
+                    run.queues[stage].put((business_id, time.time()))
+        except Exception as e:
+            self.logger.error(f"流式流水线预加载失败: {str(e)}")
+        finally:
+            for stage_queue in run.queues.values():
+                stage_queue.producer_done()
+
+    @staticmethod
+    def _business_ids(query) -> List[str]:
+        return [business_id for (business_id,) in query.with_entities(Question.business_id)]
+
+    @staticmethod
+    def _cutoff(context: Dict[str, Any]) -> datetime:
+        return datetime.utcnow() - timedelta(days=context['days_back'])
+
+    # ------------------------------------------------------------------
+    # 阶段处理
+    # ------------------------------------------------------------------
+
+    def _stage_worker(self, app, run: StreamingRun, context: Dict[str, Any], stage: str) -> None:
+        """阶段工作线程：处理一个问题，满足下一阶段条件时转入下一阶段队列"""
+        next_stage = {'classification': 'answer_generation', 'answer_generation': 'scoring'}.get(stage)
+        handler = getattr(self, f'_process_{stage}')
+        inbox = run.queues[stage]
+        outbox = run.queues.get(next_stage) if next_stage else None
+
+        try:
+            with app.app_context():
+                while True:
+                    item = inbox.get()
+                    if item is _SENTINEL:
+                        break
+                    business_id, started_at = item
+
+                    stage_start = time.time()
+                    try:
+                        forward = handler(business_id, context)
+                        outcome = 'success'
+                    except Exception as e:
+                        db.session.rollback()
+                        self.logger.error(f"流式{stage}处理问题失败 {business_id}: {str(e)}")
+                        forward = False
+                        outcome = 'failed'
+                    finally:
+                        # 每个问题使用新的会话，不在线程内累积对象
+                        db.session.remove()
+
+                    metrics_registry.observe(STAGE_DURATION, time.time() - stage_start, {'stage': stage},
+                                             buckets=API_LATENCY_BUCKETS)
+                    run.count(stage, outcome)
+
+                    if forward and outbox is not None:
+                        outbox.put(item)
+                    elif outcome == 'failed':
+                        run.finish_question(started_at, 'failed')
+                    else:
+                        # 评分完成，或不满足下一阶段条件（如手动答案生成模式、答案不全）而停在本阶段
+                        run.finish_question(started_at, 'scored' if forward else 'stopped')
+        finally:
+            if run.worker_done(stage) and outbox is not None:
+                outbox.producer_done()
+
+    def _load(self, query, business_id: str) -> Optional[Question]:
+        """按阶段的选取条件加载问题，已不满足条件时返回 None"""
+        return query.filter(Question.business_id == business_id).first()
+
+    def _process_classification(self, business_id: str, context: Dict[str, Any]) -> bool:
+        service = context['service']
+        question = self._load(service._classification_candidates_query(), business_id)
+        if question is not None:
+            try:
+                service.classify_question(question, context['classification_client'])
+            except Exception:
+                db.session.rollback()
+                question = self._load(db.session.query(Question), business_id)
+                if question is not None:
+                    question.processing_status = 'classification_failed'
+                    db.session.commit()
+                raise
+            db.session.commit()
+
+        if not context['generate_answers']:
+            return False
+        return self._load(service._answer_generation_candidates_query(context['days_back']), business_id) is not None
+
+    def _process_answer_generation(self, business_id: str, context: Dict[str, Any]) -> bool:
+        service = context['service']
+        question = self._load(service._answer_generation_candidates_query(context['days_back']), business_id)
+        if question is not None:
+            service.generate_question_answers(question, context['generation_clients'])
+            db.session.commit()
+            if question.processing_status == 'answer_generation_failed':
+                # 已生成的答案保留，下次运行只补缺失的AI类型
+                raise RuntimeError('部分AI类型答案生成失败')
+
+        # 三个AI答案齐全（且未评分）即进入评分
+        return self._load(service._scoring_candidates_query(self._cutoff(context)), business_id) is not None
+
+    def _process_scoring(self, business_id: str, context: Dict[str, Any]) -> bool:
+        service = context['service']
+        question = self._load(service._scoring_candidates_query(self._cutoff(context)), business_id)
+        if question is None:
+            return False
+        scores = service.score_question(
+            question, context['score_client'], context['badcase_service'], context['badcase_threshold']
+        )
+        return scores > 0
+
+    # ------------------------------------------------------------------
+    # 状态
+    # ------------------------------------------------------------------
+
+    def get_status(self) -> Dict[str, Any]:
+        run = self._current_run
+        return {
+            'running': run is not None,
+            'queue_depths': run.get_queue_depths() if run is not None else {},
+            'last_run': self.last_summary
+        }
+
+
+def _collect_streaming_gauges():
+    """流式流水线各阶段当前队列深度"""
+    run = streaming_pipeline._current_run
+    if run is None:
+        return
+    for stage, depth in run.get_queue_depths().items():
+        yield ('streaming_pipeline_queue_depth', 'Questions waiting in the streaming pipeline stage queue',
+               {'stage': stage}, depth)
+
+
+# 创建全局流式流水线实例
+streaming_pipeline = StreamingPipeline()
+metrics_registry.describe(STAGE_DURATION, 'histogram', 'Streaming pipeline per-question stage duration')
+metrics_registry.describe(QUESTION_LATENCY, 'histogram', 'Streaming pipeline end-to-end latency per question')
+metrics_registry.describe(STAGE_ITEMS_TOTAL, 'counter', 'Streaming pipeline questions processed by stage and outcome')
+metrics_registry.register_collector(_collect_streaming_gauges)
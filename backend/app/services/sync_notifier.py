@@ -0,0 +1,247 @@
+"""
+源表新数据到达通知服务
+PostgreSQL 下通过语句级插入触发器 + LISTEN/NOTIFY 感知新数据，
+其他数据库退化为按源表主键高水位的轻量探测；突发写入经过防抖合并后再触发工作流
+"""
+import logging
+import select
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from app.config import Config
+from app.utils.database import db, get_dialect_name
+
+
+class SyncNotifier:
+    """源表新数据到达通知器"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._stop_event = threading.Event()
+        self._condition = threading.Condition()
+        self._listener_thread: Optional[threading.Thread] = None
+        self._dispatcher_thread: Optional[threading.Thread] = None
+        self._callback: Optional[Callable[[], Dict[str, Any]]] = None
+
+        # 防抖窗口：首个未处理事件时间、最后一个事件时间
+        self._first_event_at: Optional[float] = None
+        self._last_event_at: Optional[float] = None
+
+        self.stats = {
+            'mode': None,
+            'running': False,
+            'events_received': 0,
+            'triggers_fired': 0,
+            'last_event_at': None,
+            'last_trigger_at': None,
+            'last_trigger_message': None
+        }
+
+    def start(self, app, callback: Callable[[], Dict[str, Any]]) -> bool:
+        """
+        启动通知器
+
+        Args:
+            app: Flask应用
+            callback: 防抖后触发的回调（通常为执行工作流）；已有工作流运行时由回调方登记重跑，
+                当前工作流结束后再调用 notify 重新触发
+        """
+        if any(thread is not None and thread.is_alive() for thread in (self._listener_thread, self._dispatcher_thread)):
+            self.logger.warning("数据到达通知器已在运行，跳过重复启动")
+            return False
+
+        self._callback = callback
+        self._stop_event.clear()
+
+        with app.app_context():
+            use_listen = get_dialect_name() == 'postgresql' and self._install_trigger()
+
+        self.stats['mode'] = 'listen_notify' if use_listen else 'high_water_mark'
+        listener_target = self._listen_loop if use_listen else self._poll_loop
+
+        self._listener_thread = threading.Thread(
+            target=listener_target, args=(app,), name='sync-notifier-listener', daemon=True
+        )
+        self._dispatcher_thread = threading.Thread(
+            target=self._dispatch_loop, name='sync-notifier-dispatcher', daemon=True
+        )
+        self._listener_thread.start()
+        self._dispatcher_thread.start()
+        self.stats['running'] = True
+
+        self.logger.info(
+            f"数据到达通知器已启动，模式: {self.stats['mode']}，"
+            f"防抖 {Config.SYNC_EVENT_DEBOUNCE_SECONDS}s，最长等待 {Config.SYNC_EVENT_MAX_WAIT_SECONDS}s"
+        )
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        """停止通知器，等待监听和分发线程退出（重新当选主节点后可立即再次 start）"""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+
+        current = threading.current_thread()
+        for thread in (self._listener_thread, self._dispatcher_thread):
+            if thread is not None and thread is not current and thread.is_alive():
+                thread.join(timeout)
+                if thread.is_alive():
+                    self.logger.warning(f"数据到达通知器线程 {thread.name} 未在 {timeout}s 内退出")
+
+        self.stats['running'] = False
+        self.logger.info("数据到达通知器已停止")
+
+    def notify(self, reason: str = 'event'):
+        """记录一次新数据事件，由分发线程在防抖窗口结束后统一触发"""
+        now = time.monotonic()
+        with self._condition:
+            if self._first_event_at is None:
+                self._first_event_at = now
+            self._last_event_at = now
+            self.stats['events_received'] += 1
+            self.stats['last_event_at'] = datetime.now().isoformat()
+            self._condition.notify_all()
+        self.logger.debug(f"收到新数据事件: {reason}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取通知器状态"""
+        with self._condition:
+            status = dict(self.stats)
+            status['pending_event'] = self._first_event_at is not None
+        status['debounce_seconds'] = Config.SYNC_EVENT_DEBOUNCE_SECONDS
+        status['max_wait_seconds'] = Config.SYNC_EVENT_MAX_WAIT_SECONDS
+        return status
+
+    def _install_trigger(self) -> bool:
+        """在源表上安装语句级插入触发器，每条INSERT语句（而非每行）发送一次通知"""
+        schema = Config.DATABASE_SCHEMA
+        table = Config.SOURCE_TABLE_NAME
+        function_name = f"{schema}.notify_{table}_insert"
+        trigger_name = f"trg_{table}_notify_insert"
+
+        try:
+            db.session.execute(text(f"""
+                CREATE OR REPLACE FUNCTION {function_name}() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('{Config.SYNC_EVENT_CHANNEL}', TG_TABLE_NAME);
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """))
+            db.session.execute(text(f"DROP TRIGGER IF EXISTS {trigger_name} ON {schema}.{table}"))
+            db.session.execute(text(f"""
+                CREATE TRIGGER {trigger_name}
+                AFTER INSERT ON {schema}.{table}
+                FOR EACH STATEMENT EXECUTE PROCEDURE {function_name}()
+            """))
+            db.session.commit()
+            self.logger.info(f"源表插入通知触发器已安装: {trigger_name} -> {Config.SYNC_EVENT_CHANNEL}")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            # 源表通常归属其他账号，无权限建触发器时退化为高水位探测
+            self.logger.warning(f"安装源表通知触发器失败，改用高水位探测: {str(e)}")
+            return False
+
+    def _listen_loop(self, app):
+        """PostgreSQL LISTEN 循环，连接断开后自动重连"""
+        while not self._stop_event.is_set():
+            raw_connection = None
+            try:
+                with app.app_context():
+                    raw_connection = db.engine.raw_connection()
+                connection = raw_connection.driver_connection
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {Config.SYNC_EVENT_CHANNEL}")
+                self.logger.info(f"开始监听通道: {Config.SYNC_EVENT_CHANNEL}")
+
+                while not self._stop_event.is_set():
+                    # 超时返回以便及时响应停止信号
+                    readable, _, _ = select.select([connection], [], [], 1.0)
+                    if not readable:
+                        continue
+                    connection.poll()
+                    if connection.notifies:
+                        count = len(connection.notifies)
+                        connection.notifies.clear()
+                        self.notify(f'pg_notify x{count}')
+
+            except Exception as e:
+                self.logger.error(f"监听源表通知失败，5秒后重连: {str(e)}")
+                self._stop_event.wait(5)
+            finally:
+                if raw_connection is not None:
+                    try:
+                        raw_connection.invalidate()
+                    except Exception:
+                        pass
+
+    def _poll_loop(self, app):
+        """高水位探测循环：源表最大主键增长即视为有新数据"""
+        sql = text(
+            f"SELECT MAX({Config.SOURCE_ID_COLUMN}) "
+            f"FROM {Config.DATABASE_SCHEMA}.{Config.SOURCE_TABLE_NAME}"
+        )
+        high_water_mark = None
+
+        while not self._stop_event.is_set():
+            try:
+                with app.app_context():
+                    current = db.session.execute(sql).scalar()
+                if high_water_mark is not None and current is not None and current > high_water_mark:
+                    self.notify(f'high_water_mark {high_water_mark} -> {current}')
+                if current is not None:
+                    high_water_mark = current
+            except Exception as e:
+                self.logger.error(f"源表高水位探测失败: {str(e)}")
+
+            self._stop_event.wait(Config.SYNC_EVENT_POLL_SECONDS)
+
+    def _dispatch_loop(self):
+        """
+        防抖分发循环
+
+        最后一个事件后静默 SYNC_EVENT_DEBOUNCE_SECONDS 触发一次；持续写入时
+        自首个事件起最多等待 SYNC_EVENT_MAX_WAIT_SECONDS。回调在本线程串行执行，
+        执行期间到达的事件会合并为下一次触发。
+        """
+        while not self._stop_event.is_set():
+            with self._condition:
+                if self._first_event_at is None:
+                    self._condition.wait(timeout=1.0)
+                    continue
+
+                now = time.monotonic()
+                due_at = min(
+                    self._last_event_at + Config.SYNC_EVENT_DEBOUNCE_SECONDS,
+                    self._first_event_at + Config.SYNC_EVENT_MAX_WAIT_SECONDS
+                )
+                if now < due_at:
+                    self._condition.wait(timeout=due_at - now)
+                    continue
+
+                self._first_event_at = None
+                self._last_event_at = None
+
+            self._fire()
+
+    def _fire(self):
+        """执行回调（已有工作流运行而跳过时，由回调方在该工作流结束后重新 notify，这里不轮询重试）"""
+        self.stats['triggers_fired'] += 1
+        self.stats['last_trigger_at'] = datetime.now().isoformat()
+        try:
+            result = self._callback() if self._callback else {}
+            self.stats['last_trigger_message'] = result.get('message')
+        except Exception as e:
+            self.stats['last_trigger_message'] = str(e)
+            self.logger.error(f"数据到达触发工作流失败: {str(e)}")
+
+
+# 创建全局通知器实例
+sync_notifier = SyncNotifier()
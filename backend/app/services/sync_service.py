@@ -3,15 +3,23 @@
 负责从table1同步数据到questions表和answers表，在SQL查询阶段过滤掉query为空的记录
 """
 import logging
-import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from sqlalchemy import text, func
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text, func, exists
 from sqlalchemy.exc import SQLAlchemyError
+from flask import current_app
 
-from app.utils.database import db
+from app.utils.database import db, get_dialect_name, bulk_upsert
 from app.models.question import Question
 from app.models.answer import Answer
+from app.models.sync_checkpoint import SyncCheckpoint, SyncCatchupSlice
+from app.models.source_business_id import SourceBusinessId
+from app.utils.helpers import generate_business_id, business_id_sql_expr
+from app.services.counter_service import (
+    counter_service, QUESTIONS_TOTAL, ANSWERS_TOTAL, ANSWERS_BY_TYPE, SOURCE_TOTAL, SOURCE_WITH_ANSWER
+)
 from app.config import Config
 
 class SyncService:
@@ -33,9 +41,10 @@ class SyncService:
             if last_question:
                 self.sync_status['last_sync_time'] = last_question.created_at.isoformat()
             
-            # 获取总同步数量
-            questions_count = db.session.query(func.count(Question.id)).scalar()
-            answers_count = db.session.query(func.count(Answer.id)).scalar()
+            # 获取总同步数量（读取流水线计数器，避免全表COUNT）
+            counters = counter_service.get_pipeline_counts()['values']
+            questions_count = counters.get(QUESTIONS_TOTAL, 0)
+            answers_count = counters.get(ANSWERS_TOTAL, 0)
             self.sync_status['total_synced'] = questions_count
             self.sync_status['questions_count'] = questions_count
             self.sync_status['answers_count'] = answers_count
@@ -54,6 +63,12 @@ class SyncService:
             ).order_by(Question.sendmessagetime.desc()).first()
             
             last_sync_time = last_question.sendmessagetime if last_question else None
+            # questions.sendmessagetime 为VARCHAR列，读取后转换为datetime再参与比较
+            if isinstance(last_sync_time, str):
+                try:
+                    last_sync_time = datetime.fromisoformat(last_sync_time)
+                except ValueError:
+                    last_sync_time = None
             self.logger.debug(f"获取最后同步时间: {last_sync_time}")
             return last_sync_time
         except Exception as e:
@@ -69,9 +84,140 @@ class SyncService:
 
 
 
-    def fetch_new_data_from_table1(self, since_time: Optional[datetime] = None) -> List[Dict]:
-        """从table1获取新数据，包括answer字段，限制只同步本周数据，并避免重复同步"""
+    def get_checkpoint(self) -> Optional[SyncCheckpoint]:
+        """获取当前源表的同步检查点"""
+        return db.session.query(SyncCheckpoint).filter_by(
+            source_table=Config.SOURCE_TABLE_NAME
+        ).first()
+
+    def get_checkpoint_info(self) -> Dict:
+        """获取同步检查点信息（供API查看）"""
+        checkpoint = self.get_checkpoint()
+        if not checkpoint:
+            return {
+                'source_table': Config.SOURCE_TABLE_NAME,
+                'has_checkpoint': False,
+                'message': '尚未建立同步检查点，下次同步将从本周开始全量比对'
+            }
+
+        info = checkpoint.to_dict()
+        info['has_checkpoint'] = checkpoint.get_cursor() is not None
+        return info
+
+    def rewind_checkpoint(
+        self,
+        sendmessagetime: Optional[datetime] = None,
+        source_id: Optional[int] = None
+    ) -> Dict:
+        """
+        回退（或重置）同步检查点
+
+        Args:
+            sendmessagetime: 新的游标时间，为None时清空游标，下次同步重新从本周开始比对
+            source_id: 新的游标源表主键，同一时间点内从该主键之后继续同步
+
+        Returns:
+            回退结果
+        """
         try:
+            checkpoint = self.get_checkpoint()
+            if not checkpoint:
+                checkpoint = SyncCheckpoint(source_table=Config.SOURCE_TABLE_NAME, total_synced=0)
+                db.session.add(checkpoint)
+
+            old_cursor = checkpoint.get_cursor()
+            checkpoint.last_sendmessagetime = sendmessagetime
+            checkpoint.last_source_id = (source_id or 0) if sendmessagetime else None
+            checkpoint.updated_at = datetime.utcnow()
+            db.session.commit()
+
+            self.logger.info(f"同步检查点已回退: {old_cursor} -> {checkpoint.get_cursor()}")
+            return {
+                'success': True,
+                'message': '同步检查点已重置' if sendmessagetime is None else '同步检查点已回退',
+                'old_cursor': {
+                    'sendmessagetime': old_cursor[0].isoformat(),
+                    'source_id': old_cursor[1]
+                } if old_cursor else None,
+                'checkpoint': checkpoint.to_dict()
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            error_msg = f"回退同步检查点失败: {str(e)}"
+            self.logger.error(error_msg)
+            return {'success': False, 'message': error_msg}
+
+    def _advance_checkpoint(self, data: List[Dict]) -> None:
+        """根据本次同步的数据推进检查点（与业务数据在同一事务中提交）"""
+        if not data:
+            return
+
+        last_row = max(
+            (item for item in data if item.get('sendmessagetime') is not None),
+            key=lambda item: (item['sendmessagetime'], item.get('source_id') or 0),
+            default=None
+        )
+        if last_row is None:
+            return
+
+        new_cursor = (last_row['sendmessagetime'], last_row.get('source_id') or 0)
+
+        checkpoint = self.get_checkpoint()
+        if not checkpoint:
+            checkpoint = SyncCheckpoint(source_table=Config.SOURCE_TABLE_NAME, total_synced=0)
+            db.session.add(checkpoint)
+
+        # 游标只前进不后退（强制全量同步时可能只补到较早的数据），回退请使用 rewind_checkpoint
+        current_cursor = checkpoint.get_cursor()
+        if current_cursor is None or new_cursor > current_cursor:
+            checkpoint.last_sendmessagetime, checkpoint.last_source_id = new_cursor
+
+        checkpoint.total_synced = (checkpoint.total_synced or 0) + len(data)
+        checkpoint.last_batch_count = len(data)
+        checkpoint.last_sync_at = datetime.utcnow()
+
+    def _build_source_query(
+        self,
+        since_time: Optional[datetime] = None,
+        after_cursor: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None,
+        until_time: Optional[datetime] = None,
+        until_inclusive: bool = True
+    ) -> Tuple[object, Dict]:
+        """
+        构建源表读取SQL
+
+        - 有检查点游标时：只读取 (sendmessagetime, id) 大于游标的记录，走索引范围扫描
+        - 无游标时：限制只同步本周数据，Postgres 下通过 business_id 反连接避免重复同步
+        - until_time：时间上界（追赶同步按时间分片时使用）
+
+        Returns:
+            (SQL语句, 绑定参数)
+        """
+        dialect_name = get_dialect_name()
+        id_column = Config.SOURCE_ID_COLUMN
+        params: Dict = {}
+
+        # 构建查询SQL - 适配不同方言，避免使用 Postgres 专有函数
+        if dialect_name == 'sqlite':
+            time_expr = "datetime(t1.sendmessagetime)"
+            bind_expr = "datetime(:{})"
+        else:
+            time_expr = "t1.sendmessagetime"
+            bind_expr = ":{}"
+
+        if after_cursor is not None:
+            cursor_time, cursor_id = after_cursor
+            cursor_expr = bind_expr.format('cursor_time')
+            range_filter = f"""
+                AND (
+                    {time_expr} > {cursor_expr}
+                    OR ({time_expr} = {cursor_expr} AND t1.{id_column} > :cursor_id)
+                )
+            """
+            params.update({'cursor_time': cursor_time, 'cursor_id': cursor_id or 0})
+        else:
             # 获取本周开始时间
             week_start = self.get_week_start()
 
@@ -84,242 +230,492 @@ class SyncService:
                 since_time = week_start
                 self.logger.info(f"没有最后同步时间，默认只同步本周数据，开始时间: {week_start}")
 
-            # 构建查询SQL - 适配不同方言，避免使用 Postgres 专有函数
-            dialect_name = db.session.bind.dialect.name if db.session.bind else ""
-            if dialect_name == 'sqlite':
-                base_sql = f"""
-                    SELECT
-                        t1.pageid,
-                        t1.devicetypename,
-                        t1.sendmessagetime,
-                        t1.query1,
-                        t1.answer,
-                        t1.serviceid,
-                        t1.qatype,
-                        t1.intent,
-                        t1.iskeyboardinput,
-                        t1.isstopanswer
-                    FROM {Config.DATABASE_SCHEMA}.{Config.SOURCE_TABLE_NAME} t1
-                    WHERE t1.query1 IS NOT NULL
-                    AND t1.query1 != ''
-                    AND TRIM(t1.query1) != ''
-                    AND datetime(t1.sendmessagetime) >= datetime(:week_start)
-                    ORDER BY t1.sendmessagetime ASC
+            range_filter = f"AND {time_expr} >= {bind_expr.format('week_start')}"
+            params['week_start'] = week_start
+
+            if Config.SYNC_SOURCE_INDEX_ENABLED:
+                # 影子表中已物化business_id：按源表主键 + business_id 两次索引查找完成去重
+                range_filter += f"""
+                    AND NOT EXISTS (
+                        SELECT 1 FROM {Config.DATABASE_SCHEMA}.source_business_ids s
+                        JOIN {Config.DATABASE_SCHEMA}.questions q ON q.business_id = s.business_id
+                        WHERE s.source_table = :source_table
+                        AND s.source_id = t1.{id_column}
+                    )
                 """
-                sql = text(base_sql)
-                result = db.session.execute(sql, {'week_start': week_start})
-            else:
+                params['source_table'] = Config.SOURCE_TABLE_NAME
+            elif dialect_name != 'sqlite':
                 # Postgres 版本：保留去重避免重复同步到 questions（基于 business_id）
-                base_sql = f"""
-                    SELECT
-                        t1.pageid,
-                        t1.devicetypename,
-                        t1.sendmessagetime,
-                        t1.query1,
-                        t1.answer,
-                        t1.serviceid,
-                        t1.qatype,
-                        t1.intent,
-                        t1.iskeyboardinput,
-                        t1.isstopanswer
-                    FROM {Config.DATABASE_SCHEMA}.{Config.SOURCE_TABLE_NAME} t1
-                    WHERE t1.query1 IS NOT NULL
-                    AND t1.query1 != ''
-                    AND TRIM(t1.query1) != ''
-                    AND t1.sendmessagetime >= :week_start
+                range_filter += f"""
                     AND NOT EXISTS (
                         SELECT 1 FROM {Config.DATABASE_SCHEMA}.questions q
-                        WHERE q.business_id = MD5(CONCAT(
-                            t1.pageid,
-                            COALESCE(to_char(t1.sendmessagetime, 'YYYY-MM-DD"T"HH24:MI:SS.US'), ''),
-                            t1.query1
-                        ))
+                        WHERE q.business_id = {business_id_sql_expr('t1', 'query1')}
                     )
-                    ORDER BY t1.sendmessagetime ASC
                 """
-                sql = text(base_sql)
-                result = db.session.execute(sql, {'week_start': week_start})
-            
-            # 转换为字典列表并生成business_id
-            data = []
-            for row in result:
-                (
-                    pageid,
-                    devicetypename,
-                    send_time,
-                    query1_text,
-                    answer_text,
-                    serviceid,
-                    qatype,
-                    intent,
-                    iskeyboardinput,
-                    isstopanswer
-                ) = row
-                # classification设为None，因为table1表中没有这个字段
-                classification = None
-
-                # 生成business_id = MD5(pageid + sendmessagetime + query)
-                # 统一使用 Python 端生成，避免不同方言函数差异
-                raw_str = f"{pageid}{send_time.isoformat() if send_time else ''}{query1_text}"
-                business_id = hashlib.md5(raw_str.encode('utf-8')).hexdigest()
-
-                data.append({
-                    'business_id': business_id,
-                    'pageid': pageid,
-                    'devicetypename': devicetypename,
-                    'query': query1_text,
-                    'answer': answer_text,
-                    'sendmessagetime': send_time,
-                    'classification': classification,
-                    'serviceid': serviceid,
-                    'qatype': qatype,
-                    'intent': intent,
-                    'iskeyboardinput': iskeyboardinput,
-                    'isstopanswer': isstopanswer
-                })
-            
-            self.logger.info(f"从table1获取到 {len(data)} 条有效数据（已过滤空query记录）")
+
+        if until_time is not None:
+            range_filter += f" AND {time_expr} {'<=' if until_inclusive else '<'} {bind_expr.format('until_time')}"
+            params['until_time'] = until_time
+
+        limit_clause = ""
+        if limit:
+            limit_clause = "LIMIT :limit"
+            params['limit'] = limit
+
+        sql = text(f"""
+            SELECT
+                t1.{id_column} AS source_id,
+                t1.pageid,
+                t1.devicetypename,
+                t1.sendmessagetime,
+                t1.query1,
+                t1.answer,
+                t1.serviceid,
+                t1.qatype,
+                t1.intent,
+                t1.iskeyboardinput,
+                t1.isstopanswer
+            FROM {Config.DATABASE_SCHEMA}.{Config.SOURCE_TABLE_NAME} t1
+            WHERE t1.query1 IS NOT NULL
+            AND t1.query1 != ''
+            AND TRIM(t1.query1) != ''
+            {range_filter}
+            ORDER BY t1.sendmessagetime ASC, t1.{id_column} ASC
+            {limit_clause}
+        """)
+        return sql, params
+
+    def fetch_new_data_from_table1(
+        self,
+        since_time: Optional[datetime] = None,
+        after_cursor: Optional[Tuple[datetime, int]] = None
+    ) -> List[Dict]:
+        """从table1获取新数据（一次性加载到内存），包括answer字段"""
+        try:
+            sql, params = self._build_source_query(since_time, after_cursor)
+            result = db.session.execute(sql, params)
+
+            data = self._rows_to_dicts(result)
+            if after_cursor is not None:
+                self.logger.info(f"按检查点游标 {after_cursor} 增量获取到 {len(data)} 条有效数据")
+            else:
+                self.logger.info(f"从table1获取到 {len(data)} 条有效数据（已过滤空query记录）")
             return data
-            
+
         except Exception as e:
             self.logger.error(f"从table1获取数据失败: {str(e)}")
             raise
+
+    def iter_new_data_from_table1(
+        self,
+        since_time: Optional[datetime] = None,
+        after_cursor: Optional[Tuple[datetime, int]] = None,
+        yield_per: Optional[int] = None,
+        until_time: Optional[datetime] = None,
+        until_inclusive: bool = True
+    ) -> Iterator[List[Dict]]:
+        """
+        流式读取table1新数据，每次产出不超过 yield_per 条记录的分块
+
+        - PostgreSQL：在独立连接上使用服务端游标（stream_results），
+          不受写入会话逐块提交的影响，内存占用只与分块大小相关
+        - SQLite：不支持服务端游标，退化为按 (sendmessagetime, id) 的键集分页
+        """
+        yield_per = yield_per or Config.SYNC_YIELD_PER
+
+        if get_dialect_name() == 'sqlite':
+            # 无游标时从本周开始（源表主键从1开始，(week_start, 0) 等价于 >= week_start）
+            cursor = after_cursor or (self.get_week_start(), 0)
+            while True:
+                sql, params = self._build_source_query(
+                    after_cursor=cursor,
+                    limit=yield_per,
+                    until_time=until_time,
+                    until_inclusive=until_inclusive
+                )
+                chunk = self._rows_to_dicts(db.session.execute(sql, params))
+                if not chunk:
+                    return
+                yield chunk
+                if len(chunk) < yield_per:
+                    return
+                last_row = chunk[-1]
+                cursor = (last_row['sendmessagetime'], last_row['source_id'] or 0)
+
+        sql, params = self._build_source_query(
+            since_time,
+            after_cursor,
+            until_time=until_time,
+            until_inclusive=until_inclusive
+        )
+        with db.engine.connect() as connection:
+            result = connection.execution_options(
+                stream_results=True,
+                yield_per=yield_per
+            ).execute(sql, params)
+            for partition in result.partitions():
+                yield self._rows_to_dicts(partition)
+
+    def _rows_to_dicts(self, rows) -> List[Dict]:
+        """将源表查询结果转换为字典列表并生成business_id"""
+        data = []
+        for row in rows:
+            (
+                source_id,
+                pageid,
+                devicetypename,
+                send_time,
+                query1_text,
+                answer_text,
+                serviceid,
+                qatype,
+                intent,
+                iskeyboardinput,
+                isstopanswer
+            ) = row
+            # SQLite 原生SQL返回的时间为文本，统一转换为datetime，保证business_id与游标一致
+            if isinstance(send_time, str):
+                send_time = datetime.fromisoformat(send_time)
+
+            # classification设为None，因为table1表中没有这个字段
+            classification = None
+
+            # 生成business_id = MD5(pageid + sendmessagetime + query)
+            # 统一使用 Python 端生成，SQL 端通过 business_id_sql_expr 保持一致
+            business_id = generate_business_id(pageid, send_time, query1_text)
+
+            data.append({
+                'business_id': business_id,
+                'source_id': source_id,
+                'pageid': pageid,
+                'devicetypename': devicetypename,
+                'query': query1_text,
+                'answer': answer_text,
+                'sendmessagetime': send_time,
+                'classification': classification,
+                'serviceid': serviceid,
+                'qatype': qatype,
+                'intent': intent,
+                'iskeyboardinput': iskeyboardinput,
+                'isstopanswer': isstopanswer
+            })
+
+        return data
     
-    def sync_to_questions(self, data: List[Dict]) -> int:
-        """将问题相关数据同步到questions表（不包含分类，分类将由AI处理服务后续填充）"""
-        synced_count = 0
+    def refresh_source_index(self) -> Dict:
+        """
+        增量刷新源表业务主键影子表（source_business_ids）
 
+        只补充影子表水位 (sendmessagetime, id) 之后的源表记录，并清理本周之前的记录：
+        - PostgreSQL：单条 INSERT ... SELECT，在数据库端按 business_id_sql_expr 计算
+        - SQLite：无MD5函数，按键集分页读取后在 Python 端计算
+        """
         try:
-            for item in data:
-                # 检查是否已存在（基于business_id）
-                existing = db.session.query(Question).filter_by(
-                    business_id=item['business_id']
-                ).first()
-
-                if existing:
-                    # 更新现有记录（不更新classification字段，保留现有分类）
-                    existing.pageid = item['pageid']
-                    existing.devicetypename = item['devicetypename']
-                    existing.query = item['query']
-                    existing.sendmessagetime = item['sendmessagetime']
-                    # 注意：不更新classification字段，保留AI处理的结果
-                    existing.serviceid = item['serviceid']
-                    existing.qatype = item['qatype']
-                    existing.intent = item['intent']
-                    existing.iskeyboardinput = item['iskeyboardinput']
-                    existing.isstopanswer = item['isstopanswer']
-                    existing.updated_at = datetime.utcnow()
-                else:
-                    # 创建新记录 - classification字段初始为None，等待AI处理
-                    question = Question(
-                        business_id=item['business_id'],
-                        pageid=item['pageid'],
-                        devicetypename=item['devicetypename'],
-                        query=item['query'],
-                        sendmessagetime=item['sendmessagetime'],
-                        classification=None,  # 初始为None，等待AI分类处理
-                        serviceid=item['serviceid'],
-                        qatype=item['qatype'],
-                        intent=item['intent'],
-                        iskeyboardinput=item['iskeyboardinput'],
-                        isstopanswer=item['isstopanswer']
+            week_start = self.get_week_start()
+
+            # 新数据检测只关心本周数据，清理更早的影子记录
+            pruned = db.session.query(SourceBusinessId).filter(
+                SourceBusinessId.source_table == Config.SOURCE_TABLE_NAME,
+                SourceBusinessId.sendmessagetime < week_start
+            ).delete(synchronize_session=False)
+
+            watermark = db.session.query(
+                SourceBusinessId.sendmessagetime,
+                SourceBusinessId.source_id
+            ).filter(
+                SourceBusinessId.source_table == Config.SOURCE_TABLE_NAME
+            ).order_by(
+                SourceBusinessId.sendmessagetime.desc(),
+                SourceBusinessId.source_id.desc()
+            ).first()
+            cursor = (watermark[0], watermark[1]) if watermark else (week_start, 0)
+
+            if get_dialect_name() == 'postgresql':
+                id_column = Config.SOURCE_ID_COLUMN
+                sql = text(f"""
+                    INSERT INTO {Config.DATABASE_SCHEMA}.source_business_ids
+                        (source_table, source_id, sendmessagetime, business_id, created_at)
+                    SELECT
+                        :source_table,
+                        t1.{id_column},
+                        t1.sendmessagetime,
+                        {business_id_sql_expr('t1', 'query1')},
+                        NOW()
+                    FROM {Config.DATABASE_SCHEMA}.{Config.SOURCE_TABLE_NAME} t1
+                    WHERE t1.query1 IS NOT NULL
+                    AND t1.query1 != ''
+                    AND TRIM(t1.query1) != ''
+                    AND (
+                        t1.sendmessagetime > :cursor_time
+                        OR (t1.sendmessagetime = :cursor_time AND t1.{id_column} > :cursor_id)
+                    )
+                    ON CONFLICT (source_table, source_id) DO NOTHING
+                """)
+                inserted = db.session.execute(sql, {
+                    'source_table': Config.SOURCE_TABLE_NAME,
+                    'cursor_time': cursor[0],
+                    'cursor_id': cursor[1] or 0
+                }).rowcount
+            else:
+                inserted = 0
+                for chunk in self.iter_new_data_from_table1(after_cursor=cursor):
+                    counts = bulk_upsert(
+                        SourceBusinessId,
+                        [
+                            {
+                                'source_table': Config.SOURCE_TABLE_NAME,
+                                'source_id': item['source_id'],
+                                'sendmessagetime': item['sendmessagetime'],
+                                'business_id': item['business_id']
+                            }
+                            for item in chunk
+                        ],
+                        conflict_columns=['source_table', 'source_id'],
+                        update_columns=['business_id'],
+                        chunk_size=Config.SYNC_UPSERT_CHUNK_SIZE
                     )
-                    db.session.add(question)
+                    inserted += counts['inserted']
 
-                synced_count += 1
+            db.session.commit()
+
+            if inserted or pruned:
+                self.logger.info(f"源表业务主键影子表刷新完成: 新增 {inserted} 条，清理 {pruned} 条")
+            return {'success': True, 'inserted': inserted, 'pruned': pruned}
+
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"刷新源表业务主键影子表失败: {str(e)}")
+            raise
+
+    def count_pending_source_rows(self) -> int:
+        """
+        统计本周尚未同步到questions表的源表记录数（供调度器判断是否有新数据）
+
+        - 启用影子表：刷新影子表后按已物化的business_id做索引反连接
+        - 已有检查点：统计游标之后的记录数（索引范围扫描）
+        - 否则：回退为逐行计算MD5的反连接（仅PostgreSQL）
+        """
+        week_start = self.get_week_start()
+
+        if Config.SYNC_SOURCE_INDEX_ENABLED:
+            self.refresh_source_index()
+            return db.session.query(func.count(SourceBusinessId.id)).filter(
+                SourceBusinessId.source_table == Config.SOURCE_TABLE_NAME,
+                SourceBusinessId.sendmessagetime >= week_start,
+                ~exists().where(Question.business_id == SourceBusinessId.business_id)
+            ).scalar() or 0
+
+        checkpoint = self.get_checkpoint()
+        cursor = checkpoint.get_cursor() if checkpoint else None
+        sql, params = self._build_source_query(after_cursor=cursor) if cursor else self._build_source_query()
+        count_sql = text(f"SELECT COUNT(*) FROM ({sql.text}) pending_rows")
+        return db.session.execute(count_sql, params).scalar() or 0
+
+    def sync_to_questions(self, data: List[Dict]) -> Dict[str, int]:
+        """
+        将问题相关数据批量写入questions表（不包含分类，分类将由AI处理服务后续填充）
+
+        按 business_id 执行 INSERT ... ON CONFLICT DO UPDATE，每个分块一条语句；
+        冲突时不更新classification字段，保留AI处理的结果。
+
+        Returns:
+            {'inserted': 新增数, 'updated': 更新数, 'total': 写入总数}
+        """
+        try:
+            now = datetime.utcnow()
+            rows = [
+                {
+                    'business_id': item['business_id'],
+                    'pageid': item['pageid'],
+                    'devicetypename': item['devicetypename'],
+                    'query': item['query'],
+                    'sendmessagetime': item['sendmessagetime'],
+                    'serviceid': item['serviceid'],
+                    'qatype': item['qatype'],
+                    'intent': item['intent'],
+                    'iskeyboardinput': item['iskeyboardinput'],
+                    'isstopanswer': item['isstopanswer'],
+                    'updated_at': now
+                }
+                for item in data
+            ]
 
-            self.logger.info(f"准备同步 {synced_count} 条数据到questions表（classification字段将由AI处理服务填充）")
-            return synced_count
+            # 注意：update_columns 不包含classification，保留AI处理的结果
+            counts = bulk_upsert(
+                Question,
+                rows,
+                conflict_columns=['business_id'],
+                update_columns=[
+                    'pageid', 'devicetypename', 'query', 'sendmessagetime', 'serviceid',
+                    'qatype', 'intent', 'iskeyboardinput', 'isstopanswer', 'updated_at'
+                ],
+                chunk_size=Config.SYNC_UPSERT_CHUNK_SIZE
+            )
+            counts['total'] = counts['inserted'] + counts['updated']
+            counter_service.increment(QUESTIONS_TOTAL, counts['inserted'])
+
+            self.logger.info(
+                f"批量写入questions表: 新增 {counts['inserted']} 条，更新 {counts['updated']} 条"
+                f"（classification字段将由AI处理服务填充）"
+            )
+            return counts
 
         except Exception as e:
             self.logger.error(f"同步数据到questions表失败: {str(e)}")
             raise
-    
-    def sync_to_answers(self, data: List[Dict]) -> int:
-        """将答案数据同步到answers表"""
-        synced_count = 0
-        
+
+    def sync_to_answers(self, data: List[Dict]) -> Dict[str, int]:
+        """
+        将yoyo答案数据批量写入answers表
+
+        按 (question_business_id, assistant_type) 执行 INSERT ... ON CONFLICT DO UPDATE。
+
+        Returns:
+            {'inserted': 新增数, 'updated': 更新数, 'total': 写入总数}
+        """
         try:
+            now = datetime.utcnow()
+            rows = []
             for item in data:
                 # 检查answer字段是否有内容
                 answer_text = item.get('answer')
                 if not answer_text or answer_text.strip() == '':
                     continue
-                
-                # 检查是否已存在（基于business_id和assistant_type）
-                existing = db.session.query(Answer).filter_by(
-                    question_business_id=item['business_id'],
-                    assistant_type='yoyo'
-                ).first()
-                
-                if existing:
-                    # 更新现有记录
-                    existing.answer_text = answer_text
-                    existing.answer_time = item['sendmessagetime']
-                    existing.updated_at = datetime.utcnow()
-                else:
-                    # 创建新记录
-                    answer = Answer(
-                        question_business_id=item['business_id'],
-                        answer_text=answer_text,
-                        assistant_type='yoyo',  # 标识为yoyo答案
-                        answer_time=item['sendmessagetime']
-                    )
-                    db.session.add(answer)
-                
-                synced_count += 1
-            
-            self.logger.info(f"准备同步 {synced_count} 条答案到answers表")
-            return synced_count
-            
+
+                rows.append({
+                    'question_business_id': item['business_id'],
+                    'answer_text': answer_text,
+                    'assistant_type': 'yoyo',  # 标识为yoyo答案
+                    'answer_time': item['sendmessagetime'],
+                    'updated_at': now
+                })
+
+            counts = bulk_upsert(
+                Answer,
+                rows,
+                conflict_columns=['question_business_id', 'assistant_type'],
+                update_columns=['answer_text', 'answer_time', 'updated_at'],
+                chunk_size=Config.SYNC_UPSERT_CHUNK_SIZE
+            )
+            counts['total'] = counts['inserted'] + counts['updated']
+            counter_service.increment_many({
+                ANSWERS_TOTAL: counts['inserted'],
+                ANSWERS_BY_TYPE.format('yoyo'): counts['inserted']
+            })
+
+            self.logger.info(f"批量写入answers表: 新增 {counts['inserted']} 条，更新 {counts['updated']} 条")
+            return counts
+
         except Exception as e:
             self.logger.error(f"同步数据到answers表失败: {str(e)}")
             raise
-    
-    def perform_sync(self, force_full_sync: bool = False) -> Dict:
-        """执行数据同步（同时处理questions和answers表）"""
+
+    def perform_sync(self, force_full_sync: bool = False, stream: Optional[bool] = None) -> Dict:
+        """
+        执行数据同步（同时处理questions和answers表）
+
+        Args:
+            force_full_sync: 忽略检查点，重新扫描本周数据
+            stream: 是否使用流式模式（逐块读取、写入并提交），默认读取 SYNC_STREAMING_ENABLED
+        """
+        if stream is None:
+            stream = Config.SYNC_STREAMING_ENABLED
+
+        question_counts = {'inserted': 0, 'updated': 0, 'total': 0}
+        answer_counts = {'inserted': 0, 'updated': 0, 'total': 0}
+        committed_chunks = 0
+
         try:
             self.sync_status['status'] = 'running'
             self.sync_status['error_message'] = None
             
-            # 获取最后同步时间
-            last_sync_time = None if force_full_sync else self.get_last_sync_time()
-            
-            self.logger.info(f"开始数据同步，最后同步时间: {last_sync_time}")
-            
-            # 获取新数据
-            new_data = self.fetch_new_data_from_table1(last_sync_time)
+            # 优先使用持久化检查点游标做增量同步；强制全量同步时忽略游标
+            checkpoint = None if force_full_sync else self.get_checkpoint()
+            cursor = checkpoint.get_cursor() if checkpoint else None
+            sync_mode = 'incremental' if cursor is not None else 'week_scan'
+
+            last_sync_time = None
+            if cursor is not None:
+                self.logger.info(f"开始增量数据同步，检查点游标: {cursor}，流式模式: {stream}")
+            else:
+                # 获取最后同步时间
+                last_sync_time = None if force_full_sync else self.get_last_sync_time()
+                self.logger.info(f"开始数据同步，最后同步时间: {last_sync_time}，流式模式: {stream}")
+
+                # 本周全量比对依赖影子表去重，先补齐影子表
+                if Config.SYNC_SOURCE_INDEX_ENABLED:
+                    self.refresh_source_index()
+
+            if stream:
+                # 流式模式：每个分块独立完成 哈希 -> UPSERT -> 推进检查点 -> 提交，峰值内存与分块大小相关
+                for chunk in self.iter_new_data_from_table1(last_sync_time, cursor):
+                    chunk_question_counts = self.sync_to_questions(chunk)
+                    chunk_answer_counts = self.sync_to_answers(chunk)
+                    self._advance_checkpoint(chunk)
+                    db.session.commit()
+
+                    for key in question_counts:
+                        question_counts[key] += chunk_question_counts[key]
+                        answer_counts[key] += chunk_answer_counts[key]
+                    committed_chunks += 1
+                    self.logger.info(
+                        f"流式同步第 {committed_chunks} 块完成: {len(chunk)} 条，"
+                        f"累计问题 {question_counts['total']} 条"
+                    )
+            else:
+                # 获取新数据
+                new_data = self.fetch_new_data_from_table1(last_sync_time, cursor)
+
+                if new_data:
+                    # 同步数据到questions表
+                    question_counts = self.sync_to_questions(new_data)
+
+                    # 同步数据到answers表
+                    answer_counts = self.sync_to_answers(new_data)
+
+                    # 推进检查点，与业务数据同一事务提交，保证游标与数据一致
+                    self._advance_checkpoint(new_data)
+
+                    # 提交事务
+                    db.session.commit()
             
-            if not new_data:
+            questions_count = question_counts['total']
+            answers_count = answer_counts['total']
+
+            if questions_count == 0:
                 self.logger.info("没有新数据需要同步")
                 self.sync_status['status'] = 'idle'
                 return {
                     'success': True,
                     'message': '没有新数据需要同步',
                     'synced_questions': 0,
-                    'synced_answers': 0
+                    'synced_answers': 0,
+                    'sync_mode': sync_mode,
+                    'streaming': stream
                 }
-            
-            # 同步数据到questions表
-            questions_count = self.sync_to_questions(new_data)
-            
-            # 同步数据到answers表
-            answers_count = self.sync_to_answers(new_data)
-            
-            # 提交事务
-            db.session.commit()
-            
+
             # 更新状态
             self.sync_status['status'] = 'idle'
             self.sync_status['total_synced'] += questions_count
             
             result = {
                 'success': True,
-                'message': f'成功同步 {questions_count} 条问题和 {answers_count} 条答案',
+                'message': (
+                    f'成功同步 {questions_count} 条问题（新增{question_counts["inserted"]}，更新{question_counts["updated"]}）'
+                    f'和 {answers_count} 条答案（新增{answer_counts["inserted"]}，更新{answer_counts["updated"]}）'
+                ),
                 'synced_questions': questions_count,
                 'synced_answers': answers_count,
-                'total_synced': self.sync_status['total_synced']
+                'inserted_questions': question_counts['inserted'],
+                'updated_questions': question_counts['updated'],
+                'inserted_answers': answer_counts['inserted'],
+                'updated_answers': answer_counts['updated'],
+                'total_synced': self.sync_status['total_synced'],
+                'sync_mode': sync_mode,
+                'streaming': stream
             }
+            if stream:
+                result['committed_chunks'] = committed_chunks
             
             self.logger.info(f"数据同步完成: {result}")
             return result
@@ -331,30 +727,323 @@ class SyncService:
             
             error_msg = f"数据同步失败: {str(e)}"
             self.logger.error(error_msg)
-            
+
+            # 流式模式下已提交的分块不会回滚，检查点已随之推进，下次同步从断点继续
             return {
                 'success': False,
                 'message': error_msg,
-                'synced_questions': 0,
-                'synced_answers': 0
+                'synced_questions': question_counts['total'] if stream else 0,
+                'synced_answers': answer_counts['total'] if stream else 0,
+                'committed_chunks': committed_chunks
             }
     
+    def _get_source_max_time(self, since_time: datetime) -> Optional[datetime]:
+        """获取源表中不早于 since_time 的最大发送时间（追赶同步的时间上界）"""
+        if get_dialect_name() == 'sqlite':
+            time_expr, bind_expr = "datetime(t1.sendmessagetime)", "datetime(:since_time)"
+        else:
+            time_expr, bind_expr = "t1.sendmessagetime", ":since_time"
+
+        sql = text(f"""
+            SELECT MAX(t1.sendmessagetime)
+            FROM {Config.DATABASE_SCHEMA}.{Config.SOURCE_TABLE_NAME} t1
+            WHERE t1.query1 IS NOT NULL
+            AND TRIM(t1.query1) != ''
+            AND {time_expr} >= {bind_expr}
+        """)
+        max_time = db.session.execute(sql, {'since_time': since_time}).scalar()
+        if isinstance(max_time, str):
+            max_time = datetime.fromisoformat(max_time)
+        return max_time
+
+    def _create_catchup_slices(self, slices: int) -> List[SyncCatchupSlice]:
+        """
+        将待同步的 sendmessagetime 区间切分为若干时间分片并持久化
+
+        区间下界为检查点游标（无检查点时为本周开始），上界为源表当前最大发送时间。
+        分片 i 覆盖 [b_i, b_{i+1})，最后一片包含上界；第一片从检查点游标之后开始。
+        """
+        checkpoint = self.get_checkpoint()
+        cursor = checkpoint.get_cursor() if checkpoint else None
+        lower_time, lower_id = cursor if cursor is not None else (self.get_week_start(), -1)
+
+        upper_time = self._get_source_max_time(lower_time)
+        if upper_time is None or upper_time < lower_time:
+            return []
+
+        # 区间为单个时间点时不再切分
+        if upper_time == lower_time:
+            slices = 1
+
+        run_id = f"catchup_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        step = (upper_time - lower_time) / slices
+        boundaries = [lower_time + step * i for i in range(slices)] + [upper_time]
+
+        catchup_slices = []
+        for index in range(slices):
+            catchup_slice = SyncCatchupSlice(
+                run_id=run_id,
+                source_table=Config.SOURCE_TABLE_NAME,
+                slice_index=index,
+                range_start=boundaries[index],
+                range_end=boundaries[index + 1],
+                start_source_id=lower_id if index == 0 else -1,
+                end_inclusive=index == slices - 1,
+                status='pending',
+                attempts=0,
+                synced_count=0
+            )
+            db.session.add(catchup_slice)
+            catchup_slices.append(catchup_slice)
+        db.session.commit()
+
+        self.logger.info(f"追赶同步 {run_id} 已切分为 {slices} 个时间分片: {lower_time} ~ {upper_time}")
+        return catchup_slices
+
+    def _sync_catchup_slice(self, app, slice_id: int) -> Dict:
+        """
+        同步单个时间分片（在独立线程中运行，使用独立应用上下文及数据库会话）
+
+        每个分块写入后即提交并记录分片进度游标，失败重试时从断点续传。
+        """
+        with app.app_context():
+            slice_index = None
+            try:
+                catchup_slice = db.session.get(SyncCatchupSlice, slice_id)
+                slice_index = catchup_slice.slice_index
+                catchup_slice.status = 'running'
+                catchup_slice.attempts = (catchup_slice.attempts or 0) + 1
+                catchup_slice.error_message = None
+                catchup_slice.started_at = datetime.utcnow()
+                catchup_slice.finished_at = None
+                db.session.commit()
+
+                synced = 0
+                for chunk in self.iter_new_data_from_table1(
+                    after_cursor=catchup_slice.get_cursor(),
+                    until_time=catchup_slice.range_end,
+                    until_inclusive=bool(catchup_slice.end_inclusive)
+                ):
+                    self.sync_to_questions(chunk)
+                    self.sync_to_answers(chunk)
+
+                    last_row = chunk[-1]
+                    catchup_slice.last_sendmessagetime = last_row['sendmessagetime']
+                    catchup_slice.last_source_id = last_row['source_id'] or 0
+                    catchup_slice.synced_count = (catchup_slice.synced_count or 0) + len(chunk)
+                    db.session.commit()
+                    synced += len(chunk)
+
+                catchup_slice.status = 'completed'
+                catchup_slice.finished_at = datetime.utcnow()
+                db.session.commit()
+
+                self.logger.info(f"追赶同步分片 {slice_index} 完成，本次同步 {synced} 条")
+                return {'slice_index': slice_index, 'success': True, 'synced': synced}
+
+            except Exception as e:
+                db.session.rollback()
+                self.logger.error(f"追赶同步分片 {slice_index if slice_index is not None else slice_id} 失败: {str(e)}")
+                try:
+                    catchup_slice = db.session.get(SyncCatchupSlice, slice_id)
+                    if catchup_slice:
+                        catchup_slice.status = 'failed'
+                        catchup_slice.error_message = str(e)
+                        catchup_slice.finished_at = datetime.utcnow()
+                        db.session.commit()
+                except Exception as mark_error:
+                    db.session.rollback()
+                    self.logger.error(f"记录分片失败状态失败: {str(mark_error)}")
+                return {'slice_index': slice_index, 'success': False, 'error': str(e)}
+
+    def _run_catchup_slices(self, slice_ids: List[int], max_workers: Optional[int] = None) -> List[Dict]:
+        """并行执行指定的时间分片"""
+        app = current_app._get_current_object()
+        max_workers = int(max_workers or Config.SYNC_CATCHUP_MAX_WORKERS)
+
+        # SQLite 只允许单写者，并行写入只会互相等待锁，退化为串行
+        if get_dialect_name() == 'sqlite':
+            max_workers = 1
+        max_workers = max(1, min(max_workers, len(slice_ids)))
+
+        # 释放当前会话持有的连接，避免与工作线程争用
+        db.session.close()
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sync-catchup') as executor:
+            futures = [executor.submit(self._sync_catchup_slice, app, slice_id) for slice_id in slice_ids]
+            for future in as_completed(futures):
+                results.append(future.result())
+        return sorted(results, key=lambda item: item['slice_index'] if item['slice_index'] is not None else -1)
+
+    def _finalize_catchup_run(self, run_id: str) -> Dict:
+        """汇总分片执行结果；全部分片完成后把主检查点推进到最大分片游标"""
+        catchup_slices = db.session.query(SyncCatchupSlice).filter_by(
+            run_id=run_id
+        ).order_by(SyncCatchupSlice.slice_index).all()
+
+        total_synced = sum(item.synced_count or 0 for item in catchup_slices)
+        failed_slices = [item.slice_index for item in catchup_slices if item.status != 'completed']
+
+        if not failed_slices:
+            cursors = [
+                (item.last_sendmessagetime, item.last_source_id or 0)
+                for item in catchup_slices if item.last_sendmessagetime is not None
+            ]
+            if cursors:
+                new_cursor = max(cursors)
+                checkpoint = self.get_checkpoint()
+                if not checkpoint:
+                    checkpoint = SyncCheckpoint(source_table=Config.SOURCE_TABLE_NAME, total_synced=0)
+                    db.session.add(checkpoint)
+
+                current_cursor = checkpoint.get_cursor()
+                if current_cursor is None or new_cursor > current_cursor:
+                    checkpoint.last_sendmessagetime, checkpoint.last_source_id = new_cursor
+                checkpoint.total_synced = (checkpoint.total_synced or 0) + total_synced
+                checkpoint.last_batch_count = total_synced
+                checkpoint.last_sync_at = datetime.utcnow()
+                db.session.commit()
+
+            self.sync_status['total_synced'] += total_synced
+            message = f'追赶同步完成，{len(catchup_slices)} 个分片共同步 {total_synced} 条记录'
+        else:
+            message = (
+                f'追赶同步部分失败，失败分片: {failed_slices}，'
+                f'已同步 {total_synced} 条记录，可调用重试接口仅重跑失败分片'
+            )
+
+        return {
+            'success': not failed_slices,
+            'message': message,
+            'run_id': run_id,
+            'sync_mode': 'catchup',
+            'synced_questions': total_synced,
+            'failed_slices': failed_slices,
+            'slices': [item.to_dict() for item in catchup_slices]
+        }
+
+    def perform_catchup_sync(self, slices: Optional[int] = None, max_workers: Optional[int] = None) -> Dict:
+        """
+        执行追赶同步：将待同步的 sendmessagetime 区间切分为 N 个时间分片并行同步
+
+        每个分片使用独立的数据库会话并单独记录进度，失败时可通过
+        retry_catchup_sync 仅重跑失败的分片；全部完成后推进主检查点。
+
+        Args:
+            slices: 时间分片数，默认读取 SYNC_CATCHUP_SLICES
+            max_workers: 并行线程数，默认读取 SYNC_CATCHUP_MAX_WORKERS
+        """
+        slices = max(1, int(slices or Config.SYNC_CATCHUP_SLICES))
+
+        try:
+            self.sync_status['status'] = 'running'
+            self.sync_status['error_message'] = None
+
+            catchup_slices = self._create_catchup_slices(slices)
+            if not catchup_slices:
+                self.sync_status['status'] = 'idle'
+                return {
+                    'success': True,
+                    'message': '没有新数据需要同步',
+                    'synced_questions': 0,
+                    'sync_mode': 'catchup'
+                }
+
+            run_id = catchup_slices[0].run_id
+            self._run_catchup_slices([item.id for item in catchup_slices], max_workers)
+            result = self._finalize_catchup_run(run_id)
+
+            self.sync_status['status'] = 'idle' if result['success'] else 'error'
+            if not result['success']:
+                self.sync_status['error_message'] = result['message']
+            self.logger.info(result['message'])
+            return result
+
+        except Exception as e:
+            db.session.rollback()
+            self.sync_status['status'] = 'error'
+            self.sync_status['error_message'] = str(e)
+
+            error_msg = f"追赶同步失败: {str(e)}"
+            self.logger.error(error_msg)
+            return {'success': False, 'message': error_msg, 'sync_mode': 'catchup'}
+
+    def retry_catchup_sync(self, run_id: str, max_workers: Optional[int] = None) -> Dict:
+        """仅重跑指定追赶同步中未完成（失败或未执行）的分片，已完成分片不再处理"""
+        try:
+            pending_slices = db.session.query(SyncCatchupSlice).filter(
+                SyncCatchupSlice.run_id == run_id,
+                SyncCatchupSlice.status.in_(['pending', 'failed'])
+            ).all()
+
+            if not pending_slices:
+                exists_run = db.session.query(SyncCatchupSlice.id).filter_by(run_id=run_id).first()
+                return {
+                    'success': exists_run is not None,
+                    'message': f'追赶同步 {run_id} 没有需要重试的分片' if exists_run else f'追赶同步 {run_id} 不存在',
+                    'run_id': run_id
+                }
+
+            self.sync_status['status'] = 'running'
+            self.logger.info(f"重试追赶同步 {run_id} 的分片: {[item.slice_index for item in pending_slices]}")
+            self._run_catchup_slices([item.id for item in pending_slices], max_workers)
+            result = self._finalize_catchup_run(run_id)
+            self.sync_status['status'] = 'idle' if result['success'] else 'error'
+            return result
+
+        except Exception as e:
+            db.session.rollback()
+            self.sync_status['status'] = 'error'
+            error_msg = f"重试追赶同步失败: {str(e)}"
+            self.logger.error(error_msg)
+            return {'success': False, 'message': error_msg, 'run_id': run_id}
+
+    def get_catchup_status(self, run_id: Optional[str] = None) -> Dict:
+        """获取追赶同步分片进度，未指定 run_id 时返回最近一次"""
+        if run_id is None:
+            latest = db.session.query(SyncCatchupSlice).filter_by(
+                source_table=Config.SOURCE_TABLE_NAME
+            ).order_by(SyncCatchupSlice.created_at.desc(), SyncCatchupSlice.id.desc()).first()
+            if not latest:
+                return {'has_run': False, 'message': '尚未执行过追赶同步'}
+            run_id = latest.run_id
+
+        catchup_slices = db.session.query(SyncCatchupSlice).filter_by(
+            run_id=run_id
+        ).order_by(SyncCatchupSlice.slice_index).all()
+
+        status_counts: Dict[str, int] = {}
+        for item in catchup_slices:
+            status_counts[item.status] = status_counts.get(item.status, 0) + 1
+
+        return {
+            'has_run': bool(catchup_slices),
+            'run_id': run_id,
+            'total_slices': len(catchup_slices),
+            'status_counts': status_counts,
+            'synced_questions': sum(item.synced_count or 0 for item in catchup_slices),
+            'slices': [item.to_dict() for item in catchup_slices]
+        }
+
+    @staticmethod
+    def _format_time(value) -> Optional[str]:
+        """格式化时间；VARCHAR列或SQLite原生SQL返回的文本时间原样返回"""
+        if value is None:
+            return None
+        return value if isinstance(value, str) else value.isoformat()
+
     def get_sync_statistics(self) -> Dict:
         """获取同步统计信息"""
         try:
-            # 获取questions表统计
-            questions_count = db.session.query(func.count(Question.id)).scalar()
-            
-            # 获取answers表统计
-            answers_count = db.session.query(func.count(Answer.id)).scalar()
-            yoyo_answers_count = db.session.query(func.count(Answer.id)).filter_by(assistant_type='yoyo').scalar()
-            
-            # 获取源表统计
-            table1_total_query = text(f"SELECT COUNT(*) FROM {Config.DATABASE_SCHEMA}.{Config.SOURCE_TABLE_NAME}")
-            table1_total_count = db.session.execute(table1_total_query).scalar()
-
-            table1_with_answer_query = text(f"SELECT COUNT(*) FROM {Config.DATABASE_SCHEMA}.{Config.SOURCE_TABLE_NAME} WHERE answer IS NOT NULL AND answer != '' AND TRIM(answer) != ''")
-            table1_with_answer_count = db.session.execute(table1_with_answer_query).scalar()
+            # questions / answers / 源表计数读取流水线计数器，由后台任务定期与精确计数对账
+            pipeline_counts = counter_service.get_pipeline_counts()
+            counters = pipeline_counts['values']
+            questions_count = counters.get(QUESTIONS_TOTAL, 0)
+            answers_count = counters.get(ANSWERS_TOTAL, 0)
+            yoyo_answers_count = counters.get(ANSWERS_BY_TYPE.format('yoyo'), 0)
+            table1_total_count = counters.get(SOURCE_TOTAL, 0)
+            table1_with_answer_count = counters.get(SOURCE_WITH_ANSWER, 0)
             
             # 获取最新记录时间
             latest_question = db.session.query(Question).order_by(
@@ -372,9 +1061,13 @@ class SyncService:
                 'table1_with_answer_count': table1_with_answer_count,
                 'questions_sync_rate': f"{(questions_count/table1_total_count*100):.1f}%" if table1_total_count > 0 else "0%",
                 'answers_sync_rate': f"{(yoyo_answers_count/table1_with_answer_count*100):.1f}%" if table1_with_answer_count > 0 else "0%",
-                'latest_question_time': latest_question.sendmessagetime.isoformat() if latest_question else None,
-                'latest_table1_time': latest_table1_time.isoformat() if latest_table1_time else None,
-                'sync_status': self.sync_status['status']
+                'latest_question_time': self._format_time(latest_question.sendmessagetime) if latest_question else None,
+                'latest_table1_time': self._format_time(latest_table1_time),
+                'sync_status': self.sync_status['status'],
+                'counters_reconciled_at': (
+                    pipeline_counts['reconciled_at'].isoformat() if pipeline_counts['reconciled_at'] else None
+                ),
+                'source_counts_estimated': pipeline_counts['source_estimated']
             }
             
         except Exception as e:
@@ -80,6 +80,11 @@ class SystemConfigService:
             
             db.session.commit()
             self.logger.info(f"更新配置成功: {key} = {value}")
+
+            # 限流配置立即生效，无需等待限流器的定时刷新
+            if key.startswith('api.rate_limit.'):
+                from app.services.rate_limiter import rate_limiter_registry
+                rate_limiter_registry.refresh_all()
             return True
             
         except Exception as e:
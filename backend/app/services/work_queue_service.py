@@ -0,0 +1,465 @@
+"""
+工作队列服务
+把各阶段（分类/答案生成/评分）的待处理问题放入数据库工作队列，多个工作进程以租约方式领取：
+PostgreSQL 下用 SELECT ... FOR UPDATE SKIP LOCKED 选取，其他数据库（SQLite）以带条件的 UPDATE
+写入租约令牌做比较并交换，同一条目同一时刻只会被一个进程持有。
+处理后仍满足阶段条件的条目按退避时间重试，超过最大尝试次数转入 dead；租约过期（进程崩溃）的条目可被重新领取
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+
+from app.config import Config
+from app.models.question import Question
+from app.models.work_queue import WorkQueueItem
+from app.services.metrics import metrics_registry
+from app.utils.database import db, get_dialect_name
+
+
+WORK_QUEUE_STAGES = ('classification', 'answer_generation', 'scoring')
+
+# 支持 FOR UPDATE SKIP LOCKED 的数据库方言
+_SKIP_LOCKED_DIALECTS = ('postgresql', 'mysql', 'oracle')
+_CHUNK_SIZE = 500
+
+
+class WorkLease:
+    """一次领取得到的租约"""
+
+    def __init__(self, stage: str, token: str, business_ids: List[str], expires_at: Optional[datetime] = None):
+        self.stage = stage
+        self.token = token
+        self.business_ids = business_ids
+        self.expires_at = expires_at
+        self.lease_seconds = Config.WORK_QUEUE_LEASE_SECONDS
+        # 阶段的候选问题查询，结算时用于判断问题是否已处理完成
+        self.candidates = None
+
+    def __len__(self):
+        return len(self.business_ids)
+
+    def __repr__(self):
+        return f'<WorkLease {self.stage} {len(self.business_ids)} items>'
+
+
+class WorkQueueService:
+    """数据库工作队列"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._lock = threading.Lock()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {'enqueued': 0, 'claimed': 0, 'completed': 0, 'retried': 0, 'dead': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return Config.WORK_QUEUE_ENABLED
+
+    def _count(self, key: str, amount: int) -> None:
+        if amount:
+            with self._lock:
+                self._stats[key] += amount
+
+    def _get_insert(self, dialect_name: str):
+        """获取支持 ON CONFLICT 的 insert 构造器，不支持的方言返回 None"""
+        if dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return None
+        return insert
+
+    # ------------------------------------------------------------------
+    # 入队与领取
+    # ------------------------------------------------------------------
+
+    def enqueue(self, stage: str, business_ids: List[str]) -> int:
+        """
+        问题入队（已在队列中的跳过，包括 dead 条目），立即提交
+
+        Returns:
+            新入队的条目数
+        """
+        business_ids = list(dict.fromkeys(business_ids))
+        if not business_ids:
+            return 0
+
+        now = datetime.utcnow()
+        insert = self._get_insert(get_dialect_name())
+        added = 0
+        try:
+            for start in range(0, len(business_ids), _CHUNK_SIZE):
+                chunk = business_ids[start:start + _CHUNK_SIZE]
+                existing = {
+                    business_id for (business_id,) in db.session.query(WorkQueueItem.question_business_id).filter(
+                        WorkQueueItem.stage == stage,
+                        WorkQueueItem.question_business_id.in_(chunk)
+                    )
+                }
+                rows = [
+                    {
+                        'stage': stage,
+                        'question_business_id': business_id,
+                        'status': 'pending',
+                        'attempts': 0,
+                        'max_attempts': Config.WORK_QUEUE_MAX_ATTEMPTS,
+                        'available_at': now,
+                        'created_at': now,
+                        'updated_at': now
+                    }
+                    for business_id in chunk if business_id not in existing
+                ]
+                if not rows:
+                    continue
+                if insert is not None:
+                    # 并发入队时以唯一约束去重
+                    stmt = insert(WorkQueueItem.__table__).values(rows).on_conflict_do_nothing(
+                        index_elements=['stage', 'question_business_id']
+                    )
+                    result = db.session.execute(stmt)
+                    added += result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(rows)
+                else:
+                    db.session.bulk_insert_mappings(WorkQueueItem, rows)
+                    added += len(rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self._count('enqueued', added)
+        if added:
+            self.logger.info(f"工作队列 {stage} 新入队 {added} 个问题")
+        return added
+
+    def _claimable(self, stage: str, now: datetime):
+        """可领取条件：到达可用时间的 pending 条目，或租约已过期且仍有尝试次数的 leased 条目"""
+        return and_(
+            WorkQueueItem.stage == stage,
+            or_(
+                and_(WorkQueueItem.status == 'pending', WorkQueueItem.available_at <= now),
+                and_(
+                    WorkQueueItem.status == 'leased',
+                    WorkQueueItem.lease_expires_at <= now,
+                    WorkQueueItem.attempts < WorkQueueItem.max_attempts
+                )
+            )
+        )
+
+    def claim(self, stage: str, limit: int, lease_seconds: Optional[int] = None) -> WorkLease:
+        """
+        领取最多 limit 个条目，立即提交（释放行锁，租约对其他进程可见）
+
+        Args:
+            stage: 阶段名称
+            limit: 最多领取的条目数
+            lease_seconds: 租约时长，未指定时取 WORK_QUEUE_LEASE_SECONDS
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=lease_seconds or Config.WORK_QUEUE_LEASE_SECONDS)
+        token = uuid.uuid4().hex
+        claimable = self._claimable(stage, now)
+
+        try:
+            # 租约多次过期仍未完成（处理进程反复崩溃）的条目转入 dead
+            db.session.query(WorkQueueItem).filter(
+                WorkQueueItem.stage == stage,
+                WorkQueueItem.status == 'leased',
+                WorkQueueItem.lease_expires_at <= now,
+                WorkQueueItem.attempts >= WorkQueueItem.max_attempts
+            ).update({
+                'status': 'dead',
+                'lease_token': None,
+                'last_error': '租约多次过期未完成',
+                'updated_at': now
+            }, synchronize_session=False)
+
+            id_query = db.session.query(WorkQueueItem.id).filter(claimable).order_by(
+                WorkQueueItem.available_at, WorkQueueItem.id
+            ).limit(limit)
+            if get_dialect_name() in _SKIP_LOCKED_DIALECTS:
+                # 其他进程已锁定的行直接跳过，不等待
+                id_query = id_query.with_for_update(skip_locked=True)
+            ids = [item_id for (item_id,) in id_query]
+
+            business_ids = []
+            if ids:
+                # 条件中再次检查可领取状态：不支持 SKIP LOCKED 时，并发领取同一批候选的进程只有一个能写入令牌
+                db.session.query(WorkQueueItem).filter(
+                    WorkQueueItem.id.in_(ids),
+                    claimable
+                ).update({
+                    'status': 'leased',
+                    'lease_owner': self.worker_id,
+                    'lease_token': token,
+                    'lease_expires_at': expires_at,
+                    'attempts': WorkQueueItem.attempts + 1,
+                    'updated_at': now
+                }, synchronize_session=False)
+                business_ids = [
+                    business_id for (business_id,) in db.session.query(WorkQueueItem.question_business_id).filter(
+                        WorkQueueItem.lease_token == token
+                    ).order_by(WorkQueueItem.available_at, WorkQueueItem.id)
+                ]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self._count('claimed', len(business_ids))
+        if business_ids:
+            self.logger.info(f"工作队列 {stage} 领取 {len(business_ids)} 个问题，租约至 {expires_at}")
+        lease = WorkLease(stage, token, business_ids, expires_at)
+        lease.lease_seconds = lease_seconds or Config.WORK_QUEUE_LEASE_SECONDS
+        return lease
+
+    def claim_questions(
+        self,
+        stage: str,
+        candidates,
+        limit: Optional[int] = None,
+        enqueue: bool = True
+    ) -> Tuple[List[Question], WorkLease]:
+        """
+        按阶段的候选问题查询入队并领取，返回领取到且仍满足条件的问题
+
+        领取到但已不满足条件的问题（被其他途径处理过）不返回，结算时直接完成。
+
+        Args:
+            stage: 阶段名称
+            candidates: 候选问题查询（不带 limit），以 Question 为实体
+            limit: 最多领取的问题数，未指定时取 WORK_QUEUE_CLAIM_SIZE
+            enqueue: 是否先把候选问题入队（最多 WORK_QUEUE_ENQUEUE_LIMIT 个）
+        """
+        if enqueue:
+            business_ids = [
+                business_id for (business_id,) in
+                candidates.with_entities(Question.business_id).limit(Config.WORK_QUEUE_ENQUEUE_LIMIT)
+            ]
+            self.enqueue(stage, business_ids)
+
+        lease = self.claim(stage, limit or Config.WORK_QUEUE_CLAIM_SIZE)
+        lease.candidates = candidates
+        if not lease.business_ids:
+            return [], lease
+
+        questions = []
+        for start in range(0, len(lease.business_ids), _CHUNK_SIZE):
+            chunk = lease.business_ids[start:start + _CHUNK_SIZE]
+            questions.extend(candidates.filter(Question.business_id.in_(chunk)).all())
+        return questions, lease
+
+    # ------------------------------------------------------------------
+    # 结算
+    # ------------------------------------------------------------------
+
+    def complete(self, lease: WorkLease, business_ids: Optional[List[str]] = None) -> int:
+        """完成条目（从队列删除），只作用于仍由该租约持有的条目"""
+        business_ids = lease.business_ids if business_ids is None else business_ids
+        completed = 0
+        try:
+            for start in range(0, len(business_ids), _CHUNK_SIZE):
+                completed += db.session.query(WorkQueueItem).filter(
+                    WorkQueueItem.lease_token == lease.token,
+                    WorkQueueItem.question_business_id.in_(business_ids[start:start + _CHUNK_SIZE])
+                ).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._count('completed', completed)
+        if completed < len(business_ids):
+            # 租约在处理期间过期并被其他进程重新领取，这些问题可能被重复处理
+            self.logger.warning(
+                f"工作队列 {lease.stage} 租约只完成了 {completed}/{len(business_ids)} 个条目，"
+                f"其余条目已不再由该租约持有"
+            )
+        return completed
+
+    def fail(self, lease: WorkLease, error: str, business_ids: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        退回条目：按尝试次数指数退避后重新可领取，已达最大尝试次数的转入 dead
+
+        Returns:
+            {'retried': 重新排队数, 'dead': 转入 dead 数}
+        """
+        business_ids = lease.business_ids if business_ids is None else business_ids
+        now = datetime.utcnow()
+        retried = 0
+        dead = 0
+        try:
+            for start in range(0, len(business_ids), _CHUNK_SIZE):
+                items = db.session.query(WorkQueueItem).filter(
+                    WorkQueueItem.lease_token == lease.token,
+                    WorkQueueItem.question_business_id.in_(business_ids[start:start + _CHUNK_SIZE])
+                ).all()
+                for item in items:
+                    item.lease_owner = None
+                    item.lease_token = None
+                    item.lease_expires_at = None
+                    item.last_error = (error or '')[:2000]
+                    item.updated_at = now
+                    if item.attempts >= item.max_attempts:
+                        item.status = 'dead'
+                        dead += 1
+                    else:
+                        delay = min(
+                            Config.WORK_QUEUE_RETRY_DELAY * 2 ** max(0, item.attempts - 1),
+                            Config.WORK_QUEUE_RETRY_MAX_DELAY
+                        )
+                        item.status = 'pending'
+                        item.available_at = now + timedelta(seconds=delay)
+                        retried += 1
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self._count('retried', retried)
+        self._count('dead', dead)
+        if dead:
+            self.logger.warning(f"工作队列 {lease.stage} 有 {dead} 个问题超过最大尝试次数，已转入 dead: {error}")
+        return {'retried': retried, 'dead': dead}
+
+    def settle(self, lease: WorkLease, error: Optional[str] = None) -> Dict[str, int]:
+        """
+        阶段处理结束后结算租约
+
+        阶段整体异常时全部退回重试；否则按候选查询重新检查，已不满足阶段条件的完成，
+        仍满足的（单个问题处理失败）退回重试。
+        """
+        if not lease.business_ids:
+            return {'completed': 0, 'retried': 0, 'dead': 0}
+
+        if error is not None or lease.candidates is None:
+            result = self.fail(lease, error or '阶段处理失败')
+            return {'completed': 0, **result}
+
+        remaining = set()
+        for start in range(0, len(lease.business_ids), _CHUNK_SIZE):
+            chunk = lease.business_ids[start:start + _CHUNK_SIZE]
+            remaining.update(
+                business_id for (business_id,) in
+                lease.candidates.with_entities(Question.business_id).filter(Question.business_id.in_(chunk))
+            )
+
+        completed = self.complete(lease, [bid for bid in lease.business_ids if bid not in remaining])
+        result = {'retried': 0, 'dead': 0}
+        if remaining:
+            result = self.fail(lease, '处理后仍满足阶段条件', [bid for bid in lease.business_ids if bid in remaining])
+        return {'completed': completed, **result}
+
+    def extend(self, lease: WorkLease, lease_seconds: Optional[int] = None) -> int:
+        """
+        延长租约（长时间处理时调用），返回仍由该租约持有的条目数
+
+        在独立连接上更新并立即提交，不提交调用方会话中暂存的批次
+        """
+        lease_seconds = lease_seconds or lease.lease_seconds
+        expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        table = WorkQueueItem.__table__
+        stmt = table.update().where(
+            (table.c.lease_token == lease.token) & (table.c.status == 'leased')
+        ).values(lease_expires_at=expires_at)
+
+        with db.engine.begin() as connection:
+            extended = connection.execute(stmt).rowcount
+        lease.expires_at = expires_at
+        lease.lease_seconds = lease_seconds
+        if extended < len(lease.business_ids):
+            self.logger.warning(
+                f"工作队列 {lease.stage} 租约续期时只剩 {extended}/{len(lease.business_ids)} 个条目仍由本进程持有"
+            )
+        return extended
+
+    def heartbeat(self, lease: WorkLease) -> bool:
+        """处理循环中定期调用：租约时长已过去三分之一时续期，返回是否执行了续期"""
+        if not lease.business_ids or lease.expires_at is None:
+            return False
+        remaining = (lease.expires_at - datetime.utcnow()).total_seconds()
+        if remaining > lease.lease_seconds * 2 / 3:
+            return False
+        try:
+            self.extend(lease)
+        except Exception as e:
+            # 续期失败不影响本批次处理，下次心跳重试
+            self.logger.warning(f"工作队列 {lease.stage} 租约续期失败: {str(e)}")
+            return False
+        return True
+
+    # ------------------------------------------------------------------
+    # 运维
+    # ------------------------------------------------------------------
+
+    def requeue_dead(self, stage: Optional[str] = None) -> Dict[str, Any]:
+        """把 dead 条目重新放回队列（尝试次数清零）"""
+        try:
+            query = db.session.query(WorkQueueItem).filter(WorkQueueItem.status == 'dead')
+            if stage:
+                query = query.filter(WorkQueueItem.stage == stage)
+            count = query.update({
+                'status': 'pending',
+                'attempts': 0,
+                'available_at': datetime.utcnow(),
+                'lease_owner': None,
+                'lease_token': None,
+                'lease_expires_at': None,
+                'updated_at': datetime.utcnow()
+            }, synchronize_session=False)
+            db.session.commit()
+            self.logger.info(f"重新排队 {count} 个 dead 条目")
+            return {'success': True, 'message': f'已重新排队 {count} 个条目', 'count': count}
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"重新排队 dead 条目失败: {str(e)}")
+            return {'success': False, 'message': f'重新排队失败: {str(e)}', 'count': 0}
+
+    def get_queue_counts(self) -> Dict[str, Dict[str, int]]:
+        """各阶段各状态的条目数"""
+        counts: Dict[str, Dict[str, int]] = {}
+        rows = db.session.query(
+            WorkQueueItem.stage, WorkQueueItem.status, func.count(WorkQueueItem.id)
+        ).group_by(WorkQueueItem.stage, WorkQueueItem.status)
+        for stage, status, count in rows:
+            counts.setdefault(stage, {})[status] = count
+        return counts
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({'enabled': self.enabled, 'worker_id': self.worker_id})
+        try:
+            stats['queue'] = self.get_queue_counts()
+        except Exception as e:
+            stats['queue'] = {}
+            stats['error'] = str(e)
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = self._empty_stats()
+
+
+def _collect_work_queue_gauges():
+    """工作队列各阶段各状态的条目数"""
+    if not work_queue_service.enabled:
+        return
+    for stage, statuses in work_queue_service.get_queue_counts().items():
+        for status, count in statuses.items():
+            yield ('work_queue_items', 'Work queue items by stage and status',
+                   {'stage': stage, 'status': status}, count)
+
+
+# 创建全局工作队列服务实例
+work_queue_service = WorkQueueService()
+metrics_registry.register_collector(_collect_work_queue_gauges)
@@ -3,8 +3,9 @@
 提供数据库连接、初始化等功能
 """
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import create_engine, text, event
+from sqlalchemy import create_engine, text, event, select, tuple_
 from sqlalchemy.orm import sessionmaker
+from typing import Dict, List, Sequence
 import logging
 
 # 创建全局数据库实例
@@ -76,6 +77,83 @@ def init_db(app):
         except Exception as e:
             logger.error(f"补充外部表/索引失败: {e}")
 
+def get_dialect_name() -> str:
+    """获取当前数据库方言名称（sqlite / postgresql 等）"""
+    try:
+        return db.engine.dialect.name
+    except Exception:
+        bind = db.session.bind
+        return bind.dialect.name if bind is not None else ""
+
+def bulk_upsert(
+    model,
+    rows: List[Dict],
+    conflict_columns: Sequence[str],
+    update_columns: Sequence[str],
+    chunk_size: int = 500,
+    session=None
+) -> Dict[str, int]:
+    """
+    基于 INSERT ... ON CONFLICT 的批量写入（PostgreSQL / SQLite）
+
+    每个分块只执行一次存在性查询和一条 INSERT 语句，冲突时仅更新 update_columns 中的字段，
+    未列出的字段（如 classification）保持数据库中的现有值。
+
+    Args:
+        model: SQLAlchemy模型类
+        rows: 待写入的字典列表，键为列名
+        conflict_columns: 冲突判定列（需有唯一约束）
+        update_columns: 冲突时需要更新的列
+        chunk_size: 每条语句写入的最大行数
+        session: 数据库会话，默认使用 db.session
+
+    Returns:
+        {'inserted': 新插入行数, 'updated': 更新行数}
+    """
+    session = session or db.session
+    bind = session.get_bind()
+    dialect_name = bind.dialect.name if bind is not None else get_dialect_name()
+
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"bulk_upsert 不支持的数据库方言: {dialect_name}")
+
+    table = model.__table__
+    key_columns = [table.c[name] for name in conflict_columns]
+    inserted = 0
+    updated = 0
+
+    for start in range(0, len(rows), chunk_size):
+        # 同一语句内同一冲突键只能出现一次，保留最后一条
+        chunk_by_key = {}
+        for row in rows[start:start + chunk_size]:
+            chunk_by_key[tuple(row[name] for name in conflict_columns)] = row
+        chunk = list(chunk_by_key.values())
+        if not chunk:
+            continue
+
+        keys = list(chunk_by_key.keys())
+        if len(key_columns) == 1:
+            existing_query = select(key_columns[0]).where(key_columns[0].in_([key[0] for key in keys]))
+        else:
+            existing_query = select(*key_columns).where(tuple_(*key_columns).in_(keys))
+        existing_count = len(session.execute(existing_query).all())
+
+        stmt = insert(table).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(conflict_columns),
+            set_={name: stmt.excluded[name] for name in update_columns}
+        )
+        session.execute(stmt)
+
+        inserted += len(chunk) - existing_count
+        updated += existing_count
+
+    return {'inserted': inserted, 'updated': updated}
+
 def get_db_session(database_uri):
     """获取独立的数据库会话（用于定时任务等场景）"""
     engine = create_engine(database_uri)
@@ -182,4 +260,6 @@ def create_tables_sql():
     CREATE INDEX IF NOT EXISTS idx_questions_processing_status ON questions(processing_status);
     CREATE INDEX IF NOT EXISTS idx_answers_question_business_id ON answers(question_business_id);
     CREATE INDEX IF NOT EXISTS idx_answers_assistant_type ON answers(assistant_type);
+    -- 增量同步游标 (sendmessagetime, id) 的范围扫描索引
+    CREATE INDEX IF NOT EXISTS idx_table1_sendmessagetime_id ON table1(sendmessagetime, id);
     """ 
\ No newline at end of file
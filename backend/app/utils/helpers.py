@@ -13,6 +13,9 @@ def generate_business_id(pageid, sendmessagetime, query):
     """
     生成业务主键：基于关键字段的MD5哈希值
     确保相同问题的唯一性和稳定性
+
+    business_id = MD5(pageid + sendmessagetime.isoformat() + query)，
+    与数据同步服务及 business_id_sql_expr 生成的SQL表达式保持逐字节一致
     
     Args:
         pageid: 页面ID
@@ -22,17 +25,43 @@ def generate_business_id(pageid, sendmessagetime, query):
     Returns:
         str: 32位的MD5哈希值
     """
-    # 标准化数据
-    pageid_str = str(pageid) if pageid else ''
-    time_str = sendmessagetime.isoformat() if isinstance(sendmessagetime, datetime) else str(sendmessagetime)
-    query_str = query.strip() if query else ''
-    
-    # 组合字段
-    data_str = f"{pageid_str}_{time_str}_{query_str}"
+    if isinstance(sendmessagetime, datetime):
+        time_str = sendmessagetime.isoformat()
+    else:
+        time_str = str(sendmessagetime) if sendmessagetime else ''
+
+    # 组合字段（None 按 Python 格式化为 'None'，保持与历史数据一致）
+    data_str = f"{pageid}{time_str}{query}"
     
     # 生成MD5哈希
     return hashlib.md5(data_str.encode('utf-8')).hexdigest()
 
+def business_id_sql_expr(alias='t1', query_column='query1'):
+    """
+    生成与 generate_business_id 等价的 PostgreSQL 表达式
+
+    - datetime.isoformat() 在微秒为0时不输出小数部分，这里按是否整秒选择 to_char 格式
+    - Python f-string 将 None 格式化为 'None'，这里用 COALESCE 对齐
+
+    Args:
+        alias: 源表别名
+        query_column: 源表中问题文本列名
+
+    Returns:
+        str: SQL表达式
+    """
+    time_column = f"{alias}.sendmessagetime"
+    return (
+        "MD5(CONCAT("
+        f"COALESCE(CAST({alias}.pageid AS TEXT), 'None'), "
+        f"CASE WHEN {time_column} IS NULL THEN '' "
+        f"WHEN date_trunc('second', {time_column}) = {time_column} "
+        f"THEN to_char({time_column}, 'YYYY-MM-DD\"T\"HH24:MI:SS') "
+        f"ELSE to_char({time_column}, 'YYYY-MM-DD\"T\"HH24:MI:SS.US') END, "
+        f"COALESCE(CAST({alias}.{query_column} AS TEXT), 'None')"
+        "))"
+    )
+
 def is_valid_query(query):
     """
     验证查询内容是否有效
@@ -0,0 +1,191 @@
+"""
+流水线工作进程启动文件
+与 run.py（Web服务）分开部署，Web与流水线处理能力可独立扩容：
+- 主进程参与调度器主节点选举（数据库 advisory lock），当选后运行定时任务调度器，
+  多台主机同时运行 worker.py 时只有一个调度器；
+- WORKER_PROCESSES 个子进程通过工作队列持续领取并处理分类、答案生成、评分阶段，互不重复。
+Web进程应设置 SCHEDULER_ENABLED=false。
+
+运行指标是进程内的，Web进程的 /metrics 不包含这里各进程的API延迟、阶段耗时等指标：
+主进程在 WORKER_METRICS_PORT、子进程 i 在 WORKER_METRICS_PORT+1+i 上各自提供 /metrics，
+Prometheus 需逐个抓取（WORKER_METRICS_PORT=0 表示不启动）。
+
+用法:
+    python worker.py                                  # 默认进程数与阶段
+    python worker.py --processes 4 --stages scoring   # 只处理评分阶段
+    python worker.py --no-scheduler                   # 只处理阶段，不参与调度器选举
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+from app import create_app
+from app.config import Config
+from app.services.metrics import start_metrics_server
+from app.services.work_queue_service import WORK_QUEUE_STAGES
+
+# 在 create_app 之前设置（spawn 的子进程会重新执行本模块）：
+# 各进程不自行启动调度器，只有选举出的主节点运行；阶段处理一律通过工作队列领取
+Config.SCHEDULER_ENABLED = False
+Config.WORK_QUEUE_ENABLED = True
+
+logger = logging.getLogger('worker')
+
+
+def run_stage(stage: str) -> dict:
+    """执行一次阶段处理（需在应用上下文中调用）"""
+    from app.services.ai_processing_service import ai_processing_service
+
+    if stage == 'classification':
+        return ai_processing_service.process_classification_batch()
+
+    if stage == 'answer_generation':
+        # 与调度器一致：只有API模式才自动生成答案，手动模式由导出Excel完成
+        from app.services.system_config_service import SystemConfigService
+        mode = SystemConfigService().get_config('workflow.answer_generation_mode', 'manual')
+        if mode != 'api':
+            return {'success': True, 'message': f'答案生成模式为 {mode}，跳过', 'processed_count': 0}
+        return ai_processing_service.process_answer_generation_batch()
+
+    if stage == 'scoring':
+        return ai_processing_service.process_scoring_batch()
+
+    raise ValueError(f"未知的阶段: {stage}")
+
+
+def run_stage_worker(index: int, stages: list):
+    """子进程入口：循环处理各阶段，没有待处理问题时等待 WORKER_IDLE_SECONDS"""
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    app = create_app()
+    if Config.WORKER_METRICS_PORT:
+        start_metrics_server(Config.WORKER_METRICS_PORT + 1 + index, Config.WORKER_METRICS_HOST, app)
+    logger.info(f"流水线子进程 {index} 启动（pid {os.getpid()}），阶段: {', '.join(stages)}")
+
+    while not stop_event.is_set():
+        processed = 0
+        for stage in stages:
+            if stop_event.is_set():
+                break
+            with app.app_context():
+                try:
+                    result = run_stage(stage)
+                except Exception as e:
+                    logger.error(f"子进程 {index} 执行阶段 {stage} 异常: {str(e)}")
+                    continue
+            processed += result.get('processed_count') or 0
+            if not result.get('success', True):
+                logger.warning(f"子进程 {index} 阶段 {stage} 失败: {result.get('message')}")
+
+        if not processed:
+            stop_event.wait(Config.WORKER_IDLE_SECONDS)
+
+    logger.info(f"流水线子进程 {index} 已停止")
+
+
+def maintain_leadership(app) -> None:
+    """主节点选举：当选后启动调度器，失去主节点身份后停止调度器"""
+    from app.services.leader_election import scheduler_leader_election
+    from app.services.scheduler_service import scheduler_service
+
+    if scheduler_leader_election.is_leader:
+        if not scheduler_leader_election.check():
+            logger.warning("已失去调度器主节点身份，停止调度器")
+            scheduler_service.shutdown()
+        return
+
+    if not scheduler_leader_election.try_acquire(app):
+        return
+
+    app.config['SCHEDULER_ENABLED'] = True
+    Config.SCHEDULER_ENABLED = True
+    try:
+        scheduler_service.initialize(app)
+        logger.info("当选调度器主节点，定时任务调度器已启动")
+    except Exception as e:
+        logger.error(f"调度器启动失败，放弃主节点身份: {str(e)}")
+        scheduler_service.shutdown()
+        scheduler_leader_election.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI问答平台流水线工作进程')
+    parser.add_argument('--processes', type=int, default=Config.WORKER_PROCESSES,
+                        help='处理流水线阶段的子进程数（0 表示只运行调度器）')
+    parser.add_argument('--stages', default=Config.WORKER_STAGES,
+                        help=f"子进程处理的阶段，逗号分隔，可选: {','.join(WORK_QUEUE_STAGES)}")
+    parser.add_argument('--no-scheduler', action='store_true', help='不参与调度器主节点选举')
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in WORK_QUEUE_STAGES]
+    if unknown:
+        parser.error(f"未知的阶段: {', '.join(unknown)}")
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    app = create_app()
+    if Config.WORKER_METRICS_PORT:
+        start_metrics_server(Config.WORKER_METRICS_PORT, Config.WORKER_METRICS_HOST, app)
+
+    # spawn：子进程各自创建应用和数据库连接池，不继承父进程的连接与线程
+    context = multiprocessing.get_context('spawn')
+    processes = {}
+
+    def start_process(index: int):
+        process = context.Process(
+            target=run_stage_worker, args=(index, stages), name=f'pipeline-worker-{index}'
+        )
+        process.start()
+        processes[index] = process
+
+    for index in range(max(0, args.processes)):
+        start_process(index)
+    logger.info(f"流水线工作进程启动: {len(processes)} 个子进程，调度器选举: {'否' if args.no_scheduler else '是'}")
+
+    try:
+        while not stop_event.is_set():
+            if not args.no_scheduler:
+                try:
+                    maintain_leadership(app)
+                except Exception as e:
+                    logger.error(f"调度器主节点选举异常: {str(e)}")
+
+            for index, process in list(processes.items()):
+                if not process.is_alive() and not stop_event.is_set():
+                    logger.warning(f"子进程 {index} 已退出（退出码 {process.exitcode}），重新启动")
+                    start_process(index)
+
+            stop_event.wait(Config.LEADER_ELECTION_INTERVAL)
+    finally:
+        logger.info("正在停止流水线工作进程")
+        if not args.no_scheduler:
+            from app.services.leader_election import scheduler_leader_election
+            from app.services.scheduler_service import scheduler_service
+            scheduler_service.shutdown()
+            scheduler_leader_election.release()
+
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            # 等待当前批次处理完成；未完成的工作队列条目在租约到期后会被重新领取
+            process.join(timeout=60)
+            if process.is_alive():
+                process.kill()
+
+
+if __name__ == '__main__':
+    main()